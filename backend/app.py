@@ -1,10 +1,10 @@
 
 # app.py - FastAPI Backend API Server
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query, Depends
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Query, Depends, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Union
 import os
 import uuid
 import tempfile
@@ -12,17 +12,24 @@ import json
 from pathlib import Path
 import asyncio
 import concurrent.futures
+import functools
 import threading
+import hashlib
 
 # Import our Python modules
-from misra_chat_client import init_vertex_ai, load_cpp_file, start_chat, send_file_intro, send_misra_violations
-from excel_utils import extract_violations_for_file
-from numbering import add_line_numbers
-from denumbering import remove_line_numbers
-from replace import merge_fixed_snippets_into_file
-from fixed_response_code_snippet import extract_snippets_from_response, save_snippets_to_json, extract_violation_mapping, save_violation_mapping_to_json
-from diff_utils import create_temp_fixed_denumbered_file, get_file_content, create_diff_data, cleanup_temp_files
-from review_manager import ReviewManager
+from misra_chat_client import init_vertex_ai, start_chat, resume_chat, chat_history, model_cache, send_file_intro_async, send_misra_violations_stream, send_continuation_stream, with_additional_excerpts
+from excel_utils import extract_violations_for_file, extract_violations_for_files, report_cache
+from numbered_document import NumberedDocument
+from fixed_response_code_snippet import extract_snippets_from_response, save_snippets_to_json, extract_violation_mapping, save_violation_mapping_to_json, SnippetStreamParser
+from diff_utils import create_diff_data_from_content
+from fix_pipeline import FixResult, run_fix_parallel, partition_violations, sessions_for, MAX_CONTINUATION_BATCHES
+from prompt_slicing import CONTEXT_MODES, DEFAULT_CONTEXT_RADIUS, slice_document, violation_lines, estimate_tokens
+from response_cache import response_cache, make_cache_key
+from fix_memory import fix_memory, learnable_fix
+from job_queue import job_queue, Job
+from event_hub import event_hub
+from chat_persistence import chat_files, chat_metrics, compact_turns, expand_turns
+from review_manager import ReviewManager, review_writer
 from session_manager import session_manager
 from auth_endpoints import router as auth_router
 from auth_db import setup_default_users
@@ -63,23 +70,133 @@ ALLOWED_EXTENSIONS = {'cpp', 'c', 'xlsx', 'xls'}
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
+# Reports larger than this are scanned row by row instead of being parsed into memory
+STREAMING_REPORT_THRESHOLD = int(os.environ.get('MISRA_STREAMING_REPORT_BYTES', 50 * 1024 * 1024))
+
 # Thread pool for concurrent processing
 executor = concurrent.futures.ThreadPoolExecutor(max_workers=10)
+# Fix progress writes run one at a time, so a batch's progress never lands after the final one
+progress_writer = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+async def run_blocking(function, *args, **kwargs):
+    """Run file, database or CPU-bound work in the thread pool instead of on the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(function, *args, **kwargs))
 
 def allowed_file(filename: str) -> bool:
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+async def save_upload_file(file: UploadFile, destination: str, chunk_size: int = 1024 * 1024) -> str:
+    """Write an upload to disk in chunks and return its SHA256 content hash"""
+    digest = hashlib.sha256()
+    with open(destination, "wb") as buffer:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            buffer.write(chunk)
+    return digest.hexdigest()
+
+# Incrementally maintained overlays of the numbered document
+ALL_FIXES_VIEW = 'all_fixes'
+ACCEPTED_FIXES_VIEW = 'accepted_fixes'
+
+MODEL_SETTING_NAMES = ('model_name', 'temperature', 'top_p', 'max_tokens', 'safety_settings')
+
+def save_chat_history(session):
+    """
+    Persist the turns the project's chat gained since the last save. The numbered
+    file in the intro is stored once by content hash instead of in the history.
+    """
+    chat = session.get_chat_session()
+    if chat is None:
+        return
+    
+    saved = session.get_data('chat_history', [])
+    turns = chat_history(chat)
+    session.set_chat_size(sum(len(turn['text']) for turn in turns))
+    if len(turns) <= len(saved):
+        return
+    
+    file_hash = session.get_data('chat_file_hash')
+    file_text = None
+    if file_hash:
+        document = get_numbered_document(session)
+        file_text = document.numbered_text() if document and document.content_hash() == file_hash else chat_files.get(file_hash)
+    session.set_data('chat_history', saved + compact_turns(turns[len(saved):], file_text, file_hash))
+    chat_metrics.record_save()
+
+def get_chat(session):
+    """
+    The project's chat session. If this process has none (restart, another worker,
+    evicted session) or has fallen behind the persisted history, a chat is rebuilt
+    from that history instead of sending the file intro again.
+    """
+    chat = session.get_chat_session()
+    saved = session.get_data('chat_history')
+    if not saved or (chat is not None and len(chat_history(chat)) >= len(saved)):
+        return chat
+    
+    try:
+        turns = expand_turns(saved, chat_files)
+        model_settings = session.get_data('model_settings', default_model_settings)
+        chat = resume_chat(turns, **{name: model_settings[name] for name in MODEL_SETTING_NAMES})
+    except Exception as e:
+        print(f"Could not restore the chat of project {session.project_id}: {str(e)}")
+        chat_metrics.record_failure()
+        return session.get_chat_session()
+    
+    session.set_chat_session(chat)
+    session.set_chat_size(sum(len(turn['text']) for turn in turns))
+    chat_metrics.record_rehydration(turns)
+    print(f"Restored the chat of project {session.project_id} from {len(turns)} persisted turns")
+    return chat
+
+def get_review_manager(session) -> ReviewManager:
+    """
+    The project's review state, cached in the session and written to disk behind the
+    requests. The cache is per worker (a LOCAL_KEYS entry); it is reloaded when another
+    worker's changes reach the file, and the accepted view is then rebuilt.
+    """
+    review_manager = session.get_data('review_manager')
+    if review_manager is None:
+        review_manager = ReviewManager(session.project_id, UPLOAD_FOLDER, write_behind=True)
+        session.set_data('review_manager', review_manager)
+    elif review_manager.refresh():
+        session.set_data('accepted_view_synced', False)
+    return review_manager
+
+def get_numbered_document(session) -> Optional[NumberedDocument]:
+    """Get the project's in-memory numbered document, loading it from the uploaded file if needed"""
+    document = session.get_data('numbered_document')
+    if document is None:
+        cpp_file = session.get_data('cpp_file')
+        if not session.get_data('numbered_file') or not cpp_file or not os.path.exists(cpp_file):
+            return None
+        document = NumberedDocument.from_file(cpp_file)
+        session.set_data('numbered_document', document)
+    return document
+
 class LineNumbersRequest(BaseModel):
     projectId: str
 
 class FirstPromptRequest(BaseModel):
     projectId: str
     username: str
+    contextMode: str = 'full'
+    contextRadius: int = Field(DEFAULT_CONTEXT_RADIUS, ge=0)
 
 class FixViolationsRequest(BaseModel):
     projectId: str
     username: str
     violations: List[Dict[str, Any]] = []
+    autoContinue: bool = True
+    maxBatches: Optional[int] = None
+    parallelSessions: Optional[int] = None
+    useCache: bool = True
+    useFixMemory: bool = True
+    background: bool = False
 
 class ApplyFixesRequest(BaseModel):
     projectId: str
@@ -88,6 +205,7 @@ class ChatRequest(BaseModel):
     message: str
     projectId: str
     username: str
+    background: bool = False
 
 class ModelSettings(BaseModel):
     model_name: str
@@ -105,10 +223,12 @@ class ProcessResponse(BaseModel):
 
 class GeminiResponse(BaseModel):
     response: str
+    contextStats: Optional[Dict[str, Any]] = None
 
 class FixViolationsResponse(BaseModel):
     response: str
     codeSnippets: List[Dict[str, Any]]
+    cached: bool = False
 
 class ApplyFixesResponse(BaseModel):
     fixedFilePath: str
@@ -116,6 +236,10 @@ class ApplyFixesResponse(BaseModel):
 class ChatResponse(BaseModel):
     response: str
 
+class JobResponse(BaseModel):
+    jobId: str
+    status: str
+
 class SettingsResponse(BaseModel):
     success: bool
     message: str
@@ -126,6 +250,14 @@ class DiffResponse(BaseModel):
     has_changes: bool
     highlight: dict = {}
 
+class MultiTargetViolationsResponse(BaseModel):
+    reportHash: str
+    violations: Dict[str, List[Dict[str, Any]]]
+
+class SelectTargetRequest(BaseModel):
+    projectId: str
+    targetFile: str
+
 class ReviewActionRequest(BaseModel):
     projectId: str
     line_key: str
@@ -145,6 +277,11 @@ async def startup_event():
     init_vertex_ai()
     setup_default_users()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Review state is written behind; don't lose the last clicks
+    review_writer.flush()
+
 # ... keep existing code (all other endpoints remain the same) ...
 
 @app.get("/api/settings", response_model=ModelSettings)
@@ -240,7 +377,8 @@ async def upload_cpp_file(
 async def upload_misra_report(
     file: UploadFile = File(...),
     projectId: str = Form(...),
-    targetFile: str = Form(...)
+    targetFile: str = Form(...),
+    streaming: bool = Form(False)
 ):
     try:
         if not file.filename:
@@ -249,23 +387,120 @@ async def upload_misra_report(
         # Get session
         session = session_manager.get_or_create_session(projectId)
         
-        # Save Excel file
+        # Save Excel file in chunks, hashing it so repeated uploads of the same report reuse the parsed index
         filename = file.filename
         excel_path = os.path.join(UPLOAD_FOLDER, f"{projectId}_report_{filename}")
+        report_hash = await save_upload_file(file, excel_path)
+        report_cache.remember_hash(excel_path, report_hash)
         
-        with open(excel_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Huge reports are streamed so memory is bounded by the matching rows
+        use_streaming = streaming or os.path.getsize(excel_path) > STREAMING_REPORT_THRESHOLD
         
-        # Extract violations
-        violations = extract_violations_for_file(excel_path, targetFile)
+        # Extract violations; parsing is CPU bound, keep it off the event loop
+        loop = asyncio.get_event_loop()
+        violations = await loop.run_in_executor(
+            executor,
+            extract_violations_for_file,
+            excel_path,
+            targetFile,
+            report_hash,
+            use_streaming
+        )
         
         # Store in session
         session.set_data('excel_file', excel_path)
+        session.set_data('report_hash', report_hash)
+        session.set_data('violations', violations)
+        
+        return violations
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def parse_target_files(target_files: Optional[str]) -> Optional[List[str]]:
+    """Accept target files as a JSON array or a comma-separated string; None/empty means all files"""
+    if not target_files or not target_files.strip():
+        return None
+    target_files = target_files.strip()
+    if target_files.startswith('['):
+        return [str(name) for name in json.loads(target_files)]
+    return [name.strip() for name in target_files.split(',') if name.strip()]
+
+@app.post("/api/upload/misra-report/multi", response_model=MultiTargetViolationsResponse)
+async def upload_misra_report_multi(
+    file: UploadFile = File(...),
+    projectId: str = Form(...),
+    targetFiles: Optional[str] = Form(None)
+):
+    """Upload a report once and get violations for several target files (or all files) grouped by file"""
+    try:
+        if not file.filename:
+            raise HTTPException(status_code=400, detail="No file selected")
+        
+        try:
+            target_files = parse_target_files(targetFiles)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="targetFiles must be a JSON array or comma-separated list")
+        
+        session = session_manager.get_or_create_session(projectId)
+        
+        filename = file.filename
+        excel_path = os.path.join(UPLOAD_FOLDER, f"{projectId}_report_{filename}")
+        report_hash = await save_upload_file(file, excel_path)
+        report_cache.remember_hash(excel_path, report_hash)
+        
+        # Parsing is CPU bound, keep it off the event loop
+        loop = asyncio.get_event_loop()
+        violations_by_file = await loop.run_in_executor(
+            executor,
+            extract_violations_for_files,
+            excel_path,
+            target_files,
+            report_hash
+        )
+        
+        # Store the report so targets can be selected later without re-uploading
+        session.set_data('excel_file', excel_path)
+        session.set_data('report_hash', report_hash)
+        session.set_data('violations_by_file', violations_by_file)
+        
+        return MultiTargetViolationsResponse(reportHash=report_hash, violations=violations_by_file)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/violations/select-target")
+async def select_target_file(request: SelectTargetRequest):
+    """Set the project's violations to one target file of the already uploaded report"""
+    try:
+        session = session_manager.get_session(request.projectId)
+        if not session:
+            raise HTTPException(status_code=404, detail="Project not found")
+        
+        violations_by_file = session.get_data('violations_by_file') or {}
+        if request.targetFile in violations_by_file:
+            violations = [dict(v) for v in violations_by_file[request.targetFile]]
+        else:
+            excel_path = session.get_data('excel_file')
+            if not excel_path or not os.path.exists(excel_path):
+                raise HTTPException(status_code=404, detail="No MISRA report uploaded for project")
+            loop = asyncio.get_event_loop()
+            violations = await loop.run_in_executor(
+                executor,
+                extract_violations_for_file,
+                excel_path,
+                request.targetFile,
+                session.get_data('report_hash')
+            )
+        
         session.set_data('violations', violations)
         
         return violations
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -287,9 +522,12 @@ async def process_add_line_numbers(request: LineNumbersRequest):
         numbered_filename = f"numbered_{original_name}.txt"
         numbered_path = os.path.join(UPLOAD_FOLDER, f"{project_id}_{numbered_filename}")
         
-        add_line_numbers(input_file, numbered_path)
+        # Keep the numbered document in memory; the file is written once for reference only
+        document = NumberedDocument.from_file(input_file)
+        document.write_numbered(numbered_path)
         
         # Update session
+        session.set_data('numbered_document', document)
         session.set_data('numbered_file', numbered_path)
         
         return ProcessResponse(numberedFilePath=numbered_path)
@@ -307,12 +545,31 @@ async def gemini_first_prompt(request: FirstPromptRequest):
         if not session:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        numbered_file = session.get_data('numbered_file')
-        if not numbered_file:
+        if request.contextMode not in CONTEXT_MODES:
+            raise HTTPException(status_code=400, detail=f"contextMode must be one of {', '.join(CONTEXT_MODES)}")
+        
+        document = get_numbered_document(session)
+        if not document:
             raise HTTPException(status_code=404, detail="Numbered file not found")
         
-        # Load numbered file content
-        numbered_content = load_cpp_file(numbered_file)
+        # Numbered file content, or in sliced mode only the scopes around the violations
+        context_mode = request.contextMode
+        violations = session.get_data('violations', [])
+        if context_mode == 'sliced' and not violations:
+            print(f"No violations loaded for project {project_id}, sending the full file")
+            context_mode = 'full'
+        
+        if context_mode == 'sliced':
+            excerpt = slice_document(document, violation_lines(violations), request.contextRadius)
+            numbered_content = excerpt.text
+            sent_lines = set(excerpt.lines)
+            context_stats = excerpt.stats()
+        else:
+            numbered_content = document.numbered_text()
+            sent_lines = set(range(1, len(document.lines) + 1))
+            full_tokens = estimate_tokens(numbered_content)
+            context_stats = {'full_file_tokens': full_tokens, 'sent_tokens': full_tokens, 'sent_lines': len(sent_lines)}
+        context_stats = {'mode': context_mode, 'total_lines': len(document.lines), **context_stats}
         
         # Load user-specific model settings
         def load_user_model_settings(username: str):
@@ -337,7 +594,7 @@ async def gemini_first_prompt(request: FirstPromptRequest):
         )
         
         # Send first prompt
-        response = send_file_intro(chat, numbered_content)
+        response = await send_file_intro_async(chat, numbered_content, excerpt=context_mode == 'sliced')
         
         # Check if response is None (blocked by safety filters)
         if response is None:
@@ -346,112 +603,448 @@ async def gemini_first_prompt(request: FirstPromptRequest):
                 detail="Response was blocked by safety filters. Please try with different content or contact support."
             )
         
-        # Store chat session
+        # Store chat session; its history is persisted with the file stored once by hash
         session.set_chat_session(chat)
-        
-        return GeminiResponse(response=response)
+        session.set_data('model_settings', user_settings)
+        session.set_data('chat_history', [])
+        session.set_data('chat_file_hash', chat_files.put(numbered_content, document.content_hash()) if context_mode == 'full' else None)
+        save_chat_history(session)
+        chat_metrics.record_intro()
+        session.set_data('context_mode', context_mode)
+        session.set_data('context_radius', request.contextRadius)
+        session.set_data('sent_lines', sent_lines)
+        session.set_data('context_stats', context_stats)
+        print(f"File intro for project {project_id}: {context_stats['sent_tokens']} of {context_stats['full_file_tokens']} estimated tokens ({context_mode})")
+        
+        return GeminiResponse(response=response, contextStats=context_stats)
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def process_violations_sync(project_id: str, username: str, violations: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Synchronous function to process violations - runs in thread pool"""
+def format_violations_for_prompt(violations: List[Dict[str, Any]]) -> str:
+    """Format violations for Gemini"""
+    violations_text = []
+    for v in violations:
+        violations_text.append(
+            f"File: {v['file']}\n"
+            f"Path: {v['path']}\n"
+            f"Line: {v['line']}\n"
+            f"Rule: {v['misra']}\n"
+            f"Message: {v['warning']}\n"
+        )
+    return "\n".join(violations_text)
+
+def build_violation_prompts(session, violation_groups: List[List[Dict[str, Any]]]) -> List[str]:
+    """
+    Format violation groups for the prompt. In sliced context mode each group is
+    preceded by the file excerpts it needs that the chat has not been sent yet.
+    """
+    texts = [format_violations_for_prompt(group) for group in violation_groups]
+    document = get_numbered_document(session)
+    if session.get_data('context_mode', 'full') != 'sliced' or not document:
+        return texts
+    
+    radius = session.get_data('context_radius', DEFAULT_CONTEXT_RADIUS)
+    sent_lines = session.get_data('sent_lines', set())
+    context_stats = dict(session.get_data('context_stats', {}))
+    newly_sent = set()
+    # Parallel sessions fork the chat before any of these are sent, so each group is sliced
+    # against the same base. Only the first group runs on the project's chat; the forks'
+    # excerpts never reach it, so only its lines count as sent.
+    for i, group in enumerate(violation_groups):
+        excerpt = slice_document(document, violation_lines(group), radius, exclude=sent_lines)
+        texts[i] = with_additional_excerpts(texts[i], excerpt.text)
+        if i == 0:
+            newly_sent.update(excerpt.lines)
+        context_stats['sent_tokens'] = context_stats.get('sent_tokens', 0) + excerpt.sent_tokens
+    
+    sent_lines = sent_lines | newly_sent
+    context_stats['sent_lines'] = len(sent_lines)
+    session.set_data('sent_lines', sent_lines)
+    session.set_data('context_stats', context_stats)
+    return texts
+
+def set_fix_progress(session, progress: Dict[str, Any]):
+    """Store the project's fix progress and push it to subscribed clients"""
+    session.set_data('fix_progress', progress)
+    event_hub.publish(session.project_id, 'progress', progress)
+
+def report_fix_progress(session, progress: Dict[str, Any]) -> concurrent.futures.Future:
+    """
+    set_fix_progress on the progress writer, for code on the event loop; await the
+    result (asyncio.wrap_future) where later reads depend on the write
+    """
+    return progress_writer.submit(set_fix_progress, session, progress)
+
+def set_fix_error(session, error: str):
+    """Mark the project's fix progress as failed, keeping the counts of the batches done"""
+    set_fix_progress(session, {**session.get_data('fix_progress', {}), 'status': 'error', 'error': error})
+
+def publish_job_event(job: Job, new_snippets: Dict[str, str]):
+    """Push a background job's status and progress with the snippets parsed since its last update"""
+    event_hub.publish(job.project_id, 'job', {**job.to_dict(include_snippets=False), 'newSnippets': new_snippets})
+
+job_queue.listener = publish_job_event
+# Jobs and events reach every worker through the shared session store, if one is configured
+job_queue.store = event_hub.store = session_manager.store
+
+def store_fix_results(
+    session,
+    project_id: str,
+    response: str,
+    code_snippets: Dict[str, str],
+    violation_mapping: Optional[Dict[str, Any]] = None,
+    merge: bool = False
+) -> Dict[str, Any]:
+    """
+    Save parsed snippets and violation mapping of a fix response to the session and disk.
+    With merge=True they are added to the project's existing results instead of replacing them.
+    """
+    # Extract violation mapping
+    if violation_mapping is None:
+        violation_mapping = {}
+        try:
+            violation_mapping = extract_violation_mapping(response)
+        except Exception as e:
+            print(f"Warning: Could not extract violation mapping: {str(e)}")
+    
+    previous_snippets = session.get_data('fixed_snippets', {})
+    if merge:
+        code_snippets = {**previous_snippets, **code_snippets}
+        violation_mapping = {**session.get_data('violation_mapping', {}), **violation_mapping}
+    
+    # Save snippets to session
+    session.set_data('fixed_snippets', code_snippets)
+    session.set_data('fixes_revision', session.get_data('fixes_revision', 0) + 1)
+    session.set_data('violation_mapping', violation_mapping)
+    
+    snippet_file = os.path.join(UPLOAD_FOLDER, f"{project_id}_snippets.json")
+    violation_mapping_file = os.path.join(UPLOAD_FOLDER, f"{project_id}_violation_mapping.json")
+    
+    save_snippets_to_json(code_snippets, snippet_file)
+    save_violation_mapping_to_json(violation_mapping, violation_mapping_file)
+    
+    session.set_data('snippet_file', snippet_file)
+    session.set_data('violation_mapping_file', violation_mapping_file)
+    
+    # Update the in-memory fixed view for immediate diff view
+    document = get_numbered_document(session)
+    if document:
+        document.view(ALL_FIXES_VIEW).sync(code_snippets)
+    session.set_data('temp_fixed_view', ALL_FIXES_VIEW)
+    session.set_data('accepted_view_synced', False)
+    
+    # Push only what changed; clients keep their copy of the snippets
+    event_hub.publish(project_id, 'snippets', {
+        'snippets': {key: content for key, content in code_snippets.items() if previous_snippets.get(key) != content},
+        'removed': [key for key in previous_snippets if key not in code_snippets],
+        'total': len(code_snippets),
+        'revision': session.get_data('fixes_revision')
+    })
+    save_chat_history(session)
+    
+    return {
+        'response': response,
+        'code_snippets': code_snippets
+    }
+
+def fix_cache_key(session, violations: List[Dict[str, Any]], max_batches: int, sessions: int) -> Optional[str]:
+    """Response cache key for fixing violations in the project's current file"""
+    document = get_numbered_document(session)
+    if not document:
+        return None
+    options = {
+        'context_mode': session.get_data('context_mode', 'full'),
+        'context_radius': session.get_data('context_radius', DEFAULT_CONTEXT_RADIUS),
+        'max_batches': max_batches,
+        'sessions': sessions,
+    }
+    model_settings = session.get_data('model_settings', default_model_settings)
+    return make_cache_key(document.content_hash(), violations, model_settings, options)
+
+def apply_fix_memory(session, violations: List[Dict[str, Any]], enabled: bool = True):
+    """
+    Fix violations matching a remembered (rule, line) pattern locally.
+    Returns the FixResult of those fixes and the violations left for the model.
+    """
+    document = get_numbered_document(session)
+    if not enabled or not document or not violations:
+        return FixResult(complete=True), violations
+    
+    code_snippets, violation_mapping, remaining = fix_memory.fix_violations(document.original_lines, violations)
+    result = FixResult(code_snippets=code_snippets, violation_mapping=violation_mapping, complete=True)
+    if violation_mapping:
+        result.responses.append(f"Fixed {len(violation_mapping)} violation(s) from previously accepted fixes.")
+    return result, remaining
+
+def update_fix_memory(session, review_manager: ReviewManager, line_key: str, action: str):
+    """
+    Learn a violation's fix once all of its changed lines are accepted, and forget
+    a remembered fix when a line it produced is rejected.
+    """
+    document = get_numbered_document(session)
+    if not document or action not in ("accept", "reject"):
+        return
+    
+    fixed_snippets = session.get_data('fixed_snippets', {})
+    violations = session.get_data('violations', [])
+    for violation_key, entry in session.get_data('violation_mapping', {}).items():
+        changed_lines = entry.get('changed_lines') or []
+        if line_key not in changed_lines or violation_key not in document.original_lines:
+            continue
+        
+        # Prefer the report's rule name, which is what later lookups use
+        rules = {v.get('misra') for v in violations if str(v.get('line')) == violation_key}
+        rule = rules.pop() if len(rules) == 1 else entry.get('rule')
+        if not rule:
+            continue
+        
+        original_line = document.original_lines[violation_key]
+        if action == "reject" and entry.get('source') == 'memory':
+            fix_memory.forget(rule, original_line)
+        elif action == "accept" and all(key in review_manager.accepted_lines for key in changed_lines):
+            fixed_lines = learnable_fix(violation_key, entry, document.original_lines, fixed_snippets)
+            if fixed_lines and fix_memory.remember(rule, original_line, fixed_lines):
+                print(f"Remembered fix for {rule} on: {original_line.strip()}")
+
+def max_batches_for(request: FixViolationsRequest) -> int:
+    if not request.autoContinue:
+        return 1
+    return max(1, request.maxBatches or MAX_CONTINUATION_BATCHES)
+
+async def process_violations(
+    project_id: str,
+    username: str,
+    violations: List[Dict[str, Any]],
+    max_batches: int = MAX_CONTINUATION_BATCHES,
+    parallel_sessions: Optional[int] = None,
+    use_cache: bool = True,
+    use_fix_memory: bool = True,
+    job: Optional[Job] = None
+) -> Dict[str, Any]:
+    """
+    Fix violations; model calls are awaited on the event loop, while session, cache
+    and file access runs in the thread pool. When run as a background job, its
+    progress and partial snippets are updated after each batch.
+    """
     try:
-        session = session_manager.get_session(project_id)
+        session = await run_blocking(session_manager.get_session, project_id)
         if not session:
             raise Exception("Project not found")
         
-        chat = session.get_chat_session()
+        chat = await run_blocking(get_chat, session)
         if not chat:
             raise Exception("Chat session not found")
         
-        # Format violations for Gemini
-        violations_text = []
-        for v in violations:
-            violations_text.append(
-                f"File: {v['file']}\n"
-                f"Path: {v['path']}\n"
-                f"Line: {v['line']}\n"
-                f"Rule: {v['misra']}\n"
-                f"Message: {v['warning']}\n"
+        document = await run_blocking(get_numbered_document, session)
+        
+        # Repeated patterns with an accepted fix are fixed locally, the rest goes to the model.
+        # Memory is consulted on every run so a fix rejected since is never replayed.
+        memory_result, remaining = await run_blocking(apply_fix_memory, session, violations, use_fix_memory)
+        memory_fixed = len(memory_result.violation_mapping)
+        sessions = sessions_for(len(remaining), parallel_sessions) if document else 1
+        
+        # Same file, remaining violations and model settings as an earlier run: reuse the model's response
+        cache_key = await run_blocking(fix_cache_key, session, remaining, max_batches, sessions) if use_cache and remaining else None
+        cached = await run_blocking(response_cache.get, cache_key) if cache_key else None
+        
+        if cached:
+            print(f"Response cache hit for project {project_id}")
+            result = FixResult.from_dict(cached)
+        elif remaining:
+            # Split large violation lists by file region across parallel chat sessions
+            if sessions > 1:
+                violation_groups = partition_violations(remaining, await run_blocking(document.region_index), sessions)
+            else:
+                violation_groups = [remaining]
+            print(f"Processing {len(remaining)} violations for project {project_id} in {len(violation_groups)} session(s), {memory_fixed} fixed from memory")
+            
+            def report_progress(partial: FixResult):
+                progress = partial.progress('running')
+                report_fix_progress(session, progress)
+                if job:
+                    job.report(progress, {**memory_result.code_snippets, **partial.code_snippets})
+            
+            # Send to Gemini, requesting further batches while it reports '--- CONTINUED ---'
+            report_progress(FixResult(sessions=len(violation_groups)))
+            result, chat = await run_fix_parallel(
+                chat,
+                await run_blocking(build_violation_prompts, session, violation_groups),
+                max_batches=max_batches,
+                on_batch=report_progress
             )
+            session.set_chat_session(chat)
+            # Only the model's fixes are cached; memory fixes are looked up fresh each run
+            if cache_key:
+                await run_blocking(response_cache.put, cache_key, result.to_dict())
+        else:
+            print(f"All {len(violations)} violations for project {project_id} fixed from memory")
+            result = memory_result
         
-        violations_str = "\n".join(violations_text)
-        print(f"Processing {len(violations)} violations for project {project_id}")
-        
-        # Send to Gemini
-        response = send_misra_violations(chat, violations_str)
-        
-        if response is None:
-            raise Exception("Response was blocked by safety filters")
-        
-        # Extract code snippets
-        code_snippets = extract_snippets_from_response(response)
-        
-        # Extract violation mapping
-        violation_mapping = {}
-        try:
-            violation_mapping = extract_violation_mapping(response)
-        except Exception as e:
-            print(f"Warning: Could not extract violation mapping: {str(e)}")
-        
-        # Save snippets to session
-        session.set_data('fixed_snippets', code_snippets)
-        session.set_data('violation_mapping', violation_mapping)
-        
-        snippet_file = os.path.join(UPLOAD_FOLDER, f"{project_id}_snippets.json")
-        violation_mapping_file = os.path.join(UPLOAD_FOLDER, f"{project_id}_violation_mapping.json")
-        
-        save_snippets_to_json(code_snippets, snippet_file)
-        save_violation_mapping_to_json(violation_mapping, violation_mapping_file)
-        
-        session.set_data('snippet_file', snippet_file)
-        session.set_data('violation_mapping_file', violation_mapping_file)
+        if memory_fixed and remaining:
+            model_sessions = result.sessions
+            result = FixResult.combine([memory_result, result])
+            result.sessions = model_sessions
         
-        # Create temporary fixed files for immediate diff view
-        numbered_file = session.get_data('numbered_file')
-        if numbered_file:
-            temp_fixed_numbered_path, temp_fixed_denumbered_path = create_temp_fixed_denumbered_file(
-                numbered_file, code_snippets, project_id, UPLOAD_FOLDER
-            )
-            session.set_data('temp_fixed_numbered', temp_fixed_numbered_path)
-            session.set_data('temp_fixed_denumbered', temp_fixed_denumbered_path)
-        
-        return {
-            'response': response,
-            'code_snippets': code_snippets
-        }
+        stored = await run_blocking(store_fix_results, session, project_id, result.response, result.code_snippets, result.violation_mapping)
+        progress = {**result.progress('completed'), 'cached': cached is not None, 'memory_fixed': memory_fixed}
+        await asyncio.wrap_future(report_fix_progress(session, progress))
+        if job:
+            job.report(progress, result.code_snippets)
+        return {**stored, 'cached': cached is not None}
         
     except Exception as e:
         print(f"Error processing violations for project {project_id}: {str(e)}")
+        session = await run_blocking(session_manager.get_session, project_id)
+        if session:
+            await asyncio.wrap_future(progress_writer.submit(set_fix_error, session, str(e)))
         raise e
 
-@app.post("/api/gemini/fix-violations", response_model=FixViolationsResponse)
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/gemini/fix-violations/stream")
+async def gemini_fix_violations_stream(request: FixViolationsRequest):
+    """
+    Streaming variant of fix-violations using Server-Sent Events.
+    
+    Events: 'chunk' (raw response text), 'snippets' (snippets from each newly
+    completed code block), 'batch' (progress after each continuation batch),
+    'done' (final result) and 'error'. Always uses the project's single chat session;
+    parallelSessions only applies to the non-streaming endpoint. A cached response
+    is replayed as a single 'snippets' event followed by 'done'. Violations fixed
+    from the fix memory arrive in a first 'snippets' event before the model's output.
+    """
+    project_id = request.projectId
+    session = await run_blocking(session_manager.get_session, project_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    chat = await run_blocking(get_chat, session)
+    if not chat:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    
+    max_batches = max_batches_for(request)
+    # Memory fixes are looked up fresh each run; only the model's response for the rest is cached
+    memory_result, remaining = await run_blocking(apply_fix_memory, session, request.violations, request.useFixMemory)
+    cache_key = await run_blocking(fix_cache_key, session, remaining, max_batches, 1) if request.useCache and remaining else None
+    cached = await run_blocking(response_cache.get, cache_key) if cache_key else None
+    violations_str = (await run_blocking(build_violation_prompts, session, [remaining]))[0] if remaining and not cached else None
+    print(f"Streaming {len(request.violations)} violations for project {project_id} and user {request.username}")
+    
+    async def cached_event_stream():
+        result = FixResult.from_dict(cached)
+        if memory_result.violation_mapping:
+            result = FixResult.combine([memory_result, result])
+            result.sessions = 1
+        stored = await run_blocking(store_fix_results, session, project_id, result.response, result.code_snippets, result.violation_mapping)
+        await asyncio.wrap_future(report_fix_progress(session, {**result.progress('completed'), 'cached': True}))
+        yield sse_event('snippets', {'snippets': result.code_snippets})
+        yield sse_event('done', {
+            'response': stored['response'],
+            'codeSnippets': [{"code": snippet} for snippet in stored['code_snippets'].values()],
+            'cached': True
+        })
+    
+    async def event_stream():
+        result = FixResult(complete=violations_str is None)
+        report_fix_progress(session, result.progress('running'))
+        try:
+            if memory_result.code_snippets:
+                yield sse_event('snippets', {'snippets': memory_result.code_snippets})
+            
+            chunks = send_misra_violations_stream(chat, violations_str) if violations_str else None
+            while chunks is not None:
+                parser = SnippetStreamParser()
+                async for text in chunks:
+                    yield sse_event('chunk', {'text': text})
+                    new_snippets = parser.feed(text)
+                    if new_snippets:
+                        yield sse_event('snippets', {'snippets': new_snippets})
+                
+                if not parser.text:
+                    raise Exception("Response was blocked by safety filters")
+                
+                result.add_batch(parser.text, parser.snippets)
+                report_fix_progress(session, result.progress('running'))
+                yield sse_event('batch', result.progress('running'))
+                
+                if result.complete or result.batches >= max_batches:
+                    break
+                chunks = send_continuation_stream(chat)
+            
+            if cache_key:
+                await run_blocking(response_cache.put, cache_key, result.to_dict())
+            if memory_result.violation_mapping:
+                result = FixResult.combine([memory_result, result])
+                result.sessions = 1
+            stored = await run_blocking(store_fix_results, session, project_id, result.response, result.code_snippets, result.violation_mapping)
+            await asyncio.wrap_future(report_fix_progress(session, result.progress('completed')))
+            yield sse_event('done', {
+                'response': stored['response'],
+                'codeSnippets': [{"code": snippet} for snippet in stored['code_snippets'].values()],
+                'cached': False
+            })
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client disconnected: don't leave the progress 'running' for pollers
+            print(f"Streaming violations for project {project_id} cancelled")
+            report_fix_progress(session, result.progress('cancelled'))
+            raise
+        except Exception as e:
+            print(f"Error streaming violations for project {project_id}: {str(e)}")
+            report_fix_progress(session, {**result.progress('error'), 'error': str(e)})
+            yield sse_event('error', {'detail': str(e)})
+    
+    return StreamingResponse(
+        cached_event_stream() if cached else event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/gemini/fix-violations", response_model=Union[FixViolationsResponse, JobResponse])
 async def gemini_fix_violations(request: FixViolationsRequest):
+    """
+    Fix violations and return the result, or with background=True return a job ID
+    at once and run the fix in the job queue (poll GET /api/jobs/{job_id}).
+    """
     try:
         project_id = request.projectId
         username = request.username
         violations = request.violations
         
-        print(f"Starting async violation processing for project {project_id} and user {username}")
-        
-        # Process violations in thread pool for true concurrency
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            executor, 
-            process_violations_sync, 
-            project_id, 
-            username,
-            violations
-        )
+        async def run(job: Optional[Job] = None) -> Dict[str, Any]:
+            # Awaited on the event loop: concurrent requests are not limited by a thread pool
+            result = await process_violations(
+                project_id, 
+                username,
+                violations,
+                max_batches_for(request),
+                request.parallelSessions,
+                request.useCache,
+                request.useFixMemory,
+                job
+            )
+            return FixViolationsResponse(
+                response=result['response'],
+                codeSnippets=[{"code": snippet} for snippet in result['code_snippets'].values()],
+                cached=result['cached']
+            ).dict()
+        
+        if request.background:
+            if not await run_blocking(session_manager.get_session, project_id):
+                raise HTTPException(status_code=404, detail="Project not found")
+            job = job_queue.submit('fix-violations', project_id, run)
+            print(f"Queued violation processing job {job.id} for project {project_id} and user {username}")
+            return JobResponse(jobId=job.id, status=job.status)
         
-        return FixViolationsResponse(
-            response=result['response'],
-            codeSnippets=[{"code": snippet} for snippet in result['code_snippets'].values()]
-        )
+        print(f"Starting async violation processing for project {project_id} and user {username}")
+        return FixViolationsResponse(**await run())
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in gemini_fix_violations: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
@@ -467,19 +1060,17 @@ async def process_apply_fixes(request: ApplyFixesRequest):
         if not session:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        numbered_file = session.get_data('numbered_file')
+        document = get_numbered_document(session)
+        if not document:
+            raise HTTPException(status_code=404, detail="Numbered file not found")
+        
         fixed_snippets = session.get_data('fixed_snippets', {})
         original_filename = session.get_data('original_filename', 'file.cpp')
         
-        # Apply fixes
+        # Apply fixes and write the final file without line numbers
         fixed_filename = f"fixed_{original_filename}"
-        fixed_numbered_path = os.path.join(UPLOAD_FOLDER, f"{project_id}_fixed_numbered_{original_filename}")
-        
-        merge_fixed_snippets_into_file(numbered_file, fixed_snippets, fixed_numbered_path)
-        
-        # Remove line numbers for final file
         final_fixed_path = os.path.join(UPLOAD_FOLDER, f"{project_id}_{fixed_filename}")
-        remove_line_numbers(fixed_numbered_path, final_fixed_path)
+        document.write_denumbered(final_fixed_path, fixed_snippets)
         
         # Update session
         session.set_data('fixed_file', final_fixed_path)
@@ -511,61 +1102,61 @@ async def download_fixed_file(projectId: str = Query(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def process_chat_message_sync(project_id: str, username: str, message: str) -> str:
-    """Synchronous chat processing - runs in thread pool"""
+async def process_chat_message(project_id: str, username: str, message: str) -> str:
+    """Chat processing; the model call is awaited on the event loop, session and file access runs in the thread pool"""
     try:
-        session = session_manager.get_session(project_id)
+        session = await run_blocking(session_manager.get_session, project_id)
         if not session:
             raise Exception("Project not found")
         
-        chat_session = session.get_chat_session()
+        chat_session = await run_blocking(get_chat, session)
         if not chat_session:
             raise Exception("Chat session not found")
         
         # Send message to Gemini
-        response = chat_session.send_message(message)
+        response = await chat_session.send_message_async(message)
         
         # Check if response is None or blocked
         if response is None or response.text is None:
             raise Exception("Response was blocked by safety filters")
         
-        # Extract code snippets from response and save to session
+        # Extract code snippets from response and add them to the project's snippets,
+        # so a manual 'next' adds a batch instead of replacing the earlier ones
         code_snippets = extract_snippets_from_response(response.text)
+        violation_mapping = {}
+        try:
+            violation_mapping = extract_violation_mapping(response.text)
+        except ValueError:
+            pass
         
-        # Save snippets to session (same as fix-violations endpoint)
-        session.set_data('fixed_snippets', code_snippets)
-        snippet_file = os.path.join(UPLOAD_FOLDER, f"{project_id}_snippets.json")
-        save_snippets_to_json(code_snippets, snippet_file)
-        session.set_data('snippet_file', snippet_file)
-        
-        # Update temporary fixed file for real-time diff view
-        numbered_file = session.get_data('numbered_file')
-        if numbered_file:
-            temp_fixed_numbered_path, temp_fixed_denumbered_path = create_temp_fixed_denumbered_file(
-                numbered_file, code_snippets, project_id, UPLOAD_FOLDER
-            )
-            session.set_data('temp_fixed_numbered', temp_fixed_numbered_path)
-            session.set_data('temp_fixed_denumbered', temp_fixed_denumbered_path)
+        await run_blocking(store_fix_results, session, project_id, response.text, code_snippets, violation_mapping, merge=True)
         
         return response.text
         
     except Exception as e:
         raise e
 
-@app.post("/api/chat", response_model=ChatResponse)
+@app.post("/api/chat", response_model=Union[ChatResponse, JobResponse])
 async def chat(request: ChatRequest):
     try:
         message = request.message
         project_id = request.projectId
         username = request.username
         
+        if request.background:
+            if not await run_blocking(session_manager.get_session, project_id):
+                raise HTTPException(status_code=404, detail="Project not found")
+            
+            async def run(job: Job) -> Dict[str, Any]:
+                return {'response': await process_chat_message(project_id, username, message)}
+            
+            job = job_queue.submit('chat', project_id, run)
+            print(f"Queued chat job {job.id} for project {project_id} and user {username}")
+            return JobResponse(jobId=job.id, status=job.status)
+        
         print(f"Starting async chat processing for project {project_id} and user {username}")
         
-        # Process chat message in thread pool for concurrency
-        loop = asyncio.get_event_loop()
-        response_text = await loop.run_in_executor(
-            executor, 
-            process_chat_message_sync, 
+        response_text = await process_chat_message(
             project_id, 
             username,
             message
@@ -573,6 +1164,8 @@ async def chat(request: ChatRequest):
         
         return ChatResponse(response=response_text)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -591,16 +1184,11 @@ async def get_numbered_file(project_id: str):
         if not session:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        numbered_file = session.get_data('numbered_file')
-        
-        if not numbered_file or not os.path.exists(numbered_file):
+        document = get_numbered_document(session)
+        if not document:
             raise HTTPException(status_code=404, detail="Numbered file not found")
         
-        content = get_file_content(numbered_file)
-        if content is None:
-            raise HTTPException(status_code=500, detail="Failed to read numbered file")
-        
-        return content
+        return document.numbered_text()
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -612,27 +1200,23 @@ async def get_temp_fixed_file(project_id: str):
         if not session:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        temp_fixed_numbered_path = session.get_data('temp_fixed_numbered')
-        
-        if not temp_fixed_numbered_path or not os.path.exists(temp_fixed_numbered_path):
-            fixed_snippets = session.get_data('fixed_snippets', {})
-            numbered_file = session.get_data('numbered_file')
-            
-            if not numbered_file:
-                raise HTTPException(status_code=404, detail="Numbered file not found")
-            
-            temp_fixed_numbered_path, temp_fixed_denumbered_path = create_temp_fixed_denumbered_file(
-                numbered_file, fixed_snippets, project_id, UPLOAD_FOLDER
-            )
-            
-            session.set_data('temp_fixed_numbered', temp_fixed_numbered_path)
-            session.set_data('temp_fixed_denumbered', temp_fixed_denumbered_path)
+        document = get_numbered_document(session)
+        if not document:
+            raise HTTPException(status_code=404, detail="Numbered file not found")
         
-        content = get_file_content(temp_fixed_numbered_path)
-        if content is None:
-            raise HTTPException(status_code=500, detail="Failed to read temporary fixed file")
+        # Show whichever view was last updated: all fixes, or only accepted ones during review
+        view_name = session.get_data('temp_fixed_view', ALL_FIXES_VIEW)
+        view = document.view(view_name)
+        if view_name == ALL_FIXES_VIEW:
+            view.sync(session.get_data('fixed_snippets', {}))
+        else:
+            # Picks up other workers' review changes first, marking the view stale
+            review_manager = get_review_manager(session)
+            if session.get_data('accepted_view_synced') != document.instance_id:
+                view.sync(review_manager.get_accepted_snippets(session.get_data('fixed_snippets', {})))
+                session.set_data('accepted_view_synced', document.instance_id)
         
-        return content
+        return view.numbered_text()
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -644,21 +1228,26 @@ async def get_diff(project_id: str):
         if not session:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        original_file = session.get_data('cpp_file')
         fixed_snippets = session.get_data('fixed_snippets', {})
-        numbered_file = session.get_data('numbered_file')
+        document = get_numbered_document(session)
         
-        if not original_file or not numbered_file:
+        if not document:
             raise HTTPException(status_code=404, detail="Required files not found")
         
-        temp_fixed_numbered_path, temp_fixed_denumbered_path = create_temp_fixed_denumbered_file(
-            numbered_file, fixed_snippets, project_id, UPLOAD_FOLDER
-        )
-        
-        diff_data = create_diff_data(original_file, temp_fixed_denumbered_path, fixed_snippets)
+        view = document.view(ALL_FIXES_VIEW)
+        view.sync(fixed_snippets)
+        session.set_data('temp_fixed_view', ALL_FIXES_VIEW)
         
-        session.set_data('temp_fixed_numbered', temp_fixed_numbered_path)
-        session.set_data('temp_fixed_denumbered', temp_fixed_denumbered_path)
+        # The diff only changes when new fixes are stored
+        revision = (document.content_hash(), session.get_data('fixes_revision', 0))
+        cached_diff = session.get_data('diff_cache')
+        if cached_diff and cached_diff[0] == revision:
+            diff_data = cached_diff[1]
+        else:
+            diff_data = create_diff_data_from_content(
+                document.original_text(), view.denumbered_text(), fixed_snippets
+            )
+            session.set_data('diff_cache', (revision, diff_data))
         
         return DiffResponse(**diff_data)
         
@@ -675,7 +1264,7 @@ async def get_review_state(project_id: str):
         
         fixed_snippets = session.get_data('fixed_snippets', {})
         
-        review_manager = ReviewManager(project_id, UPLOAD_FOLDER)
+        review_manager = get_review_manager(session)
         fixes = review_manager.get_fix_list(fixed_snippets)
         summary = review_manager.get_review_summary(fixed_snippets)
         
@@ -695,7 +1284,7 @@ async def review_action(request: ReviewActionRequest):
         if not session:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        review_manager = ReviewManager(project_id, UPLOAD_FOLDER)
+        review_manager = get_review_manager(session)
         
         if action == "accept":
             review_manager.accept_line(line_key)
@@ -706,17 +1295,30 @@ async def review_action(request: ReviewActionRequest):
         else:
             raise HTTPException(status_code=400, detail="Invalid action")
         
-        # Update temporary files with only accepted changes
-        fixed_snippets = session.get_data('fixed_snippets', {})
-        numbered_file = session.get_data('numbered_file')
+        update_fix_memory(session, review_manager, line_key, action)
         
-        if numbered_file:
-            accepted_snippets = review_manager.get_accepted_snippets(fixed_snippets)
-            temp_fixed_numbered_path, temp_fixed_denumbered_path = create_temp_fixed_denumbered_file(
-                numbered_file, accepted_snippets, project_id, UPLOAD_FOLDER
-            )
-            session.set_data('temp_fixed_numbered', temp_fixed_numbered_path)
-            session.set_data('temp_fixed_denumbered', temp_fixed_denumbered_path)
+        # Patch the accepted-fixes view with just this line's change
+        fixed_snippets = session.get_data('fixed_snippets', {})
+        document = get_numbered_document(session)
+        
+        if document:
+            # The view can only be patched if this process's copy was the one last synced
+            view = document.view(ACCEPTED_FIXES_VIEW)
+            if session.get_data('accepted_view_synced') == document.instance_id:
+                view.update(line_key, fixed_snippets.get(line_key) if action == "accept" else None)
+            else:
+                view.sync(review_manager.get_accepted_snippets(fixed_snippets))
+                session.set_data('accepted_view_synced', document.instance_id)
+            # Only written when it changes, so a shared store isn't written on every click
+            if session.get_data('temp_fixed_view') != ACCEPTED_FIXES_VIEW:
+                session.set_data('temp_fixed_view', ACCEPTED_FIXES_VIEW)
+        
+        # Only the changed line and the counts; subscribers patch their review list
+        event_hub.publish(project_id, 'review', {
+            'line_key': line_key,
+            'status': review_manager.get_line_status(line_key),
+            'summary': review_manager.get_review_summary(fixed_snippets)
+        })
         
         return {"success": True, "message": f"Line {line_key} {action}ed successfully"}
         
@@ -733,14 +1335,167 @@ async def navigate_review(request: NavigationRequest):
         if not session:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        review_manager = ReviewManager(project_id, UPLOAD_FOLDER)
+        review_manager = get_review_manager(session)
         review_manager.set_current_review_index(index)
+        event_hub.publish(project_id, 'review', {'current_index': index})
         
         return {"success": True, "current_index": index}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def project_snapshot(project_id: str) -> Dict[str, Any]:
+    """Fix progress, review summary, fixes revision and active jobs sent to a new WebSocket"""
+    session = session_manager.get_session(project_id)
+    snapshot = {'fix_progress': None, 'review_summary': None, 'fixes_revision': 0}
+    if session:
+        fixed_snippets = session.get_data('fixed_snippets', {})
+        snapshot = {
+            'fix_progress': session.get_data('fix_progress'),
+            'review_summary': get_review_manager(session).get_review_summary(fixed_snippets),
+            'fixes_revision': session.get_data('fixes_revision', 0)
+        }
+    snapshot['jobs'] = [job.to_dict(include_snippets=False) for job in job_queue.list(project_id) if not job.finished]
+    return snapshot
+
+@app.websocket("/ws/projects/{project_id}")
+async def project_events(websocket: WebSocket, project_id: str):
+    """
+    Push channel of one project. Sends a 'snapshot' event on connect, then
+    'progress' (fix batches), 'job' (background job updates with newly parsed
+    snippets), 'snippets' (changed fixes), 'review' (review-state deltas) and
+    'resync' (the client fell behind and should refetch). Clients may send
+    'ping' to receive a 'pong'.
+    """
+    await websocket.accept()
+    queue = event_hub.subscribe(project_id)
+    
+    async def forward_events():
+        while True:
+            await websocket.send_json(await queue.get())
+    
+    sender = None
+    try:
+        snapshot = await run_blocking(project_snapshot, project_id)
+        await websocket.send_json({'event': 'snapshot', 'projectId': project_id, 'seq': 0, 'data': snapshot})
+        
+        sender = asyncio.create_task(forward_events())
+        while True:
+            message = await websocket.receive_text()
+            if message == 'ping':
+                await websocket.send_json({'event': 'pong', 'projectId': project_id})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if sender:
+            sender.cancel()
+        event_hub.unsubscribe(project_id, queue)
+
+@app.get("/api/chat/metrics")
+async def get_chat_metrics():
+    """Chats restored from persisted history versus started with a full file intro"""
+    return chat_metrics.stats()
+
+@app.get("/api/sessions/stats")
+async def get_session_stats():
+    """Session store backend, the sessions held by this worker and their memory use"""
+    return session_manager.store_stats()
+
+@app.get("/api/review/persistence/stats")
+async def get_review_persistence_stats():
+    """Review state saves scheduled versus files actually written"""
+    return review_writer.stats()
+
+@app.get("/api/events/stats")
+async def get_event_stats():
+    """WebSocket subscribers and published/dropped event counters"""
+    return event_hub.stats()
+
+@app.get("/api/gemini/fix-progress/{project_id}")
+async def get_fix_progress(project_id: str):
+    """Batch progress of the project's current or last fix-violations run"""
+    session = session_manager.get_session(project_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    return session.get_data('fix_progress', {'status': 'idle', 'batches_done': 0, 'snippets_count': 0, 'complete': False})
+
+@app.get("/api/gemini/context-stats/{project_id}")
+async def get_context_stats(project_id: str):
+    """Estimated file tokens sent to the chat so far compared with sending the whole file"""
+    session = session_manager.get_session(project_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    context_stats = session.get_data('context_stats')
+    if not context_stats:
+        raise HTTPException(status_code=404, detail="No file has been sent to the chat yet")
+    
+    full_tokens = context_stats['full_file_tokens']
+    saved = full_tokens - context_stats['sent_tokens']
+    return {**context_stats, 'saved_tokens': saved, 'saved_percent': round(100 * saved / full_tokens, 1) if full_tokens else 0.0}
+
+@app.get("/api/jobs")
+async def list_jobs(projectId: Optional[str] = Query(None)):
+    """Retained background jobs (optionally of one project) and job queue counters"""
+    jobs = await run_blocking(job_queue.list, projectId)
+    return {
+        'jobs': [job.to_dict(include_snippets=False) for job in jobs],
+        'stats': job_queue.stats()
+    }
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, includeSnippets: bool = Query(True)):
+    """Status, batch progress, partial snippets and, once finished, the result or error of a job"""
+    job = await run_blocking(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return job.to_dict(include_snippets=includeSnippets)
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    job = await run_blocking(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    cancelled = await run_blocking(job_queue.cancel, job_id)
+    return {"success": cancelled, "status": "cancelling" if cancelled else job.status}
+
+@app.get("/api/cache/responses/stats")
+async def get_response_cache_stats():
+    """Hit/miss counters and size of the fix response cache"""
+    return response_cache.stats()
+
+@app.delete("/api/cache/responses")
+async def clear_response_cache():
+    """Drop all cached fix responses"""
+    try:
+        removed = response_cache.clear()
+        return {"message": "Response cache cleared", "removed": removed}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/cache/models/stats")
+async def get_model_cache_stats():
+    """Hit/miss counters of the GenerativeModel cache and the setup time it saved"""
+    return model_cache.stats()
+
+@app.get("/api/fix-memory/stats")
+async def get_fix_memory_stats():
+    """Lookup counters and size of the accepted-fix memory"""
+    return fix_memory.stats()
+
+@app.delete("/api/fix-memory")
+async def clear_fix_memory():
+    """Forget all remembered fixes"""
+    try:
+        removed = fix_memory.clear()
+        return {"message": "Fix memory cleared", "removed": removed}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/code-snippets/{project_id}")
 async def get_code_snippets(project_id: str):
     try:
@@ -774,8 +1529,14 @@ async def reset_review(project_id: str):
         if not session:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        review_manager = ReviewManager(project_id, UPLOAD_FOLDER)
+        review_manager = get_review_manager(session)
         review_manager.reset_review()
+        session.set_data('accepted_view_synced', False)
+        
+        event_hub.publish(project_id, 'review', {
+            'reset': True,
+            'summary': review_manager.get_review_summary(session.get_data('fixed_snippets', {}))
+        })
         
         return {"success": True, "message": "Review state reset successfully"}
         
@@ -791,23 +1552,27 @@ async def process_apply_accepted_fixes(request: ApplyFixesRequest):
         if not session:
             raise HTTPException(status_code=404, detail="Project not found")
         
-        numbered_file = session.get_data('numbered_file')
+        document = get_numbered_document(session)
+        if not document:
+            raise HTTPException(status_code=404, detail="Numbered file not found")
+        
         all_fixed_snippets = session.get_data('fixed_snippets', {})
         original_filename = session.get_data('original_filename', 'file.cpp')
         
         # Get only accepted snippets
-        review_manager = ReviewManager(project_id, UPLOAD_FOLDER)
+        review_manager = get_review_manager(session)
         accepted_snippets = review_manager.get_accepted_snippets(all_fixed_snippets)
         
-        # Apply only accepted fixes
-        fixed_filename = f"fixed_{original_filename}"
-        fixed_numbered_path = os.path.join(UPLOAD_FOLDER, f"{project_id}_fixed_numbered_{original_filename}")
+        # Apply only accepted fixes; the accepted view is usually already up to date
+        view = document.view(ACCEPTED_FIXES_VIEW)
+        view.sync(accepted_snippets)
+        session.set_data('accepted_view_synced', document.instance_id)
         
-        merge_fixed_snippets_into_file(numbered_file, accepted_snippets, fixed_numbered_path)
-        
-        # Remove line numbers for final file
+        # Write the final file without line numbers
+        fixed_filename = f"fixed_{original_filename}"
         final_fixed_path = os.path.join(UPLOAD_FOLDER, f"{project_id}_{fixed_filename}")
-        remove_line_numbers(fixed_numbered_path, final_fixed_path)
+        with open(final_fixed_path, 'w', encoding='utf-8') as f:
+            f.write(view.denumbered_text())
         
         # Update session
         session.set_data('fixed_file', final_fixed_path)
@@ -0,0 +1,87 @@
+"""
+Benchmark for parsing the "Line and Warning" column of a MISRA report.
+
+Compares the previous row-by-row ``DataFrame.apply`` + ``iterrows`` path with the
+vectorized ``excel_utils.violations_from_frame`` path on a synthetic report.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_line_warning --rows 500000
+"""
+
+import argparse
+import re
+import time
+
+import pandas as pd
+
+from excel_utils import violations_from_frame
+
+
+def make_report_frame(rows: int, files: int = 2000) -> pd.DataFrame:
+    """Build a synthetic report DataFrame with the same columns as a real export"""
+    file_names = [f"module_{i % files}.cpp" for i in range(rows)]
+    return pd.DataFrame({
+        'Path': [f"/src/components/{name}" for name in file_names],
+        'File': file_names,
+        'Line and Warning': [
+            f"[Line {(i * 7) % 40000 + 1}] Implicit conversion changes signedness ({i})"
+            if i % 50 else f"Unparsed warning text {i}"
+            for i in range(rows)
+        ],
+        'Level': ['Required' if i % 3 else 'Advisory' for i in range(rows)],
+        'Misra': [f"Rule_{i % 20}_{i % 7}" for i in range(rows)],
+    })
+
+
+def legacy_violations_from_frame(df: pd.DataFrame) -> list:
+    """The original per-row implementation, kept for comparison"""
+    def parse_line_warning(text):
+        match = re.match(r"\[Line (\d+)\]\s*(.+)", str(text))
+        return (int(match.group(1)), match.group(2)) if match else (None, text)
+
+    df = df.copy()
+    df[['Line', 'Warning']] = df['Line and Warning'].apply(lambda x: pd.Series(parse_line_warning(x)))
+
+    violations = []
+    for _, row in df.iterrows():
+        violations.append({
+            'file': row['File'],
+            'path': row['Path'],
+            'line': row['Line'],
+            'warning': row['Warning'],
+            'level': row['Level'],
+            'misra': row['Misra']
+        })
+    return violations
+
+
+def time_it(func, df: pd.DataFrame) -> float:
+    start = time.perf_counter()
+    func(df)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500000, help='number of synthetic report rows')
+    parser.add_argument('--skip-legacy', action='store_true', help='only time the vectorized path')
+    args = parser.parse_args()
+
+    df = make_report_frame(args.rows)
+    print(f"Synthetic report: {args.rows} rows")
+
+    results = {}
+    if not args.skip_legacy:
+        results['legacy (apply + iterrows)'] = time_it(legacy_violations_from_frame, df)
+    results['vectorized (str.extract + column zip)'] = time_it(violations_from_frame, df)
+
+    for name, elapsed in results.items():
+        print(f"{name:<40} {elapsed:8.2f} s  {args.rows / elapsed:>12,.0f} rows/s")
+
+    if len(results) == 2:
+        legacy, vectorized = results.values()
+        print(f"Speedup: {legacy / vectorized:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark for merging fixed snippets into a numbered file.
+
+Compares the previous merge (uncompiled regex per line, dict copy, regex-keyed
+sort of all keys) with the single-pass merge in ``replace.merge_fixed_snippets``,
+both for the file-based ``merge_fixed_snippets_into_file`` and for the
+in-memory ``NumberedDocument`` used by the review endpoints.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_merge --lines 50000 --fixes 2000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import tempfile
+import time
+
+from numbered_document import NumberedDocument
+from replace import merge_fixed_snippets_into_file
+
+
+def legacy_merge_into_file(original_file: str, fixes_dict: dict, output_file: str):
+    """The original implementation, kept for comparison"""
+    with open(original_file, "r", encoding="utf-8") as f:
+        original_lines = {}
+        for line in f:
+            match = re.match(r"^(\d+[a-zA-Z]*):(.*)$", line.rstrip('\n'))
+            if match:
+                original_lines[match.group(1).strip()] = match.group(2)
+
+    merged_lines = original_lines.copy()
+    for lineno, fixed_code in fixes_dict.items():
+        merged_lines[lineno] = fixed_code
+
+    def line_sort_key(k):
+        num_part = int(re.match(r"(\d+)", k).group(1))
+        suffix = re.sub(r"\d+", "", k)
+        return (num_part, suffix)
+
+    sorted_keys = sorted(merged_lines.keys(), key=line_sort_key)
+
+    with open(output_file, "w", encoding="utf-8") as f:
+        for lineno in sorted_keys:
+            f.write(f"{lineno}:{merged_lines[lineno]}\n")
+
+
+def make_fixes(lines: int, count: int, seed: int = 15) -> dict:
+    """Mix of replaced lines and inserted lines (suffix keys)"""
+    rng = random.Random(seed)
+    fixes = {}
+    for base in rng.sample(range(1, lines + 1), count):
+        fixes[str(base)] = f"    fixed_line_{base} = static_cast<int32_t>(value);"
+        if rng.random() < 0.3:
+            fixes[f"{base}a"] = f"    inserted_after_{base}();"
+    return fixes
+
+
+def best_of(repeat: int, func, *args) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=50000, help='lines in the synthetic C++ file')
+    parser.add_argument('--fixes', type=int, default=2000, help='number of fixed lines')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per case (best time is reported)')
+    args = parser.parse_args()
+
+    source = "".join(f"    int32_t value_{i} = compute({i});\n" for i in range(1, args.lines + 1))
+    fixes = make_fixes(args.lines, args.fixes)
+    document = NumberedDocument.from_text(source)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        numbered_path = os.path.join(workdir, "numbered.txt")
+        legacy_out = os.path.join(workdir, "legacy.txt")
+        new_out = os.path.join(workdir, "new.txt")
+        document.write_numbered(numbered_path)
+
+        results = {
+            'legacy file merge': best_of(args.repeat, legacy_merge_into_file, numbered_path, fixes, legacy_out),
+            'single-pass file merge': best_of(args.repeat, merge_fixed_snippets_into_file, numbered_path, fixes, new_out),
+            'in-memory document merge': best_of(args.repeat, document.merged_numbered_text, fixes),
+        }
+
+        with open(legacy_out, encoding="utf-8") as a, open(new_out, encoding="utf-8") as b:
+            assert a.read() == b.read() == document.merged_numbered_text(fixes), "merge outputs differ"
+
+    print(f"{args.lines} lines, {len(fixes)} fixed line keys")
+    legacy = results['legacy file merge']
+    for name, elapsed in results.items():
+        print(f"{name:<28} {elapsed * 1000:9.1f} ms  ({legacy / elapsed:5.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
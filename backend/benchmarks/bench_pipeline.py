@@ -0,0 +1,182 @@
+"""
+End-to-end throughput benchmark of the fix pipeline API.
+
+Drives upload -> add-line-numbers -> first-prompt -> fix-violations -> review
+actions -> apply-accepted-fixes against the FastAPI app in-process, with
+synthetic C++ files and MISRA reports and the offline fake Gemini backend, for
+several projects concurrently. Reports per-stage p50/p95/p99 latency, overall
+requests/second and peak memory for each file size.
+
+The fake backend's latency defaults to zero so the numbers reflect the app's
+own hot paths; pass --latency-ms / --tokens-per-second to model a real LLM.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_pipeline --lines 1000,10000,100000 --projects 8 --violations 200
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+from openpyxl import Workbook
+
+RULES = ("Rule_5_0_4", "Rule_6_4_1", "Rule_0_1_3", "Rule_7_1_1", "Rule_10_1")
+
+
+def make_source(lines: int) -> bytes:
+    """Functions of about 40 lines with casts and literals the fake backend can 'fix'"""
+    out = ["#include <cstdint>", "typedef std::uint32_t U32;", ""]
+    function = 0
+    while len(out) < lines:
+        out += [f"U32 compute_{function}(U32 value)", "{", "    U32 total = 0;"]
+        out += [f"    total = total + (U32)value * {i};" for i in range(1, 36)]
+        out += ["    return total;", "}", ""]
+        function += 1
+    return ("\n".join(out[:lines]) + "\n").encode("utf-8")
+
+
+def make_report(target_file: str, lines: int, violations: int) -> bytes:
+    """XLSX report with `violations` rows for the target file and some for other files"""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["Path", "File", "Line and Warning", "Level", "Misra", "Status"])
+    step = max(1, lines // max(1, violations))
+    for i in range(violations):
+        line = 4 + (i * step) % max(1, lines - 4)
+        sheet.append([f"/src/{target_file}", target_file, f"[Line {line}] C-style cast used", "Required", RULES[i % len(RULES)], "Open"])
+    for i in range(violations // 4):
+        sheet.append(["/src/other.cpp", "other.cpp", f"[Line {i + 1}] unused value", "Advisory", RULES[0], "Open"])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class StageTimer:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.requests = 0
+
+    async def call(self, stage: str, request):
+        start = time.perf_counter()
+        response = await request
+        self.latencies[stage].append(time.perf_counter() - start)
+        self.requests += 1
+        if response.status_code != 200:
+            raise RuntimeError(f"{stage} failed with {response.status_code}: {response.text[:200]}")
+        return response
+
+
+async def run_project(client, timer: StageTimer, project_id: str, source: bytes, report: bytes, reviews: int):
+    target_file = "bench.cpp"
+    await timer.call("upload_cpp", client.post(
+        "/api/upload/cpp-file", data={"projectId": project_id}, files={"file": (target_file, source)}
+    ))
+    violations = (await timer.call("upload_report", client.post(
+        "/api/upload/misra-report",
+        data={"projectId": project_id, "targetFile": target_file},
+        files={"file": ("report.xlsx", report)},
+    ))).json()
+    await timer.call("add_line_numbers", client.post("/api/process/add-line-numbers", json={"projectId": project_id}))
+    await timer.call("first_prompt", client.post(
+        "/api/gemini/first-prompt", json={"projectId": project_id, "username": "bench"}
+    ))
+    await timer.call("fix_violations", client.post("/api/gemini/fix-violations", json={
+        "projectId": project_id, "username": "bench", "violations": violations,
+        "useCache": False, "useFixMemory": False,
+    }))
+
+    line_keys = list((await client.get(f"/api/code-snippets/{project_id}")).json().keys())
+    for i, line_key in enumerate(line_keys[:reviews]):
+        await timer.call("review_action", client.post("/api/review/action", json={
+            "projectId": project_id, "line_key": line_key, "action": "reject" if i % 4 == 3 else "accept",
+        }))
+    await timer.call("apply_accepted_fixes", client.post(
+        "/api/process/apply-accepted-fixes", json={"projectId": project_id}
+    ))
+
+
+async def run_size(app, lines: int, args) -> dict:
+    import httpx
+
+    source = make_source(lines)
+    report = make_report("bench.cpp", lines, args.violations)
+    timer = StageTimer()
+    limit = asyncio.Semaphore(args.concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async def limited(project_id: str):
+        async with limit:
+            await run_project(client, timer, project_id, source, report, args.reviews)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await asyncio.gather(*[limited(f"bench_{lines}_{i}") for i in range(args.projects)])
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"timer": timer, "elapsed": elapsed, "peak_traced": peak}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', default="1000,10000,100000", help='comma-separated synthetic file sizes')
+    parser.add_argument('--projects', type=int, default=8, help='projects run per file size')
+    parser.add_argument('--concurrency', type=int, default=8, help='projects in flight at once')
+    parser.add_argument('--violations', type=int, default=200, help='report rows for the target file')
+    parser.add_argument('--reviews', type=int, default=50, help='review actions per project')
+    parser.add_argument('--latency-ms', type=float, default=0, help='fake backend first-token latency')
+    parser.add_argument('--tokens-per-second', type=float, default=0, help='fake backend output rate (0 = instant)')
+    parser.add_argument('--batch-size', type=int, default=40, help='violations per fake response batch')
+    args = parser.parse_args()
+
+    # The app keeps uploads and its SQLite stores relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="misra_bench_")
+    os.chdir(workdir)
+    os.environ.update({
+        'MISRA_LLM_BACKEND': 'fake',
+        'MISRA_FAKE_LATENCY_MS': str(args.latency_ms),
+        'MISRA_FAKE_TOKENS_PER_SECOND': str(args.tokens_per_second),
+        'MISRA_FAKE_BATCH_SIZE': str(args.batch_size),
+    })
+
+    import contextlib
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import app
+
+    print(f"{args.projects} projects per size, concurrency {args.concurrency}, {args.violations} violations, "
+          f"{args.reviews} review actions, fake latency {args.latency_ms:g} ms (workdir {workdir})")
+    for lines in [int(size) for size in args.lines.split(',') if size.strip()]:
+        # The app logs every model response; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = asyncio.run(run_size(app, lines, args))
+        timer = result["timer"]
+
+        print(f"\n{lines:,} lines: {timer.requests} requests in {result['elapsed']:.2f} s "
+              f"({timer.requests / result['elapsed']:.1f} req/s), peak traced memory "
+              f"{result['peak_traced'] / 2**20:.1f} MiB, max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB")
+        print(f"  {'stage':<22}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for stage, latencies in timer.latencies.items():
+            print(f"  {stage:<22}{len(latencies):>7}"
+                  f"{percentile(latencies, 0.50) * 1000:>10.1f}"
+                  f"{percentile(latencies, 0.95) * 1000:>10.1f}"
+                  f"{percentile(latencies, 0.99) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares the file content sent to the chat in full-file and sliced context modes.
+
+Builds a synthetic C++ file of many functions, puts violations into a few of
+them and reports the estimated tokens of the full numbered file against the
+excerpt built by ``prompt_slicing.slice_document`` for several context radii,
+plus the time it takes to build the excerpt.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_prompt_slicing --lines 40000 --functions 20 --violations 60
+"""
+
+import argparse
+import random
+import time
+
+from numbered_document import NumberedDocument
+from prompt_slicing import slice_document
+
+
+def make_source(lines: int) -> str:
+    """Globals and declarations followed by functions of about 60 lines each"""
+    out = [
+        "#include <cstdint>",
+        "#define LIMIT_MAX 100U",
+        "typedef std::uint32_t U32;",
+        "static U32 g_counter = 0U;",
+        "void report(U32 value);",
+        "",
+    ]
+    function = 0
+    while len(out) < lines:
+        out += [f"U32 process_{function}(U32 input)", "{", "    U32 result = input;"]
+        out += [f"    result = (result * {i}U) + g_counter;" for i in range(1, 55)]
+        out += ["    if (result > LIMIT_MAX) { report(result); }", "    return result;", "}", ""]
+        function += 1
+    return "\n".join(out[:lines]) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=40000, help='lines in the synthetic C++ file')
+    parser.add_argument('--functions', type=int, default=20, help='functions that contain violations')
+    parser.add_argument('--violations', type=int, default=60, help='violated lines, spread over those functions')
+    args = parser.parse_args()
+
+    document = NumberedDocument.from_text(make_source(args.lines))
+    rng = random.Random(15)
+    regions = [region for region in document.region_index().regions if region[1] - region[0] > 10]
+    chosen = rng.sample(regions, min(args.functions, len(regions)))
+    violation_lines = [rng.randint(first + 2, last - 1) for first, last in (rng.choice(chosen) for _ in range(args.violations))]
+
+    start = time.perf_counter()
+    numbered = document.numbered_text()
+    full_elapsed = time.perf_counter() - start
+
+    print(f"{args.lines} lines, {args.violations} violations in {len(chosen)} functions")
+    full_tokens = None
+    for radius in (5, 20, 50):
+        start = time.perf_counter()
+        excerpt = slice_document(document, violation_lines, radius)
+        elapsed = time.perf_counter() - start
+        full_tokens = excerpt.full_tokens
+        print(f"sliced, radius {radius:<3} {excerpt.sent_tokens:9,} tokens  {len(excerpt.lines):6,} lines  "
+              f"({100 * excerpt.sent_tokens / full_tokens:5.1f}% of full)  built in {elapsed * 1000:7.1f} ms")
+    print(f"full file         {full_tokens:9,} tokens  {len(document.lines):6,} lines  "
+          f"(100.0% of full)  built in {full_elapsed * 1000:7.1f} ms  ({len(numbered):,} chars)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark for loading a MISRA report: cold XLSX parse vs. columnar sidecar.
+
+Writes a synthetic report, parses it the way the upload endpoint does on a
+cache miss, persists the Arrow sidecar, then times reloading the full index and
+a single target file from the memory-mapped sidecar.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_report_sidecar --rows 200000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from openpyxl import Workbook
+
+from excel_utils import (
+    compute_file_hash, parse_report, write_sidecar, load_sidecar, load_sidecar_for_file
+)
+
+
+def write_synthetic_report(path: str, rows: int, files: int = 2000):
+    """Write a report with the same columns as a real export using openpyxl's write-only mode"""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['Path', 'File', 'Line and Warning', 'Level', 'Misra', 'Status'])
+    for i in range(rows):
+        name = f"module_{i % files}.cpp"
+        sheet.append([
+            f"/src/components/{name}",
+            name,
+            f"[Line {(i * 7) % 40000 + 1}] Implicit conversion changes signedness ({i})",
+            'Required' if i % 3 else 'Advisory',
+            f"Rule_{i % 20}_{i % 7}",
+            'Open',
+        ])
+    workbook.save(path)
+
+
+def timed(label: str, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<36} {elapsed * 1000:10.1f} ms")
+    return result, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200000, help='number of synthetic report rows')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        excel_path = os.path.join(workdir, "bench_report_synthetic.xlsx")
+        print(f"Writing synthetic report with {args.rows} rows...")
+        write_synthetic_report(excel_path, args.rows)
+        content_hash = compute_file_hash(excel_path)
+
+        index, cold = timed("cold XLSX parse", parse_report, excel_path)
+        violations = [v for file_violations in index.values() for v in file_violations]
+        timed("write sidecar", write_sidecar, excel_path, content_hash, violations)
+        sidecar_index, warm = timed("sidecar load (full index)", load_sidecar, excel_path, content_hash)
+        _, single = timed("sidecar load (one target file)", load_sidecar_for_file,
+                          excel_path, content_hash, "module_42.cpp")
+
+        assert sidecar_index == index, "sidecar index differs from XLSX parse"
+        print(f"Speedup full index: {cold / warm:.1f}x, single file: {cold / single:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
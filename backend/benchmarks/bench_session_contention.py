@@ -0,0 +1,107 @@
+"""
+Contention benchmark of ConcurrentSessionManager.
+
+Worker threads hit get_session / get_data / set_data for many concurrent
+projects, the access pattern of every endpoint, while another thread runs
+cleanup_expired_sessions in a loop. Runs once with a single shard (every
+request serialized on one lock, like the old global RLock) and once with the
+given shard count, and reports operations/second and the p50/p99/max latency
+of a request's session lookup plus the time a cleanup pass takes.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_session_contention --projects 1000 --threads 32 --seconds 5
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import threading
+import time
+
+from session_manager import ConcurrentSessionManager
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def run(shards: int, projects: int, threads: int, seconds: float, idle: int) -> dict:
+    manager = ConcurrentSessionManager(shards=shards)
+    project_ids = [f"project-{i}" for i in range(projects)]
+    for project_id in project_ids:
+        session = manager.get_or_create_session(project_id)
+        session.set_data('fix_progress', {'status': 'idle'})
+    # Idle sessions that cleanup has to consider but never expires
+    for i in range(idle):
+        manager.get_or_create_session(f"idle-{i}")
+
+    stop = threading.Event()
+    latencies = [[] for _ in range(threads)]
+    operations = [0] * threads
+    cleanups = []
+
+    def worker(index: int):
+        rng = random.Random(index)
+        samples = latencies[index]
+        while not stop.is_set():
+            project_id = rng.choice(project_ids)
+            start = time.perf_counter()
+            session = manager.get_session(project_id)
+            samples.append(time.perf_counter() - start)
+            progress = session.get_data('fix_progress')
+            session.set_data('fix_progress', {**progress, 'batches_done': operations[index]})
+            operations[index] += 1
+
+    def cleaner():
+        while not stop.is_set():
+            start = time.perf_counter()
+            manager.cleanup_expired_sessions()
+            cleanups.append(time.perf_counter() - start)
+            stop.wait(0.05)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    workers.append(threading.Thread(target=cleaner))
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    stop.wait(seconds)
+    stop.set()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = [sample for worker_samples in latencies for sample in worker_samples]
+    return {
+        'ops_per_s': sum(operations) / elapsed,
+        'p50_us': percentile(samples, 0.50) * 1e6,
+        'p99_us': percentile(samples, 0.99) * 1e6,
+        'max_us': max(samples) * 1e6,
+        'cleanup_ms': sum(cleanups) / len(cleanups) * 1e3,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--projects', type=int, default=1000)
+    parser.add_argument('--idle', type=int, default=10000, help='extra idle sessions held in memory')
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--shards', type=int, default=64)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    # The cleanup thread prints a line per pass
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = {shards: run(shards, args.projects, args.threads, args.seconds, args.idle)
+                   for shards in (1, args.shards)}
+
+    print(f"{args.projects} projects, {args.idle} idle sessions, {args.threads} threads, {args.seconds:g}s each")
+    print(f"{'shards':>6} {'ops/s':>10} {'p50 us':>8} {'p99 us':>8} {'max us':>9} {'cleanup ms':>10}")
+    for shards, result in results.items():
+        print(f"{shards:>6} {result['ops_per_s']:>10.0f} {result['p50_us']:>8.1f} {result['p99_us']:>8.1f} "
+              f"{result['max_us']:>9.0f} {result['cleanup_ms']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
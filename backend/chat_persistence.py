@@ -0,0 +1,131 @@
+# chat_persistence.py - Compact persisted chat histories and lazy rehydration metrics
+
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+FILE_PLACEHOLDER = "<<numbered-file:{}>>"
+
+
+class FileBlobStore:
+    """
+    Content-addressed store of the numbered files sent to chats.
+
+    A file is written once (gzip-compressed, named by the SHA256 of its text) no
+    matter how many histories refer to it; histories keep only a placeholder.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, f"{content_hash}.txt.gz")
+
+    def put(self, text: str, content_hash: Optional[str] = None) -> str:
+        """Store text unless already present; returns its content hash"""
+        content_hash = content_hash or hashlib.sha256(text.encode('utf-8')).hexdigest()
+        path = self._path(content_hash)
+        if not os.path.exists(path):
+            # Write to a temporary file first so readers never see a partial blob
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(gzip.compress(text.encode('utf-8'), compresslevel=6))
+                os.replace(temp_path, path)
+            except Exception:
+                os.unlink(temp_path)
+                raise
+        return content_hash
+
+    def get(self, content_hash: str) -> Optional[str]:
+        path = self._path(content_hash)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return gzip.decompress(f.read()).decode('utf-8')
+
+
+def compact_turns(turns: List[Dict[str, str]], file_text: Optional[str], file_hash: Optional[str]) -> List[Dict[str, Any]]:
+    """Turns with the numbered file replaced by a placeholder naming its blob"""
+    if not file_text or not file_hash:
+        return [dict(turn) for turn in turns]
+    placeholder = FILE_PLACEHOLDER.format(file_hash)
+    compacted = []
+    for turn in turns:
+        if turn['role'] == 'user' and file_text in turn['text']:
+            compacted.append({'role': turn['role'], 'text': turn['text'].replace(file_text, placeholder), 'file': file_hash})
+        else:
+            compacted.append(dict(turn))
+    return compacted
+
+
+def expand_turns(turns: List[Dict[str, Any]], blob_store: FileBlobStore) -> List[Dict[str, str]]:
+    """Inverse of compact_turns; raises if a referenced file is missing"""
+    files: Dict[str, str] = {}
+    expanded = []
+    for turn in turns:
+        file_hash = turn.get('file')
+        if not file_hash:
+            expanded.append({'role': turn['role'], 'text': turn['text']})
+            continue
+        if file_hash not in files:
+            text = blob_store.get(file_hash)
+            if text is None:
+                raise FileNotFoundError(f"Numbered file {file_hash} of the chat history is missing")
+            files[file_hash] = text
+        expanded.append({'role': turn['role'], 'text': turn['text'].replace(FILE_PLACEHOLDER.format(file_hash), files[file_hash])})
+    return expanded
+
+
+class ChatMetrics:
+    """Counts of chats restored from persisted history versus started with a full file intro"""
+
+    def __init__(self):
+        self.full_intros = 0
+        self.rehydrations = 0
+        self.rehydration_failures = 0
+        self.rehydrated_turns = 0
+        self.saved_intro_chars = 0
+        self.history_saves = 0
+        self._lock = threading.Lock()
+
+    def record_intro(self):
+        with self._lock:
+            self.full_intros += 1
+
+    def record_save(self):
+        with self._lock:
+            self.history_saves += 1
+
+    def record_rehydration(self, turns: List[Dict[str, Any]]):
+        with self._lock:
+            self.rehydrations += 1
+            self.rehydrated_turns += len(turns)
+            # The file intro the client would otherwise have had to send again
+            self.saved_intro_chars += len(turns[0]['text']) if turns else 0
+
+    def record_failure(self):
+        with self._lock:
+            self.rehydration_failures += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            chats = self.full_intros + self.rehydrations
+            return {
+                'full_intros': self.full_intros,
+                'rehydrations': self.rehydrations,
+                'rehydration_failures': self.rehydration_failures,
+                'rehydration_rate': round(self.rehydrations / chats, 3) if chats else 0.0,
+                'rehydrated_turns': self.rehydrated_turns,
+                'saved_intro_tokens': (self.saved_intro_chars + 3) // 4,
+                'history_saves': self.history_saves,
+            }
+
+
+# Global file store and metrics instances
+chat_files = FileBlobStore(os.environ.get('MISRA_CHAT_FILES_DIR', os.path.join('uploads', 'chat_files')))
+chat_metrics = ChatMetrics()
@@ -0,0 +1,126 @@
+# cpp_scopes.py - Lightweight brace-based scope scanning of C++ source lines
+
+import re
+from bisect import bisect_right
+from typing import List, Tuple
+
+# Blocks whose contents are still top-level declarations
+_TRANSPARENT_BLOCK_RE = re.compile(r'\bnamespace\b|\bextern\s*"C"')
+
+
+def top_level_regions(lines: List[str]) -> List[Tuple[int, int]]:
+    """
+    Split source lines into top-level declarations (functions, classes, variables,
+    preprocessor lines) and return their (first_line, last_line) ranges, 1-based
+    and inclusive, in file order.
+
+    This is a brace scanner, not a parser: comments and string/char literals are
+    skipped, and namespace / extern "C" blocks are looked through so each
+    declaration inside them becomes its own region.
+    """
+    regions: List[Tuple[int, int]] = []
+    # One entry per open brace: True for namespace/extern blocks
+    block_stack: List[bool] = []
+    depth = 0
+    start = None
+    header: List[str] = []
+    in_block_comment = False
+
+    for number, line in enumerate(lines, start=1):
+        if depth == 0 and start is None and not in_block_comment and line.lstrip().startswith('#'):
+            regions.append((number, number))
+            continue
+
+        quote = None
+        i = 0
+        length = len(line)
+        while i < length:
+            ch = line[i]
+            if in_block_comment:
+                if line.startswith('*/', i):
+                    in_block_comment = False
+                    i += 2
+                else:
+                    i += 1
+                continue
+            if quote:
+                if depth == 0:
+                    header.append(ch)
+                if ch == '\\':
+                    i += 2
+                    continue
+                if ch == quote:
+                    quote = None
+                i += 1
+                continue
+            if line.startswith('//', i):
+                break
+            if line.startswith('/*', i):
+                in_block_comment = True
+                i += 2
+                continue
+
+            if depth == 0 and start is None and not ch.isspace() and ch not in ';}':
+                start = number
+
+            if ch in '"\'':
+                quote = ch
+                if depth == 0:
+                    header.append(ch)
+            elif ch == '{':
+                if depth == 0 and _TRANSPARENT_BLOCK_RE.search(''.join(header)):
+                    block_stack.append(True)
+                    start = None
+                    header = []
+                else:
+                    block_stack.append(False)
+                    depth += 1
+            elif ch == '}':
+                if block_stack and not block_stack.pop():
+                    depth -= 1
+                    if depth == 0 and start is not None:
+                        regions.append((start, number))
+                        start = None
+                        header = []
+            elif ch == ';' and depth == 0:
+                if start is not None:
+                    regions.append((start, number))
+                    start = None
+                header = []
+            elif depth == 0:
+                header.append(ch)
+            i += 1
+
+        if depth == 0:
+            header.append('\n')
+
+    if start is not None:
+        regions.append((start, len(lines)))
+    return regions
+
+
+class RegionIndex:
+    """Maps line numbers to the top-level region that contains (or precedes) them"""
+
+    def __init__(self, regions: List[Tuple[int, int]]):
+        self.regions = regions
+        self._starts = [first for first, _ in regions]
+
+    @classmethod
+    def from_lines(cls, lines: List[str]) -> "RegionIndex":
+        return cls(top_level_regions(lines))
+
+    def region_of(self, line: int) -> int:
+        """
+        Index of the region containing line. Lines between regions (blank lines,
+        comments) belong to the preceding region; lines before the first one to -1.
+        """
+        return bisect_right(self._starts, line) - 1
+
+    def enclosing(self, line: int):
+        """(first_line, last_line) of the region containing line, or None"""
+        index = self.region_of(line)
+        if index < 0:
+            return None
+        first, last = self.regions[index]
+        return (first, last) if line <= last else None
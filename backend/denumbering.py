@@ -1,6 +1,9 @@
 # denumbering.py
 import re
 
+# Line number prefixes like 123:, 123a:, 45b:, etc.
+LINE_NUMBER_PREFIX = re.compile(r'^\d+[a-zA-Z]*:\s?')
+
 # def remove_line_numbers(input_file, output_file):
 #     """Remove line numbers from a numbered C++ file"""
 #     with open(input_file, 'r', encoding='utf-8') as infile, open(output_file, 'w', encoding='utf-8') as outfile:
@@ -9,14 +12,16 @@ import re
 #             new_line = re.sub(r'^\d+[a-zA-Z]*:\s?', '', line)
 #             outfile.write(new_line)
 
+def denumber_line(line: str) -> str:
+    """Remove the line number from one numbered line (including its newline)"""
+    new_line = LINE_NUMBER_PREFIX.sub('', line)
+    # Preserve empty lines that were just line numbers
+    if new_line.strip() == '':
+        return '\n'
+    return new_line
+
 def remove_line_numbers(input_file, output_file):
     """Remove line numbers from a numbered C++ file"""
     with open(input_file, 'r', encoding='utf-8') as infile, open(output_file, 'w', encoding='utf-8') as outfile:
         for line in infile:
-            # Remove line numbers like 123:, 123a:, 45b:, etc.
-            new_line = re.sub(r'^\d+[a-zA-Z]*:\s?', '', line)
-            # Preserve empty lines that were just line numbers
-            if new_line.strip() == '':
-                outfile.write('\n')
-            else:
-                outfile.write(new_line)
\ No newline at end of file
+            outfile.write(denumber_line(line))
@@ -82,6 +82,20 @@ def create_diff_data(original_file_path: str, fixed_file_path: str, fixed_snippe
     original_content = get_file_content(original_file_path)
     fixed_content = get_file_content(fixed_file_path)
     
+    return create_diff_data_from_content(original_content, fixed_content, fixed_snippets)
+
+def create_diff_data_from_content(original_content: Optional[str], fixed_content: Optional[str], fixed_snippets: dict = None) -> dict:
+    """
+    Create diff data structure for frontend consumption from in-memory content.
+    
+    Args:
+        original_content: Original file content
+        fixed_content: Fixed file content
+        fixed_snippets: Dictionary of fixed code snippets
+        
+    Returns:
+        Dictionary containing diff data
+    """
     # Extract precise line mappings and changes if fixed_snippets provided
     highlight_data = {}
     if fixed_snippets:
@@ -0,0 +1,163 @@
+# event_hub.py - Per-project fan-out of progress and review events to WebSocket clients
+
+import asyncio
+import itertools
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set
+
+from session_store import SessionStore, dump_value, load_value
+
+
+class ProjectEventHub:
+    """
+    Publishes project events to every subscriber of that project.
+
+    Each subscriber gets its own bounded asyncio queue. publish() never blocks:
+    a subscriber that falls more than max_queue events behind has its backlog
+    replaced by a single 'resync' event, telling the client to refetch state
+    instead of replaying stale deltas. Events carry a per-project sequence
+    number (of this worker) so clients can detect gaps.
+
+    With a shared store, a relay thread appends published events to the
+    project's event log in the store and, every poll_interval seconds, delivers
+    the events other workers logged for projects subscribed here, so a client
+    receives every worker's events whichever worker its WebSocket is on.
+    """
+
+    def __init__(self, max_queue: int = 256, store: Optional[SessionStore] = None, poll_interval: float = 0.25):
+        self.max_queue = max_queue
+        self.store = store or SessionStore()
+        self.poll_interval = poll_interval
+        self.published = 0
+        self.relayed = 0
+        self.dropped = 0
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._sequences: Dict[str, itertools.count] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+        # Tells this worker's logged events apart from other workers'
+        self._origin = uuid.uuid4().hex
+        self._outbox: List[tuple] = []
+        self._relay_condition = threading.Condition()
+        self._relay_thread: Optional[threading.Thread] = None
+
+    def subscribe(self, project_id: str) -> asyncio.Queue:
+        """Queue receiving the project's events; must be called on the event loop"""
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(project_id, set()).add(queue)
+        self._start_relay()
+        return queue
+
+    def unsubscribe(self, project_id: str, queue: asyncio.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(project_id)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[project_id]
+                    self._sequences.pop(project_id, None)
+
+    def publish(self, project_id: str, event: str, data: Dict[str, Any]):
+        """Send an event to the project's subscribers; safe to call from worker threads"""
+        now = time.time()
+        if self.store.shared:
+            with self._relay_condition:
+                self._outbox.append((project_id, {'event': event, 'time': now, 'data': data, 'origin': self._origin}))
+                self._relay_condition.notify()
+            self._start_relay()
+        self._deliver_local(project_id, event, data, now)
+
+    def _deliver_local(self, project_id: str, event: str, data: Dict[str, Any], at: float):
+        if project_id not in self._subscribers:
+            return
+
+        with self._lock:
+            sequence = self._sequences.setdefault(project_id, itertools.count(1))
+            message = {'event': event, 'projectId': project_id, 'seq': next(sequence), 'time': at, 'data': data}
+            queues = list(self._subscribers.get(project_id, ()))
+            self.published += 1
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self._loop:
+            self._deliver(queues, message)
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._deliver, queues, message)
+
+    def _deliver(self, queues, message: Dict[str, Any]):
+        for queue in queues:
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Too far behind for deltas to be useful; have the client refetch
+                dropped = queue.qsize()
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({**message, 'event': 'resync', 'data': {'dropped': dropped + 1}})
+                with self._lock:
+                    self.dropped += dropped + 1
+
+    def _start_relay(self):
+        if not self.store.shared:
+            return
+        with self._relay_condition:
+            if self._relay_thread is None:
+                self._relay_thread = threading.Thread(target=self._relay, daemon=True)
+                self._relay_thread.start()
+
+    def _relay(self):
+        """Log this worker's events in the store and deliver the other workers' ones"""
+        # Last logged event seen per subscribed project
+        cursors: Dict[str, int] = {}
+        polled_at = 0.0
+        while True:
+            with self._relay_condition:
+                timeout = polled_at + self.poll_interval - time.monotonic()
+                if not self._outbox and timeout > 0:
+                    self._relay_condition.wait(timeout)
+                outbox, self._outbox = self._outbox, []
+            try:
+                for project_id, message in outbox:
+                    self.store.append_event(project_id, dump_value(message))
+                if time.monotonic() - polled_at < self.poll_interval:
+                    continue
+                polled_at = time.monotonic()
+                with self._lock:
+                    projects = list(self._subscribers)
+                cursors = {project_id: cursors[project_id] for project_id in projects if project_id in cursors}
+                for project_id in projects:
+                    if project_id not in cursors:
+                        # Newly subscribed: the WebSocket snapshot covers what came before
+                        cursors[project_id] = self.store.last_event_id(project_id)
+                        continue
+                    for event_id, value in self.store.events_after(project_id, cursors[project_id]):
+                        cursors[project_id] = event_id
+                        message = load_value(value)
+                        if message.get('origin') != self._origin:
+                            self._deliver_local(project_id, message['event'], message['data'], message['time'])
+                            with self._lock:
+                                self.relayed += 1
+            except Exception as e:
+                print(f"Error relaying events through the session store: {str(e)}")
+                time.sleep(self.poll_interval)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'projects': len(self._subscribers),
+                'subscribers': sum(len(queues) for queues in self._subscribers.values()),
+                'published': self.published,
+                'relayed': self.relayed,
+                'dropped': self.dropped,
+            }
+
+
+# Global event hub instance
+event_hub = ProjectEventHub(max_queue=int(os.environ.get('MISRA_EVENT_QUEUE_SIZE', 256)))
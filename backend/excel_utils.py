@@ -1,32 +1,348 @@
 # excel_utils.py
 import pandas as pd
 import re
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+from openpyxl import load_workbook
 
-def extract_violations_for_file(excel_path: str, target_file: str) -> list:
-    """Extract violations for a specific file from Excel report"""
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc
+except ImportError:  # Sidecars are an optional speed-up
+    pa = None
+
+
+def compute_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Compute the SHA256 content hash of a file without loading it at once"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Matches the "[Line 123] message" format of the "Line and Warning" column
+LINE_WARNING_PATTERN = r"^\[Line (\d+)\]\s*(.+)"
+_LINE_WARNING_RE = re.compile(LINE_WARNING_PATTERN)
+
+
+def parse_line_warning_column(column: pd.Series) -> pd.DataFrame:
+    """Vectorized split of the "Line and Warning" column into Line and Warning.
+
+    Rows that do not match keep their original text as the warning and get no line.
+    """
+    extracted = column.astype(str).str.extract(LINE_WARNING_PATTERN)
+    matched = extracted[0].notna()
+    return pd.DataFrame({
+        'Line': pd.to_numeric(extracted[0]).astype('Int64'),
+        'Warning': extracted[1].where(matched, column),
+    })
+
+
+# Output keys of a violation dictionary and the report columns they come from
+VIOLATION_FIELDS = ('file', 'path', 'line', 'warning', 'level', 'misra')
+
+
+def _text(value) -> Optional[str]:
+    """Text cell value; numeric cells (e.g. rule IDs) become strings so every column has one type"""
+    return None if value is None else str(value)
+
+
+def _column_values(column: pd.Series) -> list:
+    """Column as plain Python values, with None instead of NaN/<NA> so it is JSON serializable"""
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+def _text_values(column: pd.Series) -> list:
+    return [_text(value) for value in _column_values(column)]
+
+
+def violations_from_frame(df: pd.DataFrame) -> List[dict]:
+    """Convert a raw report DataFrame into a list of violation dictionaries"""
+    parsed = parse_line_warning_column(df['Line and Warning'])
+    columns = [
+        _text_values(df['File']),
+        _text_values(df['Path']),
+        _column_values(parsed['Line']),
+        _text_values(parsed['Warning']),
+        _text_values(df['Level']),
+        _text_values(df['Misra']),
+    ]
+    # Zipping whole columns avoids per-row Series construction (iterrows/itertuples)
+    return [dict(zip(VIOLATION_FIELDS, row)) for row in zip(*columns)]
+
+
+def build_violation_index(violations: List[dict]) -> Dict[str, List[dict]]:
+    """Group violations by file name"""
+    index: Dict[str, List[dict]] = {}
+    for violation in violations:
+        index.setdefault(violation['file'], []).append(violation)
+    return index
+
+
+def parse_report(excel_path: str) -> Dict[str, List[dict]]:
+    """Parse a MISRA Excel report once and index its violations by file name"""
     df = pd.read_excel(excel_path, engine="openpyxl", usecols="A:F")
+    return build_violation_index(violations_from_frame(df))
+
+
+def iter_violations_for_file(excel_path: str, target_file: str) -> Iterator[dict]:
+    """Stream violations for one file from a report without loading the whole sheet.
+
+    Uses openpyxl's read-only mode, so memory stays bounded by the current row
+    plus the violations the caller keeps, regardless of the workbook size.
+    """
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(max_col=6, values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = {name: i for i, name in enumerate(header) if name is not None}
+        file_col = columns['File']
+        path_col = columns['Path']
+        line_warning_col = columns['Line and Warning']
+        level_col = columns['Level']
+        misra_col = columns['Misra']
+
+        def cell(row, col):
+            return row[col] if col < len(row) else None
 
-    def parse_line_warning(text):
-        match = re.match(r"\[Line (\d+)\]\s*(.+)", str(text))
-        return (int(match.group(1)), match.group(2)) if match else (None, text)
+        for row in rows:
+            if _text(cell(row, file_col)) != target_file:
+                continue
 
-    df[['Line', 'Warning']] = df['Line and Warning'].apply(lambda x: pd.Series(parse_line_warning(x)))
+            text = cell(row, line_warning_col)
+            match = _LINE_WARNING_RE.match(str(text))
+            yield {
+                'file': _text(cell(row, file_col)),
+                'path': _text(cell(row, path_col)),
+                'line': int(match.group(1)) if match else None,
+                'warning': match.group(2) if match else _text(text),
+                'level': _text(cell(row, level_col)),
+                'misra': _text(cell(row, misra_col))
+            }
+    finally:
+        workbook.close()
 
-    filtered_df = df[df['File'] == target_file]
 
-    if filtered_df.empty:
-        return []
+# Bump when the parsed violation format changes so stale sidecars are ignored
+SIDECAR_FORMAT_VERSION = "2"
 
-    # Convert to list of dictionaries for JSON response
-    violations = []
-    for _, row in filtered_df.iterrows():
-        violations.append({
-            'file': row['File'],
-            'path': row['Path'],
-            'line': row['Line'],
-            'warning': row['Warning'],
-            'level': row['Level'],
-            'misra': row['Misra']
+SIDECAR_SCHEMA = pa.schema([
+    (field, pa.int64() if field == 'line' else pa.string()) for field in VIOLATION_FIELDS
+]) if pa is not None else None
+
+
+def sidecar_path(excel_path: str, content_hash: str) -> str:
+    """Columnar sidecar location, named by content hash so identical uploads share it"""
+    return os.path.join(os.path.dirname(excel_path), f"report_{content_hash}.violations.arrow")
+
+
+def write_sidecar(excel_path: str, content_hash: str, violations: List[dict]) -> Optional[str]:
+    """Persist parsed violations as an uncompressed Arrow IPC file that can be memory-mapped"""
+    if pa is None:
+        return None
+
+    path = sidecar_path(excel_path, content_hash)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        # Explicit types: inference fails on columns mixing numbers and text
+        table = pa.Table.from_pydict({
+            field: [
+                violation[field] if field == 'line' else _text(violation[field])
+                for violation in violations
+            ] for field in VIOLATION_FIELDS
+        }, schema=SIDECAR_SCHEMA)
+        table = table.replace_schema_metadata({
+            'content_hash': content_hash,
+            'format_version': SIDECAR_FORMAT_VERSION,
         })
+        with pa.OSFile(temp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        # Atomic rename so other workers never see a partially written sidecar
+        os.replace(temp_path, path)
+        return path
+    except Exception as e:
+        print(f"Warning: Could not write report sidecar: {str(e)}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
+
+
+def _open_sidecar(excel_path: str, content_hash: str):
+    """Memory-map a sidecar table, or return None if it is missing or stale"""
+    if pa is None:
+        return None
+
+    path = sidecar_path(excel_path, content_hash)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    except Exception as e:
+        print(f"Warning: Could not read report sidecar {path}: {str(e)}")
+        return None
+
+    metadata = table.schema.metadata or {}
+    if (metadata.get(b'content_hash') != content_hash.encode()
+            or metadata.get(b'format_version') != SIDECAR_FORMAT_VERSION.encode()):
+        return None
+    return table
+
+
+def _violations_from_table(table) -> List[dict]:
+    columns = [table.column(field).to_pylist() for field in VIOLATION_FIELDS]
+    return [dict(zip(VIOLATION_FIELDS, row)) for row in zip(*columns)]
+
+
+def load_sidecar(excel_path: str, content_hash: str) -> Optional[Dict[str, List[dict]]]:
+    """Load the file -> violations index from a sidecar instead of re-parsing the workbook"""
+    table = _open_sidecar(excel_path, content_hash)
+    if table is None:
+        return None
+    return build_violation_index(_violations_from_table(table))
+
+
+def load_sidecar_for_file(excel_path: str, content_hash: str, target_file: str) -> Optional[List[dict]]:
+    """Load one file's violations from a sidecar; only the matching rows are materialized"""
+    table = _open_sidecar(excel_path, content_hash)
+    if table is None:
+        return None
+    return _violations_from_table(table.filter(pc.equal(table.column('file'), target_file)))
+
+
+class ReportCache:
+    """Thread-safe cache of parsed MISRA reports keyed by content hash.
+
+    Each report is parsed once into a file -> violations index; every later
+    lookup for any target file in the same report is a dictionary access.
+    Parsed reports are also persisted as columnar sidecars, so restarts and
+    other workers reload them with a memory-mapped read instead of the XLSX.
+    """
+
+    def __init__(self, max_reports: int = 8):
+        self._max_reports = max_reports
+        self._reports: "OrderedDict[str, Dict[str, List[dict]]]" = OrderedDict()
+        self._path_hashes: Dict[str, Tuple[int, int, str]] = {}
+        self._parse_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.RLock()
+
+    def _hash_for_path(self, excel_path: str) -> str:
+        """Return the content hash for a path, rehashing only if the file changed"""
+        stat = os.stat(excel_path)
+        with self._lock:
+            cached = self._path_hashes.get(excel_path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+        content_hash = compute_file_hash(excel_path)
+        with self._lock:
+            self._path_hashes[excel_path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+        return content_hash
+
+    def remember_hash(self, excel_path: str, content_hash: str):
+        """Record a hash computed by the caller (e.g. while saving an upload)"""
+        stat = os.stat(excel_path)
+        with self._lock:
+            self._path_hashes[excel_path] = (stat.st_mtime_ns, stat.st_size, content_hash)
+
+    def get_index(self, excel_path: str, content_hash: Optional[str] = None) -> Dict[str, List[dict]]:
+        """Get the file -> violations index for a report, parsing it on first use"""
+        if content_hash is None:
+            content_hash = self._hash_for_path(excel_path)
+
+        index = self.peek(content_hash)
+        if index is not None:
+            return index
+
+        with self._lock:
+            parse_lock = self._parse_locks.setdefault(content_hash, threading.Lock())
+
+        # Only one thread parses a given report; the others wait for its result
+        with parse_lock:
+            index = self.peek(content_hash)
+            if index is not None:
+                return index
+
+            index = load_sidecar(excel_path, content_hash)
+            if index is None:
+                index = parse_report(excel_path)
+                write_sidecar(excel_path, content_hash, [v for violations in index.values() for v in violations])
+
+            with self._lock:
+                self._reports[content_hash] = index
+                self._reports.move_to_end(content_hash)
+                while len(self._reports) > self._max_reports:
+                    self._reports.popitem(last=False)
+                self._parse_locks.pop(content_hash, None)
+
+        return index
+
+    def peek(self, content_hash: str) -> Optional[Dict[str, List[dict]]]:
+        """Get an already parsed index without parsing on a miss"""
+        with self._lock:
+            index = self._reports.get(content_hash)
+            if index is not None:
+                self._reports.move_to_end(content_hash)
+            return index
+
+    def lookup(self, excel_path: str, target_file: str, content_hash: Optional[str] = None) -> List[dict]:
+        """Get violations for a single file; returns copies safe for the caller to modify"""
+        index = self.get_index(excel_path, content_hash)
+        return [dict(violation) for violation in index.get(target_file, [])]
+
+    def clear(self):
+        """Drop all cached reports"""
+        with self._lock:
+            self._reports.clear()
+            self._path_hashes.clear()
+
+
+# Global report cache instance
+report_cache = ReportCache()
+
+
+def extract_violations_for_file(
+    excel_path: str,
+    target_file: str,
+    content_hash: Optional[str] = None,
+    streaming: bool = False
+) -> list:
+    """Extract violations for a specific file from Excel report.
+
+    With streaming=True the report is not parsed into the shared index: the rows
+    come from the cached index or the sidecar if available, else from a row-by-row scan.
+    """
+    if streaming:
+        if content_hash:
+            index = report_cache.peek(content_hash)
+            if index is not None:
+                return [dict(violation) for violation in index.get(target_file, [])]
+            violations = load_sidecar_for_file(excel_path, content_hash, target_file)
+            if violations is not None:
+                return violations
+        return list(iter_violations_for_file(excel_path, target_file))
+
+    return report_cache.lookup(excel_path, target_file, content_hash)
+
 
-    return violations
\ No newline at end of file
+def extract_violations_for_files(
+    excel_path: str,
+    target_files: Optional[List[str]] = None,
+    content_hash: Optional[str] = None
+) -> Dict[str, List[dict]]:
+    """Extract violations for several files (or all files when target_files is None) in one parse"""
+    index = report_cache.get_index(excel_path, content_hash)
+    if target_files is None:
+        target_files = list(index.keys())
+    return {
+        target_file: [dict(violation) for violation in index.get(target_file, [])]
+        for target_file in target_files
+    }
@@ -0,0 +1,208 @@
+# fake_gemini.py - Deterministic offline stand-in for the Gemini chat backend
+
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from misra_chat_client import LLMBackend, CONTINUATION_MARKER, CONTINUATION_PROMPT
+from prompt_slicing import estimate_tokens
+
+FILE_RECEIVED = "FILE RECEIVED. READY FOR VIOLATIONS."
+
+_NUMBERED_LINE_RE = re.compile(r'^(\d+):(.*)$', re.MULTILINE)
+_VIOLATION_RE = re.compile(r'^Line: (\S+)\s*\nRule: ([^\n]*)', re.MULTILINE)
+_C_CAST_RE = re.compile(r'\((unsigned\s+int|unsigned|int|long|short|char|float|double|u?int\d+_t)\)\s*([A-Za-z_]\w*)')
+_INT_LITERAL_RE = re.compile(r'(?<![\w.])(\d+)(?![\w.])')
+_INDENT_RE = re.compile(r'^\s*')
+
+
+def fix_line(content: str, rule: str) -> str:
+    """Plausible, deterministic MISRA-style edit of one line"""
+    fixed = _C_CAST_RE.sub(r'static_cast<\1>(\2)', content)
+    if fixed == content:
+        fixed = _INT_LITERAL_RE.sub(r'\1U', content, count=1)
+    if fixed == content:
+        fixed = f"{content.rstrip()}  // {rule}: reviewed"
+    return fixed
+
+
+class FakeResponse:
+    """Response or stream chunk with the .text attribute the chat helpers read"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeChatSession:
+    """
+    Chat with the conversation behaviour the backend relies on: acknowledges the
+    file intro, answers violation lists with numbered ```cpp snippets and a
+    Violation_Mapping_list, splits long answers into batches ending in
+    '--- CONTINUED ---' and continues them on 'next'.
+    """
+
+    def __init__(self, backend: "FakeGeminiBackend", model_name: str):
+        self._backend = backend
+        self.model_name = model_name
+        self.history: List[Dict[str, str]] = []
+        # Numbered source lines seen so far (file intro and sliced excerpts)
+        self.lines: Dict[str, str] = {}
+        self._pending: List[Tuple[str, str]] = []
+
+    def _fork(self) -> "FakeChatSession":
+        chat = FakeChatSession(self._backend, self.model_name)
+        chat.history = list(self.history)
+        chat.lines = dict(self.lines)
+        return chat
+
+    def _reply(self, message: str) -> str:
+        for line_key, content in _NUMBERED_LINE_RE.findall(message):
+            self.lines[line_key] = content
+
+        violations = _VIOLATION_RE.findall(message)
+        if violations:
+            self._pending = [(line.strip(), rule.strip()) for line, rule in violations]
+            text = self._next_batch()
+        elif message.strip() == CONTINUATION_PROMPT and self._pending:
+            text = self._next_batch()
+        elif FILE_RECEIVED in message:
+            text = FILE_RECEIVED
+        else:
+            text = "Understood. Let me know which violations to fix next."
+
+        self.history.append({'role': 'user', 'text': message})
+        self.history.append({'role': 'model', 'text': text})
+        return text
+
+    def _next_batch(self) -> str:
+        batch = self._pending[:self._backend.batch_size]
+        self._pending = self._pending[self._backend.batch_size:]
+
+        fixed: Dict[str, str] = {}
+        mapping: Dict[str, dict] = {}
+        for line_key, rule in batch:
+            original = fixed.get(line_key, self.lines.get(line_key, f" /* line {line_key} */"))
+            fixed[line_key] = fix_line(original, rule)
+            changed_lines = [line_key]
+            # Some fixes also insert a line, to exercise suffixed line keys
+            if line_key.isdigit() and int(line_key) % 5 == 0:
+                inserted_key = f"{line_key}a"
+                indent = _INDENT_RE.match(original).group(0)
+                fixed[inserted_key] = f"{indent}// {rule}: explicit conversion added above"
+                changed_lines.append(inserted_key)
+            mapping.setdefault(line_key, {'rule': rule, 'changed_lines': changed_lines})
+
+        snippet = "\n".join(f"{key}:{content}" for key, content in fixed.items())
+        text = (
+            f"Here are the fixed snippets for {len(batch)} violation(s).\n\n"
+            f"```cpp\n{snippet}\n```\n\n"
+            f"Violation_Mapping_list =\n{json.dumps(mapping, indent=4)}\n"
+        )
+        if self._pending:
+            text += f"\n{CONTINUATION_MARKER}\n"
+        return text
+
+    def _chunks(self, text: str) -> List[str]:
+        size = self._backend.chunk_chars
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    def send_message(self, message: str, stream: bool = False, **kwargs):
+        text = self._reply(message)
+        self._backend.record(message, text)
+        if not stream:
+            time.sleep(self._backend.delay_for(text))
+            return FakeResponse(text)
+
+        def generator():
+            time.sleep(self._backend.latency)
+            for chunk in self._chunks(text):
+                time.sleep(self._backend.delay_for(chunk, first_token=False))
+                yield FakeResponse(chunk)
+        return generator()
+
+    async def send_message_async(self, message: str, stream: bool = False, **kwargs):
+        text = self._reply(message)
+        self._backend.record(message, text)
+        if not stream:
+            await asyncio.sleep(self._backend.delay_for(text))
+            return FakeResponse(text)
+
+        async def generator():
+            await asyncio.sleep(self._backend.latency)
+            for chunk in self._chunks(text):
+                await asyncio.sleep(self._backend.delay_for(chunk, first_token=False))
+                yield FakeResponse(chunk)
+        return generator()
+
+
+class FakeGeminiBackend(LLMBackend):
+    """
+    Offline LLM backend for load tests and local development (MISRA_LLM_BACKEND=fake).
+
+    Responses are deterministic; their timing follows a simple model: a fixed
+    first-token latency plus output tokens / tokens_per_second.
+    """
+    name = "fake"
+
+    def __init__(self, latency_ms: float = 300, tokens_per_second: float = 400, batch_size: int = 40, chunk_chars: int = 256):
+        self.latency = latency_ms / 1000
+        self.tokens_per_second = tokens_per_second
+        self.batch_size = max(1, batch_size)
+        self.chunk_chars = max(1, chunk_chars)
+        self.messages = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "FakeGeminiBackend":
+        return cls(
+            latency_ms=float(os.environ.get('MISRA_FAKE_LATENCY_MS', 300)),
+            tokens_per_second=float(os.environ.get('MISRA_FAKE_TOKENS_PER_SECOND', 400)),
+            batch_size=int(os.environ.get('MISRA_FAKE_BATCH_SIZE', 40)),
+        )
+
+    def delay_for(self, text: str, first_token: bool = True) -> float:
+        generation = estimate_tokens(text) / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        return (self.latency if first_token else 0.0) + generation
+
+    def record(self, message: str, text: str):
+        with self._lock:
+            self.messages += 1
+            self.input_tokens += estimate_tokens(message)
+            self.output_tokens += estimate_tokens(text)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'messages': self.messages,
+                'input_tokens': self.input_tokens,
+                'output_tokens': self.output_tokens,
+            }
+
+    def start_chat(self, model_name: str, temperature: float, top_p: float, max_tokens: int, safety_settings: bool) -> FakeChatSession:
+        return FakeChatSession(self, model_name)
+
+    def fork_chat(self, chat: FakeChatSession) -> FakeChatSession:
+        return chat._fork()
+
+    def chat_history(self, chat: FakeChatSession) -> List[Dict[str, str]]:
+        return [dict(turn) for turn in chat.history]
+
+    def resume_chat(self, model_name: str, temperature: float, top_p: float, max_tokens: int, safety_settings: bool, history: List[Dict[str, str]]) -> FakeChatSession:
+        chat = FakeChatSession(self, model_name)
+        self.append_history(chat, history)
+        return chat
+
+    def append_history(self, chat: FakeChatSession, turns: List[Dict[str, str]]) -> FakeChatSession:
+        chat.history.extend(dict(turn) for turn in turns)
+        # Recover the source lines the conversation has seen
+        for turn in turns:
+            if turn['role'] == 'user':
+                for line_key, content in _NUMBERED_LINE_RE.findall(turn['text']):
+                    chat.lines[line_key] = content
+        return chat
@@ -0,0 +1,243 @@
+# fix_memory.py - Reuse of previously accepted fixes for recurring violations
+
+import sqlite3
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from replace import line_sort_key
+
+_LEADING_WHITESPACE_RE = re.compile(r'^\s*')
+
+
+def normalize_rule(rule: str) -> str:
+    """'Rule_5_0_4', 'Rule 5-0-4' and 'rule 5.0.4' all become 'rule_5_0_4'"""
+    return re.sub(r'[^0-9a-z]+', '_', str(rule).lower()).strip('_')
+
+
+def normalize_line(text: str) -> str:
+    """Source line with surrounding whitespace trimmed and inner runs collapsed"""
+    return ' '.join(text.split())
+
+
+def _indent(text: str) -> str:
+    return _LEADING_WHITESPACE_RE.match(text).group(0)
+
+
+def _dedent(text: str, indent: str) -> str:
+    """Remove the original line's indentation from a fixed line (as much of it as the line has)"""
+    common = 0
+    while common < len(indent) and common < len(text) and text[common] == indent[common]:
+        common += 1
+    return text[common:]
+
+
+class FixMemory:
+    """
+    Persistent memory of accepted fixes for single-line violation patterns.
+
+    Maps (rule, normalized original line text) to the fixed lines that replaced
+    the violated line (the line itself plus any lines inserted after it), stored
+    relative to the original indentation so they can be re-applied to the same
+    pattern at any indentation in any file.
+    """
+
+    def __init__(self, db_path: str = "fix_memory.db"):
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init_database(self):
+        """Create the fixes table if it doesn't exist"""
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fixes (
+                rule TEXT NOT NULL,
+                line_text TEXT NOT NULL,
+                template TEXT NOT NULL,
+                use_count INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (rule, line_text)
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def remember(self, rule: str, original_line: str, fixed_lines: List[Tuple[str, str]]) -> bool:
+        """
+        Store an accepted fix. fixed_lines are (suffix, content) pairs in order, where
+        suffix '' is the violated line itself and 'a', 'b', ... are lines inserted after it.
+        """
+        key = (normalize_rule(rule), normalize_line(original_line))
+        if not key[0] or not key[1]:
+            return False
+
+        indent = _indent(original_line)
+        template = [[suffix, _dedent(content, indent)] for suffix, content in fixed_lines]
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT OR REPLACE INTO fixes (rule, line_text, template, updated_at) VALUES (?, ?, ?, ?)",
+                (key[0], key[1], json.dumps(template), time.time())
+            )
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error saving fix memory: {e}")
+            return False
+
+    def forget(self, rule: str, original_line: str):
+        """Drop a remembered fix (e.g. after a fix made from it was rejected)"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute(
+                "DELETE FROM fixes WHERE rule = ? AND line_text = ?",
+                (normalize_rule(rule), normalize_line(original_line))
+            )
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error deleting from fix memory: {e}")
+
+    def _lookup_many(self, keys: List[Tuple[str, str]]) -> Dict[Tuple[str, str], list]:
+        found = {}
+        if not keys:
+            return found
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            for rule, line_text in keys:
+                cursor.execute("SELECT template FROM fixes WHERE rule = ? AND line_text = ?", (rule, line_text))
+                row = cursor.fetchone()
+                if row:
+                    found[(rule, line_text)] = json.loads(row[0])
+            if found:
+                cursor.executemany(
+                    "UPDATE fixes SET use_count = use_count + 1 WHERE rule = ? AND line_text = ?",
+                    list(found.keys())
+                )
+                conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error reading fix memory: {e}")
+        return found
+
+    def fix_violations(
+        self,
+        original_lines: Dict[str, str],
+        violations: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, str], Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Fix violations from memory where possible.
+
+        Returns (code_snippets, violation_mapping, remaining_violations). Only lines
+        whose violations all share one rule are fixed locally; everything else is left
+        for the model. original_lines is the {line_key: content} map of the numbered file.
+        """
+        by_line: Dict[str, List[Dict[str, Any]]] = {}
+        remaining = []
+        for violation in violations:
+            line_key = str(violation.get('line'))
+            if line_key in original_lines:
+                by_line.setdefault(line_key, []).append(violation)
+            else:
+                remaining.append(violation)
+
+        candidates = {}
+        for line_key, line_violations in by_line.items():
+            rules = {normalize_rule(violation.get('misra', '')) for violation in line_violations}
+            if len(rules) == 1:
+                candidates[line_key] = (rules.pop(), normalize_line(original_lines[line_key]))
+            else:
+                remaining.extend(line_violations)
+
+        templates = self._lookup_many(list(set(candidates.values())))
+        code_snippets: Dict[str, str] = {}
+        violation_mapping: Dict[str, Any] = {}
+        for line_key, key in candidates.items():
+            template = templates.get(key)
+            if template is None:
+                remaining.extend(by_line[line_key])
+                continue
+            indent = _indent(original_lines[line_key])
+            changed_lines = []
+            for suffix, content in template:
+                code_snippets[f"{line_key}{suffix}"] = indent + content if content else ''
+                changed_lines.append(f"{line_key}{suffix}")
+            violation_mapping[line_key] = {
+                'rule': by_line[line_key][0].get('misra'),
+                'changed_lines': changed_lines,
+                'source': 'memory',
+            }
+
+        with self._lock:
+            self.hits += len(violation_mapping)
+            self.misses += len(candidates) - len(violation_mapping)
+        return code_snippets, violation_mapping, remaining
+
+    def stats(self) -> Dict[str, Any]:
+        """Lookup counters of this process and the number of remembered fixes"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*), COALESCE(SUM(use_count), 0) FROM fixes")
+            entries, uses = cursor.fetchone()
+            conn.close()
+        except Exception as e:
+            print(f"Error reading fix memory stats: {e}")
+            entries, uses = None, None
+
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": entries, "total_uses": uses}
+
+    def clear(self) -> int:
+        """Remove all remembered fixes; returns how many were removed"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM fixes")
+        removed = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return removed
+
+
+def learnable_fix(
+    violation_key: str,
+    entry: Dict[str, Any],
+    original_lines: Dict[str, str],
+    fixed_snippets: Dict[str, str]
+) -> Optional[List[Tuple[str, str]]]:
+    """
+    (suffix, content) pairs of a violation fix that only touched its own line
+    (and lines inserted after it), or None if the fix can't be reused elsewhere.
+    """
+    changed_lines = entry.get('changed_lines') or []
+    if violation_key not in original_lines or not changed_lines:
+        return None
+
+    fixed_lines = []
+    for line_key in sorted(changed_lines, key=line_sort_key):
+        number, suffix = line_sort_key(line_key)
+        if str(number) != violation_key or line_key not in fixed_snippets:
+            return None
+        fixed_lines.append((suffix, fixed_snippets[line_key]))
+    return fixed_lines
+
+
+# Global fix memory instance
+fix_memory = FixMemory(db_path=os.environ.get('MISRA_FIX_MEMORY_DB', 'fix_memory.db'))
@@ -0,0 +1,248 @@
+# fix_pipeline.py - Drives MISRA fix generation across model response batches
+
+import os
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cpp_scopes import RegionIndex
+from misra_chat_client import send_misra_violations_async, send_continuation_async, has_continuation, fork_chat, append_history
+from fixed_response_code_snippet import extract_snippets_from_response, extract_violation_mapping
+
+# Upper bound on 'next' round trips for one fix request
+MAX_CONTINUATION_BATCHES = int(os.environ.get('MISRA_MAX_CONTINUATION_BATCHES', 20))
+# Default number of concurrent chat sessions for one fix request (1 = single session)
+PARALLEL_SESSIONS = int(os.environ.get('MISRA_PARALLEL_SESSIONS', 1))
+# Smaller violation lists are not worth an extra chat session
+MIN_VIOLATIONS_PER_SESSION = int(os.environ.get('MISRA_MIN_VIOLATIONS_PER_SESSION', 25))
+
+
+@dataclass
+class FixResult:
+    """Merged result of one or more model response batches"""
+    responses: List[str] = field(default_factory=list)
+    code_snippets: Dict[str, str] = field(default_factory=dict)
+    violation_mapping: Dict[str, Any] = field(default_factory=dict)
+    complete: bool = False
+    # Line keys that several parallel sessions fixed differently
+    conflicts: List[Dict[str, Any]] = field(default_factory=list)
+    sessions: int = 1
+
+    @property
+    def batches(self) -> int:
+        return len(self.responses)
+
+    @property
+    def response(self) -> str:
+        """All batch responses joined in order"""
+        return "\n\n".join(self.responses)
+
+    def add_batch(self, response_text: str, code_snippets: Optional[Dict[str, str]] = None):
+        """Merge one response batch; later batches win on duplicate line keys"""
+        self.responses.append(response_text)
+        if code_snippets is None:
+            code_snippets = extract_snippets_from_response(response_text)
+        self.code_snippets.update(code_snippets)
+        try:
+            self.violation_mapping.update(extract_violation_mapping(response_text))
+        except ValueError as e:
+            print(f"Warning: Could not extract violation mapping from batch {self.batches}: {str(e)}")
+        self.complete = not has_continuation(response_text)
+
+    def progress(self, status: str) -> Dict[str, Any]:
+        """Progress snapshot for status endpoints"""
+        return {
+            'status': status,
+            'batches_done': self.batches,
+            'snippets_count': len(self.code_snippets),
+            'complete': self.complete,
+            'sessions': self.sessions,
+            'conflicts': self.conflicts,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable form for the response cache"""
+        return {
+            'responses': self.responses,
+            'code_snippets': self.code_snippets,
+            'violation_mapping': self.violation_mapping,
+            'complete': self.complete,
+            'conflicts': self.conflicts,
+            'sessions': self.sessions,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "FixResult":
+        return cls(**data)
+
+    @classmethod
+    def combine(cls, results: List["FixResult"]) -> "FixResult":
+        """
+        Merge the results of parallel sessions, in partition (file) order.
+
+        A line key fixed by more than one session with different content is a
+        conflict: the first session's version is kept and the clash is recorded.
+        """
+        combined = cls(sessions=len(results), complete=all(result.complete for result in results))
+        snippet_owner: Dict[str, int] = {}
+        mapping_owner: Dict[str, int] = {}
+
+        for session_index, result in enumerate(results):
+            combined.responses.extend(result.responses)
+
+            for line_key, content in result.code_snippets.items():
+                owner = snippet_owner.get(line_key)
+                if owner is None:
+                    snippet_owner[line_key] = session_index
+                    combined.code_snippets[line_key] = content
+                elif combined.code_snippets[line_key] != content:
+                    combined.conflicts.append({
+                        'line_key': line_key,
+                        'kept_session': owner,
+                        'dropped_session': session_index,
+                        'kept': combined.code_snippets[line_key],
+                        'dropped': content,
+                    })
+
+            for violation_key, entry in result.violation_mapping.items():
+                owner = mapping_owner.get(violation_key)
+                if owner is None:
+                    mapping_owner[violation_key] = session_index
+                    combined.violation_mapping[violation_key] = entry
+                elif combined.violation_mapping[violation_key] != entry:
+                    # Same violation reported by two sessions: keep both sets of changed lines
+                    kept = combined.violation_mapping[violation_key]
+                    changed_lines = list(dict.fromkeys(
+                        list(kept.get('changed_lines', [])) + list(entry.get('changed_lines', []))
+                    ))
+                    combined.violation_mapping[violation_key] = {**kept, 'changed_lines': changed_lines}
+
+        return combined
+
+
+async def run_fix_with_continuation(
+    chat,
+    violations_text: str,
+    max_batches: int = MAX_CONTINUATION_BATCHES,
+    on_batch: Optional[Callable[[FixResult], None]] = None
+) -> FixResult:
+    """
+    Send the violations and keep answering '--- CONTINUED ---' with 'next' until the
+    model reports completion or max_batches is reached. Snippets and violation
+    mappings of all batches are merged; on_batch is called after each batch.
+    Model calls are awaited on the event loop, so no thread is held while waiting.
+    """
+    result = FixResult()
+    response = await send_misra_violations_async(chat, violations_text)
+
+    while True:
+        if response is None:
+            raise Exception("Response was blocked by safety filters")
+
+        result.add_batch(response)
+        if on_batch:
+            on_batch(result)
+
+        if result.complete or result.batches >= max_batches:
+            break
+        response = await send_continuation_async(chat)
+
+    if not result.complete:
+        print(f"Warning: Stopped after {result.batches} batches with more output pending")
+    return result
+
+
+def partition_violations(violations: List[Dict[str, Any]], region_index: RegionIndex, sessions: int) -> List[List[Dict[str, Any]]]:
+    """
+    Split violations into at most `sessions` groups of contiguous top-level
+    regions (functions, classes, ...) of the file, balanced by violation count.
+    Violations of one region always stay in the same group, so parallel sessions
+    rarely rewrite the same lines.
+    """
+    by_region: Dict[int, List[Dict[str, Any]]] = {}
+    for violation in violations:
+        try:
+            region = region_index.region_of(int(violation.get('line')))
+        except (TypeError, ValueError):
+            region = -1
+        by_region.setdefault(region, []).append(violation)
+
+    sessions = max(1, min(sessions, len(by_region)))
+    target_size = -(-len(violations) // sessions)
+    groups: List[List[Dict[str, Any]]] = [[]]
+    for region in sorted(by_region):
+        if len(groups[-1]) >= target_size and len(groups) < sessions:
+            groups.append([])
+        groups[-1].extend(by_region[region])
+    return [group for group in groups if group]
+
+
+def sessions_for(violation_count: int, requested: Optional[int] = None) -> int:
+    """Number of chat sessions to use for a violation list"""
+    requested = PARALLEL_SESSIONS if requested is None else requested
+    by_size = max(1, violation_count // max(1, MIN_VIOLATIONS_PER_SESSION))
+    return max(1, min(requested, by_size))
+
+
+def fork_summary(result: FixResult) -> List[Dict[str, str]]:
+    """
+    Two turns standing in for a forked session's conversation in the main chat:
+    the violations it fixed and the lines it produced, without the prompts and
+    file excerpts it was sent
+    """
+    violations = "\n".join(
+        f"Line: {violation_key}\nRule: {entry.get('rule', '')}" for violation_key, entry in result.violation_mapping.items()
+    )
+    fixed_lines = "\n".join(f"{line_key}:{content}" for line_key, content in result.code_snippets.items())
+    return [
+        {'role': 'user', 'text': f"Violations fixed in a parallel session:\n{violations}"},
+        {'role': 'model', 'text': f"Fixed lines:\n{fixed_lines}"},
+    ]
+
+
+async def run_fix_parallel(
+    chat,
+    violation_texts: List[str],
+    max_batches: int = MAX_CONTINUATION_BATCHES,
+    on_batch: Optional[Callable[[FixResult], None]] = None
+) -> Tuple[FixResult, Any]:
+    """
+    Fix several violation groups concurrently, one chat session per group.
+
+    The first group runs on chat itself; the others run on forks of it, which
+    share its history (and therefore the file intro) without re-sending the
+    file. Each session follows its own continuation batches as a concurrent
+    task on the event loop, and the results are merged with FixResult.combine.
+
+    Returns the merged result and the chat to continue the project with: chat
+    followed by a compact summary of each fork (fork_summary), so follow-up
+    messages know every group's fixes without carrying the forks' excerpts.
+    """
+    if len(violation_texts) <= 1:
+        result = await run_fix_with_continuation(chat, violation_texts[0] if violation_texts else "", max_batches, on_batch)
+        return result, chat
+
+    chats = [chat] + [fork_chat(chat) for _ in violation_texts[1:]]
+    partial_results = [FixResult() for _ in violation_texts]
+
+    def report(session_index: int, partial: FixResult):
+        if on_batch:
+            partial_results[session_index] = partial
+            on_batch(FixResult.combine(partial_results))
+
+    results = await asyncio.gather(*[
+        run_fix_with_continuation(
+            session_chat,
+            violations_text,
+            max_batches,
+            lambda partial, session_index=session_index: report(session_index, partial)
+        )
+        for session_index, (session_chat, violations_text) in enumerate(zip(chats, violation_texts))
+    ])
+
+    chat = append_history(chat, [turn for result in results[1:] for turn in fork_summary(result)])
+
+    combined = FixResult.combine(results)
+    if combined.conflicts:
+        print(f"Warning: {len(combined.conflicts)} conflicting line keys across {len(results)} sessions")
+    return combined, chat
@@ -1,6 +1,32 @@
 # fixed_response_code_snippet.py
 import re
 import json
+import ast
+
+
+def _balanced_braces(text: str, start: int):
+    """Return the {...} literal starting at text[start], honouring quoted strings"""
+    depth = 0
+    quote = None
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if quote:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == quote:
+                quote = None
+        elif ch in ('"', "'"):
+            quote = ch
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
 
 
 def extract_violation_mapping(response_text: str) -> dict:
@@ -9,41 +35,88 @@ def extract_violation_mapping(response_text: str) -> dict:
     if start_key not in response_text:
         raise ValueError("Violation_Mapping_list not found in response.")
 
-    # Extract JSON portion of the dictionary
-    json_part = response_text.split(start_key, 1)[1].strip()
-    
+    # Extract the dictionary literal, ignoring code fences or text after it (e.g. --- CONTINUED ---)
+    after_key = response_text.split(start_key, 1)[1]
+    brace = after_key.find('{')
+    json_part = _balanced_braces(after_key, brace) if brace != -1 else None
+    if json_part is None:
+        raise ValueError("Failed to parse Violation_Mapping_list")
+
+    try:
+        return json.loads(json_part)
+    except ValueError:
+        pass
+
     try:
-        # Load it safely using `eval` with dictionary only context
-        violation_mapping = eval(json_part, {"__builtins__": None}, {})
-        return violation_mapping
+        # Python-style literals (single quotes, trailing commas); never evaluates code
+        return ast.literal_eval(json_part)
     except Exception as e:
         raise ValueError("Failed to parse Violation_Mapping_list") from e
 
 
+# Matches a complete ```cpp ... ``` block (non-greedy)
+CODE_BLOCK_PATTERN = re.compile(r"```(?:cpp|c\+\+)?\s*\n(.*?)```", re.DOTALL)
+SNIPPET_LINE_PATTERN = re.compile(r"^(\d+[a-zA-Z]*):(.*)$")
+
+
+def parse_snippet_block(block: str) -> dict:
+    """Parse the line-numbered lines of one code block into {line_key: code}"""
+    lines_by_key = {}
+    for line in block.strip().splitlines():
+        match = SNIPPET_LINE_PATTERN.match(line)
+        if match:
+            lineno = match.group(1).strip()
+            code = match.group(2).rstrip()  # Do NOT strip backslashes
+            lines_by_key[lineno] = code
+        else:
+            print(f"⚠️ Skipping: {line}")
+    return lines_by_key
+
+
 def extract_snippets_from_response(response_text):
     """
     Parses Gemini-style C++ response text and extracts line-numbered code,
     preserving backslashes and formatting. Returns a dictionary.
     """
-    # Match all ```cpp ... ``` blocks (non-greedy)
-    code_blocks = re.findall(r"```(?:cpp|c\+\+)?\s*\n(.*?)```", response_text, re.DOTALL)
-    
     all_lines = {}
 
-    for block in code_blocks:
-        lines = block.strip().splitlines()
-        for line in lines:
-            match = re.match(r"^(\d+[a-zA-Z]*):(.*)$", line)
-            if match:
-                lineno = match.group(1).strip()
-                code = match.group(2).rstrip()  # Do NOT strip backslashes
-                all_lines[lineno] = code
-            else:
-                print(f"⚠️ Skipping: {line}")
+    # Match all ```cpp ... ``` blocks (non-greedy)
+    for match in CODE_BLOCK_PATTERN.finditer(response_text):
+        all_lines.update(parse_snippet_block(match.group(1)))
     
     return all_lines
 
 
+class SnippetStreamParser:
+    """
+    Incrementally extracts snippets from a streamed response.
+
+    Text chunks are fed as they arrive; every ```cpp block is parsed as soon as
+    its closing fence is received. The accumulated result is the same as
+    extract_snippets_from_response on the full text.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._scan_pos = 0
+        self.snippets = {}
+
+    def feed(self, text: str) -> dict:
+        """Add a chunk of response text; returns snippets from blocks completed by it"""
+        self._buffer += text
+        new_snippets = {}
+        for match in CODE_BLOCK_PATTERN.finditer(self._buffer, self._scan_pos):
+            new_snippets.update(parse_snippet_block(match.group(1)))
+            self._scan_pos = match.end()
+        self.snippets.update(new_snippets)
+        return new_snippets
+
+    @property
+    def text(self) -> str:
+        """Full response text received so far"""
+        return self._buffer
+
+
 def save_snippets_to_json(snippets, filepath="temp_snippets.json"):
     with open(filepath, "w") as f:
         json.dump(snippets, f, indent=2)
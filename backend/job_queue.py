@@ -0,0 +1,298 @@
+# job_queue.py - Bounded background runner for long LLM operations
+
+import asyncio
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from session_store import SessionStore, dump_value, load_value
+
+FINISHED_STATUSES = ('completed', 'error', 'cancelled')
+
+# How often a worker checks the shared store for cancel requests of its running jobs (seconds)
+CANCEL_POLL_INTERVAL = 1.0
+
+
+@dataclass
+class Job:
+    """One background operation; progress and partial_snippets are updated while it runs"""
+    id: str
+    kind: str
+    project_id: str
+    status: str = 'queued'
+    progress: Dict[str, Any] = field(default_factory=dict)
+    partial_snippets: Dict[str, str] = field(default_factory=dict)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+    # Called with the job and its newly parsed snippets whenever it changes
+    listener: Optional[Callable[["Job", Dict[str, str]], None]] = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def report(self, progress: Dict[str, Any], snippets: Optional[Dict[str, str]] = None):
+        """Record progress (and the snippets parsed so far) of a running job"""
+        self.progress = progress
+        new_snippets = {}
+        if snippets is not None:
+            new_snippets = {key: content for key, content in snippets.items() if self.partial_snippets.get(key) != content}
+            self.partial_snippets = dict(snippets)
+        self.notify(new_snippets)
+
+    def notify(self, new_snippets: Optional[Dict[str, str]] = None):
+        if self.listener:
+            try:
+                self.listener(self, new_snippets or {})
+            except Exception as e:
+                print(f"Error notifying listener of job {self.id}: {str(e)}")
+
+    def to_dict(self, include_snippets: bool = True) -> Dict[str, Any]:
+        data = {
+            'jobId': self.id,
+            'kind': self.kind,
+            'projectId': self.project_id,
+            'status': self.status,
+            'progress': self.progress,
+            'partialSnippetsCount': len(self.partial_snippets),
+            'result': self.result,
+            'error': self.error,
+            'createdAt': self.created_at,
+            'startedAt': self.started_at,
+            'finishedAt': self.finished_at,
+        }
+        if include_snippets:
+            data['partialSnippets'] = self.partial_snippets
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Job":
+        """Job as described by to_dict(), e.g. one that runs in another worker"""
+        return cls(
+            id=data['jobId'],
+            kind=data['kind'],
+            project_id=data['projectId'],
+            status=data['status'],
+            progress=data.get('progress') or {},
+            partial_snippets=data.get('partialSnippets') or {},
+            result=data.get('result'),
+            error=data.get('error'),
+            created_at=data['createdAt'],
+            started_at=data.get('startedAt'),
+            finished_at=data.get('finishedAt'),
+        )
+
+
+class JobQueue:
+    """
+    Runs submitted coroutines as asyncio tasks with at most max_running at a time.
+
+    Jobs of the same project run one after another in submission order, since
+    they share the project's chat session. Finished jobs are kept for
+    retention_seconds (and at most max_finished of them) so clients can poll
+    their results.
+
+    With a shared store, a background thread writes the latest snapshot of each
+    changed job to it (a burst of progress updates costs one write), so any
+    worker can report a job; cancelling a job of another worker leaves a
+    request in the store that the owning worker picks up.
+    """
+
+    def __init__(self, max_running: int = 4, max_finished: int = 1000, retention_seconds: float = 3600,
+                 store: Optional[SessionStore] = None):
+        self.max_running = max(1, max_running)
+        self.max_finished = max_finished
+        self.retention_seconds = retention_seconds
+        self.store = store or SessionStore()
+        self.jobs: Dict[str, Job] = {}
+        self.listener: Optional[Callable[[Job, Dict[str, str]], None]] = None
+        self.submitted = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._loop = None
+        self._slots = None
+        self._project_locks: Dict[str, asyncio.Lock] = {}
+        self._project_pending: Dict[str, int] = {}
+        # Jobs to write to the shared store, and (job id, project id) of jobs to remove from it
+        self._changed: Dict[str, Job] = {}
+        self._removed: List[tuple] = []
+        self._sync_condition = threading.Condition()
+        self._sync_thread: Optional[threading.Thread] = None
+
+    def _bind_loop(self):
+        # Semaphores and locks belong to one event loop; start fresh if it changed
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_running)
+            self._project_locks = {}
+            self._project_pending = {}
+        return loop
+
+    def submit(self, kind: str, project_id: str, run: Callable[[Job], Awaitable[Dict[str, Any]]]) -> Job:
+        """Queue run(job) and return the job immediately; must be called on the event loop"""
+        loop = self._bind_loop()
+        job = Job(id=uuid.uuid4().hex, kind=kind, project_id=project_id, listener=self._job_changed)
+        with self._lock:
+            self._prune()
+            self.jobs[job.id] = job
+            self.submitted += 1
+
+        if project_id not in self._project_locks:
+            self._project_locks[project_id] = asyncio.Lock()
+        self._project_pending[project_id] = self._project_pending.get(project_id, 0) + 1
+        job.task = loop.create_task(self._run(job, run))
+        job.task.add_done_callback(lambda task: self._finish(job))
+        job.notify()
+        return job
+
+    async def _run(self, job: Job, run: Callable[[Job], Awaitable[Dict[str, Any]]]):
+        async with self._project_locks[job.project_id]:
+            async with self._slots:
+                job.status = 'running'
+                job.started_at = time.time()
+                job.notify()
+                # finished_at is set together with the terminal status, so _prune never sees one without the other
+                try:
+                    job.result = await run(job)
+                    job.status, job.finished_at = 'completed', time.time()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"Background {job.kind} job {job.id} for project {job.project_id} failed: {str(e)}")
+                    job.error = str(e)
+                    job.status, job.finished_at = 'error', time.time()
+                    with self._lock:
+                        self.failed += 1
+
+    def _finish(self, job: Job):
+        # Also runs for tasks cancelled before they started
+        if not job.finished:
+            job.status, job.finished_at = 'cancelled', time.time()
+        job.task = None
+        job.notify()
+        self._project_pending[job.project_id] -= 1
+        if not self._project_pending[job.project_id]:
+            del self._project_pending[job.project_id]
+            del self._project_locks[job.project_id]
+
+    def _prune(self):
+        """Drop finished jobs past their retention time, and the oldest beyond max_finished"""
+        cutoff = time.time() - self.retention_seconds
+        finished = [job for job in self.jobs.values() if job.finished]
+        excess = len(finished) - self.max_finished
+        for index, job in enumerate(finished):
+            if index < excess or (job.finished_at is not None and job.finished_at < cutoff):
+                del self.jobs[job.id]
+                if self.store.shared:
+                    with self._sync_condition:
+                        self._removed.append((job.id, job.project_id))
+
+    def _job_changed(self, job: Job, new_snippets: Dict[str, str]):
+        if self.store.shared:
+            with self._sync_condition:
+                self._changed[job.id] = job
+                if self._sync_thread is None:
+                    self._sync_thread = threading.Thread(target=self._sync, daemon=True)
+                    self._sync_thread.start()
+                self._sync_condition.notify()
+        if self.listener:
+            self.listener(job, new_snippets)
+
+    def _sync(self):
+        """Write changed jobs to the shared store and apply cancel requests from other workers"""
+        checked_at = 0.0
+        while True:
+            with self._sync_condition:
+                if not self._changed and not self._removed:
+                    self._sync_condition.wait(CANCEL_POLL_INTERVAL)
+                changed, self._changed = self._changed, {}
+                removed, self._removed = self._removed, []
+            try:
+                for job in changed.values():
+                    self.store.save_job(job.id, job.project_id, dump_value(job.to_dict()))
+                for job_id, project_id in removed:
+                    self.store.remove_job(job_id, project_id)
+                if time.monotonic() - checked_at >= CANCEL_POLL_INTERVAL:
+                    checked_at = time.monotonic()
+                    with self._lock:
+                        running = [job.id for job in self.jobs.values() if not job.finished]
+                    for job_id in self.store.cancel_requested(running):
+                        self.cancel(job_id)
+            except Exception as e:
+                print(f"Error syncing jobs with the session store: {str(e)}")
+                time.sleep(CANCEL_POLL_INTERVAL)
+
+    def _stored_job(self, data: bytes) -> Optional[Job]:
+        try:
+            return Job.from_dict(load_value(data))
+        except (ValueError, KeyError) as e:
+            print(f"Ignoring stored job: {str(e)}")
+            return None
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """A job of this worker or, with a shared store, of another one"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None and self.store.shared:
+            data = self.store.load_job(job_id)
+            job = self._stored_job(data) if data is not None else None
+        return job
+
+    def list(self, project_id: Optional[str] = None) -> List[Job]:
+        with self._lock:
+            jobs = [job for job in self.jobs.values() if project_id is None or job.project_id == project_id]
+        if self.store.shared:
+            local = {job.id for job in jobs}
+            stored = (self._stored_job(data) for data in self.store.list_jobs(project_id))
+            jobs += [job for job in stored if job is not None and job.id not in local]
+        return jobs
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job; returns False if it is unknown or already
+        finished. Safe to call from any thread.
+        """
+        with self._lock:
+            local = job_id in self.jobs
+        job = self.get(job_id)
+        if not job or job.finished:
+            return False
+        if not local:
+            # Running in another worker, which checks for cancel requests
+            self.store.request_cancel(job_id)
+            return True
+        if job.task is None:
+            return False
+        self._loop.call_soon_threadsafe(job.task.cancel)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {
+                'max_running': self.max_running,
+                'submitted': self.submitted,
+                'failed': self.failed,
+                'queued': counts.get('queued', 0),
+                'running': counts.get('running', 0),
+                'retained': len(self.jobs),
+                'by_status': counts,
+            }
+
+
+# Global job queue instance
+job_queue = JobQueue(
+    max_running=int(os.environ.get('MISRA_MAX_RUNNING_JOBS', 4)),
+    max_finished=int(os.environ.get('MISRA_MAX_FINISHED_JOBS', 1000)),
+    retention_seconds=float(os.environ.get('MISRA_JOB_RETENTION_SECONDS', 3600)),
+)
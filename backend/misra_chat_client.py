@@ -1,13 +1,16 @@
 # misra_chat_client.py
+import os
+import threading
+import weakref
+from abc import ABC, abstractmethod
+import time
+from collections import OrderedDict
 import vertexai
-from vertexai.generative_models import GenerativeModel, ChatSession, GenerationConfig, SafetySetting, HarmCategory, HarmBlockThreshold
+from vertexai.generative_models import GenerativeModel, ChatSession, Content, Part, GenerationConfig, SafetySetting, HarmCategory, HarmBlockThreshold
 
-# === Step 0: Init Vertex AI ===
+# === Step 0: Init Vertex AI (or the configured LLM backend) ===
 def init_vertex_ai():
-    vertexai.init(
-        project="rock-range-464908-g5",
-        location="global"
-    )
+    get_backend().init()
 
 # === Step 1: Load Numbered C++ File ===
 def load_cpp_file(file_path: str) -> str:
@@ -15,13 +18,7 @@ def load_cpp_file(file_path: str) -> str:
         return f.read()
 
 # === Step 2: Start Gemini Chat ===
-def start_chat(
-    model_name="gemini-2.5-pro",
-    temperature=0.5,
-    top_p=0.95,
-    max_tokens=65535,
-    safety_settings=False
-) -> ChatSession:
+def build_model(model_name: str, temperature: float, top_p: float, max_tokens: int, safety_settings: bool) -> GenerativeModel:
     # Setup generation config with provided settings
     generation_config = GenerationConfig(
         temperature=temperature,
@@ -49,53 +46,281 @@ def start_chat(
         ]
 
     # Initialize model with configs
-    model = GenerativeModel(
+    return GenerativeModel(
         model_name=model_name,
         generation_config=generation_config,
         safety_settings=safety_config,
     )
+
+class ModelCache:
+    """
+    LRU cache of configured GenerativeModel instances keyed by their settings.
+
+    A model holds no conversation state (that lives in each ChatSession), so one
+    instance per settings tuple can back any number of chats. Tracks how much
+    model setup time the hits avoided, estimated from the average cost of a miss.
+    """
+
+    def __init__(self, max_models: int = 16):
+        self._max_models = max_models
+        self._models: "OrderedDict[tuple, GenerativeModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.setup_seconds = 0.0
+
+    def get(self, model_name: str, temperature: float, top_p: float, max_tokens: int, safety_settings: bool) -> GenerativeModel:
+        key = (model_name, float(temperature), float(top_p), int(max_tokens), bool(safety_settings))
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return model
+
+        start = time.perf_counter()
+        model = build_model(*key)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.misses += 1
+            self.setup_seconds += elapsed
+            # Another request may have built the same model meanwhile; keep the first
+            model = self._models.setdefault(key, model)
+            self._models.move_to_end(key)
+            while len(self._models) > self._max_models:
+                self._models.popitem(last=False)
+        return model
+
+    def stats(self) -> dict:
+        with self._lock:
+            average_setup = self.setup_seconds / self.misses if self.misses else 0.0
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'cached_models': len(self._models),
+                'average_setup_ms': round(average_setup * 1000, 3),
+                'setup_time_saved_ms': round(self.hits * average_setup * 1000, 3),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+# Global model cache instance
+model_cache = ModelCache(max_models=int(os.environ.get('MISRA_MODEL_CACHE_SIZE', 16)))
+
+# === LLM backends ===
+class LLMBackend(ABC):
+    """
+    Model provider behind the chat helpers in this module.
+
+    Chats returned by start_chat must behave like vertexai's ChatSession:
+    send_message / send_message_async (both with stream=True support) returning
+    responses with a .text attribute. A backend missing any abstract method
+    fails when it is instantiated.
+    """
+    name = "base"
+
+    def init(self):
+        pass
+
+    @abstractmethod
+    def start_chat(self, model_name: str, temperature: float, top_p: float, max_tokens: int, safety_settings: bool):
+        """New chat on a model with the given settings"""
+
+    @abstractmethod
+    def fork_chat(self, chat):
+        """New chat starting from a copy of chat's history"""
+
+    @abstractmethod
+    def chat_history(self, chat) -> list:
+        """The chat's turns as [{'role': 'user' | 'model', 'text': ...}]"""
+
+    @abstractmethod
+    def resume_chat(self, model_name: str, temperature: float, top_p: float, max_tokens: int, safety_settings: bool, history: list):
+        """New chat continuing from turns in the form chat_history returns"""
+
+    @abstractmethod
+    def append_history(self, chat, turns: list):
+        """
+        Chat continuing from chat's history followed by turns in the form chat_history
+        returns. It may be a new chat object, so callers continue with the returned one.
+        """
+
+class VertexBackend(LLMBackend):
+    """Gemini on Vertex AI"""
+    name = "vertex"
+
+    def __init__(self, project: str = "rock-range-464908-g5", location: str = "global"):
+        self.project = project
+        self.location = location
+        # Cached model behind each chat, so forks and extended histories are built on it
+        self._chat_models = weakref.WeakKeyDictionary()
+
+    def init(self):
+        vertexai.init(
+            project=self.project,
+            location=self.location
+        )
+
+    def start_chat(self, model_name: str, temperature: float, top_p: float, max_tokens: int, safety_settings: bool) -> ChatSession:
+        model = model_cache.get(model_name, temperature, top_p, max_tokens, safety_settings)
+        return self._new_chat(model, [])
+
+    def _new_chat(self, model: GenerativeModel, history: list) -> ChatSession:
+        chat = ChatSession(model, history=history)
+        self._chat_models[chat] = model
+        return chat
+
+    def fork_chat(self, chat: ChatSession) -> ChatSession:
+        return self._new_chat(self._chat_models[chat], list(chat.history))
+
+    def chat_history(self, chat: ChatSession) -> list:
+        return [
+            {'role': content.role, 'text': "".join(part.text for part in content.parts)}
+            for content in chat.history
+        ]
+
+    def resume_chat(self, model_name: str, temperature: float, top_p: float, max_tokens: int, safety_settings: bool, history: list) -> ChatSession:
+        model = model_cache.get(model_name, temperature, top_p, max_tokens, safety_settings)
+        return self._new_chat(model, [
+            Content(role=turn['role'], parts=[Part.from_text(turn['text'])]) for turn in history
+        ])
+
+    def append_history(self, chat: ChatSession, turns: list) -> ChatSession:
+        return self._new_chat(self._chat_models[chat], list(chat.history) + [
+            Content(role=turn['role'], parts=[Part.from_text(turn['text'])]) for turn in turns
+        ])
+
+_backend = None
+
+def get_backend() -> LLMBackend:
+    """Backend selected by MISRA_LLM_BACKEND ('vertex' by default, or 'fake' for offline runs)"""
+    global _backend
+    if _backend is None:
+        name = os.environ.get('MISRA_LLM_BACKEND', 'vertex')
+        if name == 'vertex':
+            _backend = VertexBackend(
+                project=os.environ.get('MISRA_VERTEX_PROJECT', "rock-range-464908-g5"),
+                location=os.environ.get('MISRA_VERTEX_LOCATION', "global")
+            )
+        elif name == 'fake':
+            from fake_gemini import FakeGeminiBackend
+            _backend = FakeGeminiBackend.from_env()
+        else:
+            raise ValueError(f"Unknown LLM backend: {name}")
+    return _backend
+
+def set_backend(backend: LLMBackend):
+    """Replace the LLM backend (e.g. with a FakeGeminiBackend in benchmarks)"""
+    global _backend
+    _backend = backend
+
+def start_chat(
+    model_name="gemini-2.5-pro",
+    temperature=0.5,
+    top_p=0.95,
+    max_tokens=65535,
+    safety_settings=False
+) -> ChatSession:
+    chat = get_backend().start_chat(model_name, temperature, top_p, max_tokens, safety_settings)
     print("************************")
     print(model_name)
 
-    return model.start_chat()
+    return chat
+
+# === Step 2b: Fork a chat that already received the file ===
+def fork_chat(chat: ChatSession) -> ChatSession:
+    """New chat session on the same model, starting from a copy of chat's history (file intro included)"""
+    return get_backend().fork_chat(chat)
+
+# === Step 2c: Save and restore a chat's history ===
+def chat_history(chat) -> list:
+    """The chat's turns as [{'role': ..., 'text': ...}], for persisting the conversation"""
+    return get_backend().chat_history(chat)
+
+def resume_chat(
+    history: list,
+    model_name="gemini-2.5-pro",
+    temperature=0.5,
+    top_p=0.95,
+    max_tokens=65535,
+    safety_settings=False
+) -> ChatSession:
+    """New chat session that continues a persisted conversation without re-sending it"""
+    return get_backend().resume_chat(model_name, temperature, top_p, max_tokens, safety_settings, history)
+
+def append_history(chat, turns: list):
+    """Chat continuing from chat's history plus turns that were never sent on it (e.g. a fork's summary)"""
+    return get_backend().append_history(chat, turns)
 
 # === Step 3: Send first prompt with file ===
-def send_file_intro(chat: ChatSession, numbered_cpp: str):
-    intro_prompt = (
+def build_intro_prompt(excerpt: bool = False) -> str:
+    if excerpt:
+        content = (
+            "I am providing you with excerpts of a C++ source file: the scopes around the lines that have MISRA violations "
+            "and the declarations they reference. Each line is prefixed with its original line number followed by a colon, "
+            "and omitted ranges are marked with '// ... lines X-Y omitted ...' comments; never output those marker lines. "
+            "Please acknowledge that you have received and processed these excerpts. "
+        )
+    else:
+        content = (
+            "I am providing you with the complete content of a C++ source file. Each line of the file is prefixed with "
+            "its original line number followed by a colon. Please acknowledge that you have received and processed this entire file. "
+        )
+    return (
         "You are an expert C++ developer specializing in MISRA C++ compliance for AUTOSAR embedded systems. "
-        "I am providing you with the complete content of a C++ source file. Each line of the file is prefixed with "
-        "its original line number followed by a colon. Please acknowledge that you have received and processed this entire file. "
+        + content +
         "Do not start fixing anything yet. Just confirm its reception and readiness for the next input, by saying: "
         "'FILE RECEIVED. READY FOR VIOLATIONS.'"
     )
 
+def _intro_response_text(resp):
+    print("\n=== Gemini ===", flush=True)
+    
+    # Handle blocked responses
+    if resp is None:
+        print("Response was blocked by safety filters")
+        return None
+    
+    # Check if response has text
+    if hasattr(resp, 'text') and resp.text:
+        print(resp.text)
+        return resp.text
+    else:
+        print("Response was empty or blocked")
+        return None
+
+def send_file_intro(chat: ChatSession, numbered_cpp: str, excerpt: bool = False):
+    intro_prompt = build_intro_prompt(excerpt)
+
     try:
         # Send system + file content
         #chat.send_message(intro_prompt)
         combined_message = intro_prompt + "\n\n" + numbered_cpp
         resp = chat.send_message(combined_message)
-        print("\n=== Gemini ===", flush=True)
-        
-        # Handle blocked responses
-        if resp is None:
-            print("Response was blocked by safety filters")
-            return None
-        
-        # Check if response has text
-        if hasattr(resp, 'text') and resp.text:
-            print(resp.text)
-            return resp.text
-        else:
-            print("Response was empty or blocked")
-            return None
+        return _intro_response_text(resp)
             
     except Exception as e:
         print(f"Error in send_file_intro: {str(e)}")
         return None
 
+async def send_file_intro_async(chat: ChatSession, numbered_cpp: str, excerpt: bool = False):
+    """send_file_intro awaiting the model on the event loop instead of blocking a thread"""
+    intro_prompt = build_intro_prompt(excerpt)
+
+    try:
+        resp = await chat.send_message_async(intro_prompt + "\n\n" + numbered_cpp)
+        return _intro_response_text(resp)
+            
+    except Exception as e:
+        print(f"Error in send_file_intro_async: {str(e)}")
+        return None
+
 # === Step 4: Send list of violations to fix ===
-def send_misra_violations(chat: ChatSession, violations_text: str) -> str:
-    second_prompt = (
+def build_violations_prompt(violations_text: str) -> str:
+    return (
         """
             Thank you for confirming. The C++ file content you received previously is the current state of the file, which may have already undergone some fixes.
 
@@ -151,7 +376,56 @@ def send_misra_violations(chat: ChatSession, violations_text: str) -> str:
         + violations_text
     )
 
-    resp = chat.send_message(second_prompt)
+def with_additional_excerpts(violations_text: str, excerpt_text: str) -> str:
+    """Prepend file excerpts the chat has not seen yet (sliced context mode) to a violations list"""
+    if not excerpt_text:
+        return violations_text
+    return (
+        "\n\nAdditional excerpts of the same C++ file, with the same line numbering, needed for these violations:\n\n"
+        + excerpt_text
+        + "\n"
+        + violations_text
+    )
+
+async def send_misra_violations_async(chat: ChatSession, violations_text: str) -> str:
+    resp = await chat.send_message_async(build_violations_prompt(violations_text))
     print("\n=== Gemini Fixes ===")
     print(resp.text)
     return resp.text
+
+# === Step 4 (streaming): Send violations and yield the response as it is generated ===
+async def _stream_message_text(chat: ChatSession, message: str):
+    """Yield response text chunks from the model's async streaming API as they arrive"""
+    async for chunk in await chat.send_message_async(message, stream=True):
+        try:
+            text = chunk.text
+        except (ValueError, AttributeError):
+            # Chunks without text (e.g. only finish/safety metadata)
+            continue
+        if text:
+            yield text
+
+async def send_misra_violations_stream(chat: ChatSession, violations_text: str):
+    """Yield response text chunks for the violations prompt as they arrive"""
+    async for text in _stream_message_text(chat, build_violations_prompt(violations_text)):
+        yield text
+
+# === Step 5: Request the next batch when the model signals more output ===
+# The violations prompt asks the model to end partial output with this marker and wait for 'next'
+CONTINUATION_MARKER = "--- CONTINUED ---"
+CONTINUATION_PROMPT = "next"
+
+def has_continuation(response_text: str) -> bool:
+    """True if the model stopped early and more snippets are pending"""
+    return bool(response_text) and CONTINUATION_MARKER in response_text
+
+async def send_continuation_async(chat: ChatSession) -> str:
+    resp = await chat.send_message_async(CONTINUATION_PROMPT)
+    print("\n=== Gemini Fixes (continued) ===")
+    print(resp.text)
+    return resp.text
+
+async def send_continuation_stream(chat: ChatSession):
+    """Yield response text chunks for the next batch as they arrive"""
+    async for text in _stream_message_text(chat, CONTINUATION_PROMPT):
+        yield text
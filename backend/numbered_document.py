@@ -0,0 +1,250 @@
+# numbered_document.py - In-memory numbered C++ file with an overlay of fixes
+
+import hashlib
+import threading
+import uuid
+from typing import Dict, List, Optional, Tuple
+from cpp_scopes import RegionIndex
+from denumbering import denumber_line
+from replace import merge_fixed_snippets, line_sort_key
+
+
+class NumberedDocument:
+    """
+    In-memory model of a numbered C++ file.
+
+    Holds the original source lines plus overlays of fixed lines keyed by line
+    keys ('52', '52a', ...) and renders the numbered, merged and denumbered text
+    on demand, replacing the numbered/temp-fixed files previously kept in uploads/.
+    Each named overlay is a MergedView that is patched incrementally.
+    """
+
+    def __init__(self, lines: List[str], trailing_newline: bool = True):
+        # Source lines without their trailing newline
+        self.lines = lines
+        self.trailing_newline = trailing_newline
+        # Same {line_key: content} shape merge_fixed_snippets_into_file reads from a numbered file
+        self.original_lines: Dict[str, str] = {str(i): f" {line}" for i, line in enumerate(lines, start=1)}
+        self._original_sort_keys = [(i, '') for i in range(1, len(lines) + 1)]
+        self._base_numbered: Optional[List[str]] = None
+        self._base_denumbered: Optional[List[str]] = None
+        self._original_text: Optional[str] = None
+        self._numbered_text: Optional[str] = None
+        self._region_index: Optional[RegionIndex] = None
+        self._content_hash: Optional[str] = None
+        self._views: Dict[str, "MergedView"] = {}
+        self._lock = threading.RLock()
+        # Identifies this in-memory copy; each worker process builds its own
+        self.instance_id = uuid.uuid4().hex
+
+    @classmethod
+    def from_text(cls, text: str) -> "NumberedDocument":
+        """Create a document from source text (newlines already normalized to \\n)"""
+        if not text:
+            return cls([], trailing_newline=False)
+        trailing_newline = text.endswith('\n')
+        lines = text.split('\n')
+        if trailing_newline:
+            lines.pop()
+        return cls(lines, trailing_newline)
+
+    @classmethod
+    def from_file(cls, file_path: str) -> "NumberedDocument":
+        """Create a document from a C++ source file"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return cls.from_text(f.read())
+
+    def original_text(self) -> str:
+        """Original source text"""
+        if self._original_text is None:
+            text = '\n'.join(self.lines)
+            self._original_text = text + '\n' if self.lines and self.trailing_newline else text
+        return self._original_text
+
+    def numbered_text(self) -> str:
+        """Original source with line number prefixes (same output as add_line_numbers), built once"""
+        if self._numbered_text is None:
+            text = '\n'.join(f"{key}:{content}" for key, content in self.original_lines.items())
+            self._numbered_text = text + '\n' if self.lines and self.trailing_newline else text
+        return self._numbered_text
+
+    def content_hash(self) -> str:
+        """SHA256 of the numbered text, computed once"""
+        with self._lock:
+            if self._content_hash is None:
+                self._content_hash = hashlib.sha256(self.numbered_text().encode('utf-8')).hexdigest()
+            return self._content_hash
+
+    def region_index(self) -> RegionIndex:
+        """Top-level regions (functions, classes, ...) of the source, scanned once"""
+        with self._lock:
+            if self._region_index is None:
+                self._region_index = RegionIndex.from_lines(self.lines)
+            return self._region_index
+
+    def base_chunks(self) -> Tuple[List[str], List[str]]:
+        """Per-line numbered and denumbered text of the original, built once"""
+        with self._lock:
+            if self._base_numbered is None:
+                self._base_numbered = [f"{key}:{content}\n" for key, content in self.original_lines.items()]
+                self._base_denumbered = [denumber_line(line) for line in self._base_numbered]
+            return self._base_numbered, self._base_denumbered
+
+    def memory_size(self) -> int:
+        """Approximate bytes held once the base chunks and a view are rendered"""
+        text_size = sum(len(line) for line in self.lines)
+        # lines, original_lines, the numbered text, the two base chunk lists and two chunk
+        # lists per view, each line a str object plus its list or dict slot
+        copies = 5 + 2 * max(len(self._views), 1)
+        return copies * (text_size + 64 * len(self.lines))
+
+    def view(self, name: str) -> "MergedView":
+        """Get (or create) the named incrementally maintained overlay"""
+        with self._lock:
+            merged_view = self._views.get(name)
+            if merged_view is None:
+                merged_view = MergedView(self)
+                self._views[name] = merged_view
+            return merged_view
+
+    def merged_entries(self, fixes: Dict[str, str]) -> List[Tuple[str, str]]:
+        """(line_key, content) pairs of the original merged with fixes"""
+        return merge_fixed_snippets(self.original_lines, fixes, self._original_sort_keys)
+
+    def merged_numbered_text(self, fixes: Dict[str, str]) -> str:
+        """Numbered text with fixes applied"""
+        return ''.join(f"{key}:{content}\n" for key, content in self.merged_entries(fixes))
+
+    def denumbered_text(self, fixes: Dict[str, str]) -> str:
+        """Plain source text with fixes applied and line numbers removed"""
+        return ''.join(denumber_line(f"{key}:{content}\n") for key, content in self.merged_entries(fixes))
+
+    def write_numbered(self, file_path: str):
+        """Write the numbered original to a file"""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(self.numbered_text())
+
+    def write_denumbered(self, file_path: str, fixes: Dict[str, str]):
+        """Write the fixed, denumbered source to a file"""
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(self.denumbered_text(fixes))
+
+
+class MergedView:
+    """
+    A NumberedDocument merged with one overlay of fixes, maintained incrementally.
+
+    The merged text is cached per original line ("slot": the line plus any lines
+    inserted after it, e.g. 52, 52a, 52b). Setting, changing or removing a fix only
+    re-renders the slot of its base line, so a review action costs O(changed lines)
+    instead of re-merging the whole file.
+    """
+
+    def __init__(self, document: NumberedDocument):
+        self._document = document
+        self._line_count = len(document.lines)
+        base_numbered, base_denumbered = document.base_chunks()
+        self._numbered = list(base_numbered)
+        self._denumbered = list(base_denumbered)
+        # Slots for fixes whose base line is outside the original file
+        self._extra_numbered: Dict[int, str] = {}
+        self._extra_denumbered: Dict[int, str] = {}
+        self._overlay: Dict[str, str] = {}
+        self._keys_by_base: Dict[int, Dict[str, None]] = {}
+        self._numbered_text: Optional[str] = None
+        self._denumbered_text: Optional[str] = None
+        self._lock = threading.RLock()
+
+    def _set(self, line_key: str, content: Optional[str]) -> Optional[int]:
+        """Update the overlay for one key; returns the base line whose slot changed"""
+        if content is None:
+            if line_key not in self._overlay:
+                return None
+            del self._overlay[line_key]
+            base = line_sort_key(line_key)[0]
+            keys = self._keys_by_base[base]
+            del keys[line_key]
+            if not keys:
+                del self._keys_by_base[base]
+            return base
+
+        if self._overlay.get(line_key) == content and line_key in self._overlay:
+            return None
+        base = line_sort_key(line_key)[0]
+        self._overlay[line_key] = content
+        self._keys_by_base.setdefault(base, {})[line_key] = None
+        return base
+
+    def _render_slot(self, base: int):
+        keys = self._keys_by_base.get(base)
+        fixes = {key: self._overlay[key] for key in keys} if keys else {}
+
+        if 1 <= base <= self._line_count:
+            if fixes:
+                original_key = str(base)
+                entries = merge_fixed_snippets(
+                    {original_key: self._document.original_lines[original_key]}, fixes, [(base, '')]
+                )
+                numbered = ''.join(f"{key}:{content}\n" for key, content in entries)
+                self._numbered[base - 1] = numbered
+                self._denumbered[base - 1] = ''.join(
+                    denumber_line(f"{key}:{content}\n") for key, content in entries
+                )
+            else:
+                base_numbered, base_denumbered = self._document.base_chunks()
+                self._numbered[base - 1] = base_numbered[base - 1]
+                self._denumbered[base - 1] = base_denumbered[base - 1]
+        elif fixes:
+            entries = merge_fixed_snippets({}, fixes, [])
+            self._extra_numbered[base] = ''.join(f"{key}:{content}\n" for key, content in entries)
+            self._extra_denumbered[base] = ''.join(
+                denumber_line(f"{key}:{content}\n") for key, content in entries
+            )
+        else:
+            self._extra_numbered.pop(base, None)
+            self._extra_denumbered.pop(base, None)
+
+        self._numbered_text = None
+        self._denumbered_text = None
+
+    def update(self, line_key: str, content: Optional[str]):
+        """Set one fixed line, or remove it from the overlay when content is None"""
+        with self._lock:
+            base = self._set(line_key, content)
+            if base is not None:
+                self._render_slot(base)
+
+    def sync(self, fixes: Dict[str, str]):
+        """Make the overlay equal to fixes, re-rendering only the slots that differ"""
+        with self._lock:
+            dirty = set()
+            for line_key in [key for key in self._overlay if key not in fixes]:
+                dirty.add(self._set(line_key, None))
+            for line_key, content in fixes.items():
+                base = self._set(line_key, content)
+                if base is not None:
+                    dirty.add(base)
+            dirty.discard(None)
+            for base in dirty:
+                self._render_slot(base)
+
+    def _join(self, chunks: List[str], extra: Dict[int, str]) -> str:
+        if not extra:
+            return ''.join(chunks)
+        before = [extra[base] for base in sorted(extra) if base < 1]
+        after = [extra[base] for base in sorted(extra) if base > self._line_count]
+        return ''.join(before + chunks + after)
+
+    def numbered_text(self) -> str:
+        """Numbered text with the overlay applied"""
+        with self._lock:
+            if self._numbered_text is None:
+                self._numbered_text = self._join(self._numbered, self._extra_numbered)
+            return self._numbered_text
+
+    def denumbered_text(self) -> str:
+        """Plain source text with the overlay applied and line numbers removed"""
+        with self._lock:
+            if self._denumbered_text is None:
+                self._denumbered_text = self._join(self._denumbered, self._extra_denumbered)
+            return self._denumbered_text
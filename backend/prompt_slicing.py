@@ -0,0 +1,178 @@
+# prompt_slicing.py - Excerpts of a numbered file around violated lines
+
+import os
+import re
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from numbered_document import NumberedDocument
+
+# 'full' sends the whole numbered file, 'sliced' only the scopes around violations
+CONTEXT_MODES = ('full', 'sliced')
+DEFAULT_CONTEXT_RADIUS = 20
+# Enclosing scopes longer than this are cut down to the radius window
+MAX_SCOPE_LINES = int(os.environ.get('MISRA_MAX_SCOPE_LINES', 300))
+# Referenced declarations up to this length are sent whole, longer ones by their header
+MAX_DECLARATION_LINES = 5
+
+_IDENTIFIER_RE = re.compile(r'[A-Za-z_]\w*')
+_INCLUDE_RE = re.compile(r'^\s*#\s*include\b')
+_DEFINE_RE = re.compile(r'^\s*#\s*define\s+([A-Za-z_]\w*)')
+# End of a declaration's name: parameter list, initializer, body, base list (not '::') or end
+_HEADER_END_RE = re.compile(r'\(|=|\{|;|(?<!:):(?!:)')
+_CPP_KEYWORDS = frozenset((
+    'auto', 'bool', 'char', 'class', 'const', 'constexpr', 'double', 'enum', 'extern', 'final',
+    'float', 'inline', 'int', 'long', 'noexcept', 'operator', 'override', 'private', 'protected',
+    'public', 'short', 'signed', 'static', 'struct', 'template', 'typedef', 'typename', 'union',
+    'unsigned', 'using', 'virtual', 'void', 'volatile',
+))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for code)"""
+    return (len(text) + 3) // 4
+
+
+def _declared_names(lines: List[str]) -> Set[str]:
+    """Names introduced by one top-level declaration"""
+    define = _DEFINE_RE.match(lines[0])
+    if define:
+        return {define.group(1)}
+
+    text = '\n'.join(lines)
+    names = set()
+    header = _HEADER_END_RE.split(text, maxsplit=1)[0]
+    header_names = [name for name in _IDENTIFIER_RE.findall(header) if name not in _CPP_KEYWORDS]
+    if header_names:
+        names.add(header_names[-1])
+    # typedef struct { ... } Name; and similar trailing declarators
+    tail = text.rstrip().rstrip(';').rsplit('}', 1)
+    if len(tail) == 2:
+        tail_names = [name for name in _IDENTIFIER_RE.findall(tail[1]) if name not in _CPP_KEYWORDS]
+        if tail_names:
+            names.add(tail_names[-1])
+    return names
+
+
+# Per document: its #include lines and the top-level regions declaring each name
+_document_indexes: "weakref.WeakKeyDictionary[NumberedDocument, tuple]" = weakref.WeakKeyDictionary()
+_document_indexes_lock = threading.Lock()
+
+
+def _document_index(document: NumberedDocument) -> Tuple[List[int], Dict[str, List[Tuple[int, int]]]]:
+    """#include lines and {name: declaring regions} of a document, scanned once instead of per slice"""
+    with _document_indexes_lock:
+        index = _document_indexes.get(document)
+    if index is None:
+        include_lines = [i for i, text in enumerate(document.lines, start=1) if _INCLUDE_RE.match(text)]
+        declarations: Dict[str, List[Tuple[int, int]]] = {}
+        for first, last in document.region_index().regions:
+            for name in _declared_names(document.lines[first - 1:last]):
+                declarations.setdefault(name, []).append((first, last))
+        index = (include_lines, declarations)
+        with _document_indexes_lock:
+            index = _document_indexes.setdefault(document, index)
+    return index
+
+
+def _declaration_lines(document: NumberedDocument, first: int, last: int) -> range:
+    """Lines to send for a referenced declaration: all of it if short, else its header"""
+    if last - first + 1 <= MAX_DECLARATION_LINES:
+        return range(first, last + 1)
+    end = first
+    while end < last and '{' not in document.lines[end - 1]:
+        end += 1
+    return range(first, min(end, first + MAX_DECLARATION_LINES - 1) + 1)
+
+
+@dataclass
+class PromptSlice:
+    """Numbered excerpt of a file and its size compared with the whole file"""
+    text: str
+    lines: List[int]
+    full_tokens: int
+    sent_tokens: int
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'full_file_tokens': self.full_tokens,
+            'sent_tokens': self.sent_tokens,
+            'sent_lines': len(self.lines),
+        }
+
+
+def slice_document(
+    document: NumberedDocument,
+    violation_lines: Iterable[int],
+    radius: int = DEFAULT_CONTEXT_RADIUS,
+    exclude: Optional[Set[int]] = None
+) -> PromptSlice:
+    """
+    Build a numbered excerpt with the context the model needs for the violated lines:
+    the enclosing top-level scope of each line (or a +/- radius window when the scope
+    is longer than MAX_SCOPE_LINES), the radius window itself, #include lines and the
+    top-level declarations of names referenced from those lines.
+
+    Lines keep their original number prefixes, and skipped ranges are marked with a
+    comment, so fixed snippets use the same line keys as in full-file mode.
+    Lines in exclude (already sent to the chat) are left out.
+    """
+    line_count = len(document.lines)
+    region_index = document.region_index()
+    selected: Set[int] = set()
+
+    for line in violation_lines:
+        if not 1 <= line <= line_count:
+            continue
+        selected.update(range(max(1, line - radius), min(line_count, line + radius) + 1))
+        scope = region_index.enclosing(line)
+        if scope and scope[1] - scope[0] + 1 <= MAX_SCOPE_LINES:
+            selected.update(range(scope[0], scope[1] + 1))
+
+    if selected:
+        include_lines, declarations = _document_index(document)
+        selected.update(include_lines)
+
+        # Top-level declarations referenced by the selected code (one level deep)
+        referenced = set()
+        for line in selected:
+            referenced.update(_IDENTIFIER_RE.findall(document.lines[line - 1]))
+        regions = {region for name in referenced for region in declarations.get(name, ())}
+        for first, last in regions:
+            if first not in selected:
+                selected.update(_declaration_lines(document, first, last))
+
+    if exclude:
+        selected -= exclude
+
+    lines = sorted(selected)
+    parts = []
+    previous = 0
+    for line in lines:
+        if line > previous + 1:
+            parts.append(f"// ... lines {previous + 1}-{line - 1} omitted ...\n")
+        parts.append(f"{line}:{document.original_lines[str(line)]}\n")
+        previous = line
+    if lines and previous < line_count:
+        parts.append(f"// ... lines {previous + 1}-{line_count} omitted ...\n")
+
+    text = ''.join(parts)
+    return PromptSlice(
+        text=text,
+        lines=lines,
+        full_tokens=estimate_tokens(document.numbered_text()),
+        sent_tokens=estimate_tokens(text),
+    )
+
+
+def violation_lines(violations: List[dict]) -> List[int]:
+    """Line numbers of violations that have one"""
+    lines = []
+    for violation in violations:
+        try:
+            lines.append(int(violation.get('line')))
+        except (TypeError, ValueError):
+            continue
+    return lines
@@ -2,6 +2,102 @@
 import json
 import re
 
+# Numbered line format: "<number><optional letters>:<content>"
+NUMBERED_LINE_PATTERN = re.compile(r"^((\d+)([a-zA-Z]*)):(.*)$")
+_DIGITS = re.compile(r"\d+")
+
+
+def _parse_numbered_lines_with_keys(lines):
+    """
+    Parse numbered lines into an ordered {line_key: content} dictionary plus the
+    sort key of each entry. The sort keys are None if the keys are not strictly
+    increasing (e.g. duplicated or out of order), which disables the linear merge.
+    """
+    parsed = {}
+    sort_keys = []
+    previous = None
+    for line in lines:
+        match = NUMBERED_LINE_PATTERN.match(line.rstrip('\n'))
+
+        if match:
+            lineno = match.group(1)
+            sort_key = (int(match.group(2)), match.group(3))
+            if sort_keys is not None:
+                if lineno in parsed or (previous is not None and sort_key <= previous):
+                    sort_keys = None
+                else:
+                    sort_keys.append(sort_key)
+                    previous = sort_key
+            parsed[lineno] = match.group(4)
+        else:
+            print(f"⚠️ Skipped invalid line: {line.strip()}")
+    return parsed, sort_keys
+
+
+def line_sort_key(k):
+    """Sort key for line keys (numbers first, then a-z suffixes)"""
+    match = _DIGITS.match(k)
+    suffix = k[match.end():]
+    if suffix and not suffix.isalpha():
+        suffix = _DIGITS.sub("", suffix)
+    return (int(match.group()), suffix)
+
+
+def merge_fixed_snippets(original_lines: dict, fixes_dict: dict, original_sort_keys: list = None) -> list:
+    """
+    Replaces or inserts fixed lines into the parsed original lines.
+    Returns the merged (line_key, content) pairs in line order.
+
+    The original lines are walked once in order and the sorted fixes are spliced
+    in, so the cost is O(n + k log k) for n original lines and k fixes. Pass
+    original_sort_keys (the sort key of each original line, strictly increasing)
+    to skip recomputing them.
+    """
+    if original_sort_keys is None:
+        original_sort_keys = [line_sort_key(lineno) for lineno in original_lines]
+        if any(a >= b for a, b in zip(original_sort_keys, original_sort_keys[1:])):
+            original_sort_keys = None
+
+    if original_sort_keys is None:
+        # Original lines are not in order: merge everything and sort
+        merged_lines = original_lines.copy()
+        merged_lines.update(fixes_dict)
+        sorted_keys = sorted(merged_lines.keys(), key=line_sort_key)
+        return [(lineno, merged_lines[lineno]) for lineno in sorted_keys]
+
+    # Stable sort keeps insertion order among fixes with equal sort keys
+    fixes = sorted(((line_sort_key(lineno), lineno, code) for lineno, code in fixes_dict.items()),
+                   key=lambda item: item[0])
+    fix_count = len(fixes)
+    merged = []
+    append = merged.append
+    j = 0
+
+    for (lineno, content), sort_key in zip(original_lines.items(), original_sort_keys):
+        # Fixes that sort before this line (insertions)
+        while j < fix_count and fixes[j][0] < sort_key:
+            append((fixes[j][1], fixes[j][2]))
+            j += 1
+
+        if j < fix_count and fixes[j][0] == sort_key:
+            # The original line (or its replacement) comes before other keys with the same sort key
+            same = []
+            while j < fix_count and fixes[j][0] == sort_key:
+                same.append(fixes[j])
+                j += 1
+            replacement = content
+            for _, fix_lineno, code in same:
+                if fix_lineno == lineno:
+                    replacement = code
+            append((lineno, replacement))
+            merged.extend((fix_lineno, code) for _, fix_lineno, code in same if fix_lineno != lineno)
+        else:
+            append((lineno, content))
+
+    merged.extend((lineno, code) for _, lineno, code in fixes[j:])
+    return merged
+
+
 def merge_fixed_snippets_into_file(original_file: str, fixes_dict: dict, output_file: str):
     """
     Replaces or inserts fixed lines (with line numbers) into the original numbered file.
@@ -9,33 +105,12 @@ def merge_fixed_snippets_into_file(original_file: str, fixes_dict: dict, output_
     """
     # Load the original numbered C++ file into a dictionary
     with open(original_file, "r", encoding="utf-8") as f:
-        original_lines = {}
-        for line in f:
-            match = re.match(r"^(\d+[a-zA-Z]*):(.*)$", line.rstrip('\n'))
-
-            if match:
-                lineno = match.group(1).strip()
-                content = match.group(2)
-                original_lines[lineno] = content
-            else:
-                print(f"⚠️ Skipped invalid line: {line.strip()}")
-
-    # Merge fixed lines
-    merged_lines = original_lines.copy()
-    for lineno, fixed_code in fixes_dict.items():
-        merged_lines[lineno] = fixed_code
-
-    # Sort by line number (numbers first, then a-z suffixes)
-    def line_sort_key(k):
-        num_part = int(re.match(r"(\d+)", k).group(1))
-        suffix = re.sub(r"\d+", "", k)
-        return (num_part, suffix)
-
-    sorted_keys = sorted(merged_lines.keys(), key=line_sort_key)
+        original_lines, sort_keys = _parse_numbered_lines_with_keys(f)
+
+    merged = merge_fixed_snippets(original_lines, fixes_dict, sort_keys)
 
     # Write to output
     with open(output_file, "w", encoding="utf-8") as f:
-        for lineno in sorted_keys:
-            f.write(f"{lineno}:{merged_lines[lineno]}\n")
+        f.writelines(f"{lineno}:{content}\n" for lineno, content in merged)
 
-    print(f"✅ Merged output written to: {output_file}")
\ No newline at end of file
+    print(f"✅ Merged output written to: {output_file}")
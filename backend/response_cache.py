@@ -0,0 +1,199 @@
+# response_cache.py - Persistent cache of model fix responses keyed by file and violations
+
+import sqlite3
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Model settings that change the generated fixes
+MODEL_SETTINGS_KEYS = ('model_name', 'temperature', 'top_p', 'max_tokens', 'safety_settings')
+
+# Bump when what is cached under a key changes, so older entries are no longer hit
+CACHE_FORMAT_VERSION = 2
+
+
+def normalize_violations(violations: List[Dict[str, Any]]) -> List[List[str]]:
+    """Order- and type-insensitive form of a violation list"""
+    return sorted(
+        [str(v.get('file', '')), str(v.get('line', '')), str(v.get('misra', '')), str(v.get('warning', '')).strip()]
+        for v in violations
+    )
+
+
+def make_cache_key(
+    file_hash: str,
+    violations: List[Dict[str, Any]],
+    model_settings: Dict[str, Any],
+    options: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Cache key of a fix request: hash of the numbered file content, the normalized
+    violation set, the model settings and any request options that shape the prompt
+    (context mode, batching). The generation seed is fixed, so equal keys mean equal prompts.
+    """
+    payload = {
+        'format': CACHE_FORMAT_VERSION,
+        'file': file_hash,
+        'violations': normalize_violations(violations),
+        'model': {key: model_settings.get(key) for key in MODEL_SETTINGS_KEYS},
+        'options': options or {},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Persistent cache of fix responses in SQLite with LRU eviction.
+
+    Entries are evicted least recently used first once the cache holds more than
+    max_entries rows or max_bytes of stored responses. Hit/miss counters cover
+    the lifetime of this process.
+    """
+
+    def __init__(self, db_path: str = "response_cache.db", max_entries: int = 500, max_bytes: int = 64 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init_database(self):
+        """Create the responses table if it doesn't exist"""
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        # WAL lets readers proceed while another worker writes
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                cache_key TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hit_count INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+
+        conn.commit()
+        conn.close()
+
+    def get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Cached payload for a key, or None; a hit refreshes its LRU position"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+
+            cursor.execute("SELECT payload FROM responses WHERE cache_key = ?", (cache_key,))
+            row = cursor.fetchone()
+            if row:
+                cursor.execute(
+                    "UPDATE responses SET last_used = ?, hit_count = hit_count + 1 WHERE cache_key = ?",
+                    (time.time(), cache_key)
+                )
+                conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error reading response cache: {e}")
+            row = None
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return json.loads(row[0]) if row else None
+
+    def put(self, cache_key: str, payload: Dict[str, Any]):
+        """Store a payload and evict least recently used entries beyond the limits"""
+        data = json.dumps(payload)
+        now = time.time()
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+
+            cursor.execute(
+                "INSERT OR REPLACE INTO responses (cache_key, payload, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (cache_key, data, len(data), now, now)
+            )
+            evicted = self._evict(cursor)
+
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            print(f"Error writing response cache: {e}")
+            return
+
+        if evicted:
+            with self._lock:
+                self.evictions += evicted
+
+    def _evict(self, cursor) -> int:
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses")
+        count, total_size = cursor.fetchone()
+        if count <= self.max_entries and total_size <= self.max_bytes:
+            return 0
+
+        evicted = 0
+        cursor.execute("SELECT cache_key, size FROM responses ORDER BY last_used ASC")
+        for cache_key, size in cursor.fetchall():
+            if count <= self.max_entries and total_size <= self.max_bytes:
+                break
+            cursor.execute("DELETE FROM responses WHERE cache_key = ?", (cache_key,))
+            count -= 1
+            total_size -= size
+            evicted += 1
+        return evicted
+
+    def clear(self) -> int:
+        """Remove all entries; returns how many were removed"""
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM responses")
+        removed = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of this process and the current size of the cache"""
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses")
+            entries, total_size = cursor.fetchone()
+            conn.close()
+        except Exception as e:
+            print(f"Error reading response cache stats: {e}")
+            entries, total_size = None, None
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": entries,
+                "size_bytes": total_size,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Global response cache instance
+response_cache = ResponseCache(
+    db_path=os.environ.get('MISRA_RESPONSE_CACHE_DB', 'response_cache.db'),
+    max_entries=int(os.environ.get('MISRA_RESPONSE_CACHE_ENTRIES', 500)),
+    max_bytes=int(os.environ.get('MISRA_RESPONSE_CACHE_BYTES', 64 * 1024 * 1024)),
+)
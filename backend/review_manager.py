@@ -2,29 +2,235 @@
 
 import json
 import os
-from typing import Dict, List, Set, Any
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set, Any, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; writes are then only serialized within the process
+    fcntl = None
+
+
+def write_json_atomic(path: str, data: Dict[str, Any]):
+    """Write compact JSON through a temporary file, so a crash never leaves a partial file"""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except Exception:
+        os.unlink(temp_path)
+        raise
+
+
+@contextmanager
+def locked_file(path: str):
+    """Hold an exclusive lock on `path` across worker processes (a no-op without fcntl)"""
+    if fcntl is None:
+        yield
+        return
+    with open(path + '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def merge_review_changes(changes: Dict[str, Any], newer: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One change record with the effect of `changes` followed by `newer`. A record
+    has 'reset' (clear everything first), 'lines' ({line_key: 'accepted',
+    'rejected' or 'pending'}) and optionally 'current_review_index'.
+    """
+    if newer.get('reset'):
+        changes = {'reset': True}
+    merged = {'reset': changes.get('reset', False), 'lines': {**changes.get('lines', {}), **newer.get('lines', {})}}
+    for source in (changes, newer):
+        if 'current_review_index' in source:
+            merged['current_review_index'] = source['current_review_index']
+    return merged
+
+
+def apply_review_changes(data: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Review state file contents with a change record applied"""
+    if changes.get('reset'):
+        data = {}
+    accepted = set(data.get('accepted_lines', []))
+    rejected = set(data.get('rejected_lines', []))
+    for line_key, status in changes.get('lines', {}).items():
+        accepted.discard(line_key)
+        rejected.discard(line_key)
+        if status == 'accepted':
+            accepted.add(line_key)
+        elif status == 'rejected':
+            rejected.add(line_key)
+    return {
+        'accepted_lines': sorted(accepted),
+        'rejected_lines': sorted(rejected),
+        'current_review_index': changes.get('current_review_index', data.get('current_review_index', 0))
+    }
+
+
+def read_review_file(path: str) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple[int, int]]]:
+    """A review state file's contents and stamp; (None, None) if it doesn't exist"""
+    try:
+        with open(path, 'r') as f:
+            stamp = file_stamp(f.fileno())
+            return json.load(f), stamp
+    except FileNotFoundError:
+        return None, None
+
+
+def file_stamp(file) -> Tuple[int, int, int]:
+    """Changes whenever a file is replaced or rewritten (files are replaced atomically)"""
+    stat = os.stat(file)
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class ReviewStateWriter:
+    """
+    Write-behind persistence of review state files.
+
+    schedule() records the changes made to a file (per line, not whole-state
+    snapshots); a background thread merges them into the file's current
+    contents once it has been quiet for `delay` seconds (or after `max_delay`
+    under continuous changes), so a burst of review clicks costs one write and
+    changes made by other workers in between are kept. flush() writes
+    everything pending and is called on shutdown.
+    """
+    
+    def __init__(self, delay: float = 0.5, max_delay: float = 5.0):
+        self.delay = delay
+        self.max_delay = max_delay
+        # path -> (changes, first scheduled, last scheduled)
+        self._pending: Dict[str, tuple] = {}
+        self._condition = threading.Condition()
+        # Held from taking a file's changes until they are written, so loads never miss them
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.scheduled = 0
+        self.writes = 0
+        self.errors = 0
+    
+    def schedule(self, path: str, changes: Dict[str, Any]):
+        now = time.monotonic()
+        with self._condition:
+            if path in self._pending:
+                pending, first, _ = self._pending[path]
+                changes = merge_review_changes(pending, changes)
+            else:
+                first = now
+            self._pending[path] = (changes, first, now)
+            self.scheduled += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify()
+    
+    def pending(self, path: str) -> Optional[Dict[str, Any]]:
+        """Changes scheduled for a file but not written yet"""
+        with self._condition:
+            entry = self._pending.get(path)
+            return entry[0] if entry else None
+    
+    def load(self, path: str) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple[int, int]]]:
+        """A file's review state with the changes still pending for it, and the file's stamp"""
+        with self._write_lock:
+            data, stamp = read_review_file(path)
+            changes = self.pending(path)
+        if changes is not None:
+            data = apply_review_changes(data or {}, changes)
+        return data, stamp
+    
+    def write(self, path: str, changes: Dict[str, Any]):
+        """Merge changes into a file now"""
+        with locked_file(path):
+            data, _ = read_review_file(path)
+            write_json_atomic(path, apply_review_changes(data or {}, changes))
+    
+    def _due(self, now: float) -> List[str]:
+        return [path for path, (_, first, last) in self._pending.items()
+                if now - last >= self.delay or now - first >= self.max_delay]
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    now = time.monotonic()
+                    due = self._due(now)
+                    if due:
+                        break
+                    timeout = None
+                    if self._pending:
+                        timeout = min(min(last + self.delay, first + self.max_delay)
+                                      for _, first, last in self._pending.values()) - now
+                    self._condition.wait(timeout)
+            self._write(due)
+    
+    def _write(self, paths: List[str]):
+        for path in paths:
+            with self._write_lock:
+                with self._condition:
+                    entry = self._pending.pop(path, None)
+                if entry is None:
+                    continue
+                try:
+                    self.write(path, entry[0])
+                    self.writes += 1
+                except Exception as e:
+                    self.errors += 1
+                    print(f"Error saving review state: {str(e)}")
+    
+    def flush(self):
+        """Write all pending review state now"""
+        with self._condition:
+            paths = list(self._pending)
+        self._write(paths)
+    
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            pending = len(self._pending)
+        with self._write_lock:
+            return {'scheduled': self.scheduled, 'writes': self.writes, 'errors': self.errors, 'pending': pending}
+
 
 class ReviewManager:
-    """Manages the state of accepted/rejected fixes for a project"""
+    """
+    Manages the state of accepted/rejected fixes for a project.
+    
+    Each change is saved as a per-line change merged into the file's current
+    contents, so managers of the same project in several workers don't
+    overwrite each other; refresh() picks up changes made elsewhere. With
+    write_behind, saves go through the global review_writer instead of
+    rewriting the file on every change; the manager is meant to be kept in the
+    project session rather than re-created (and the file re-read) per request.
+    """
     
-    def __init__(self, project_id: str, upload_folder: str = "uploads"):
+    def __init__(self, project_id: str, upload_folder: str = "uploads", write_behind: bool = False):
         self.project_id = project_id
         self.upload_folder = upload_folder
         self.review_file = os.path.join(upload_folder, f"{project_id}_review_state.json")
+        self.write_behind = write_behind
         self._load_review_state()
     
     def _load_review_state(self):
-        """Load existing review state from file"""
-        if os.path.exists(self.review_file):
-            try:
-                with open(self.review_file, 'r') as f:
-                    data = json.load(f)
-                    self.accepted_lines = set(data.get('accepted_lines', []))
-                    self.rejected_lines = set(data.get('rejected_lines', []))
-                    self.current_review_index = data.get('current_review_index', 0)
-            except Exception as e:
-                print(f"Error loading review state: {str(e)}")
-                self._reset_review_state()
+        """Load existing review state from file (with the changes still pending for it)"""
+        data, self._stamp = None, None
+        try:
+            data, self._stamp = review_writer.load(self.review_file)
+        except Exception as e:
+            print(f"Error loading review state: {str(e)}")
+        if data is not None:
+            self.accepted_lines = set(data.get('accepted_lines', []))
+            self.rejected_lines = set(data.get('rejected_lines', []))
+            self.current_review_index = data.get('current_review_index', 0)
         else:
             self._reset_review_state()
     
@@ -34,36 +240,51 @@ class ReviewManager:
         self.rejected_lines = set()
         self.current_review_index = 0
     
-    def _save_review_state(self):
-        """Save current review state to file"""
+    def refresh(self) -> bool:
+        """Reload the state if the file changed since it was read; returns whether any line's status changed"""
         try:
-            data = {
-                'accepted_lines': list(self.accepted_lines),
-                'rejected_lines': list(self.rejected_lines),
-                'current_review_index': self.current_review_index
-            }
-            with open(self.review_file, 'w') as f:
-                json.dump(data, f, indent=2)
+            stamp = file_stamp(self.review_file)
+        except FileNotFoundError:
+            stamp = None
+        if stamp == self._stamp:
+            return False
+        previous = (self.accepted_lines, self.rejected_lines)
+        self._load_review_state()
+        return (self.accepted_lines, self.rejected_lines) != previous
+    
+    def _save_review_state(self, changes: Dict[str, Any]):
+        """Save a change record to the file"""
+        if self.write_behind:
+            review_writer.schedule(self.review_file, changes)
+            return
+        try:
+            review_writer.write(self.review_file, changes)
         except Exception as e:
             print(f"Error saving review state: {str(e)}")
     
+    def memory_size(self) -> int:
+        """Approximate bytes held, for session size accounting"""
+        lines = self.accepted_lines | self.rejected_lines
+        return (sys.getsizeof(self.accepted_lines) + sys.getsizeof(self.rejected_lines)
+                + sum(sys.getsizeof(line_key) for line_key in lines))
+    
     def accept_line(self, line_key: str):
         """Accept a specific line fix"""
         self.accepted_lines.add(line_key)
         self.rejected_lines.discard(line_key)  # Remove from rejected if it was there
-        self._save_review_state()
+        self._save_review_state({'lines': {line_key: 'accepted'}})
     
     def reject_line(self, line_key: str):
         """Reject a specific line fix"""
         self.rejected_lines.add(line_key)
         self.accepted_lines.discard(line_key)  # Remove from accepted if it was there
-        self._save_review_state()
+        self._save_review_state({'lines': {line_key: 'rejected'}})
     
     def reset_line(self, line_key: str):
         """Reset a specific line fix to pending state by removing it from both sets"""
         self.accepted_lines.discard(line_key)
         self.rejected_lines.discard(line_key)
-        self._save_review_state()
+        self._save_review_state({'lines': {line_key: 'pending'}})
     
     def get_line_status(self, line_key: str) -> str:
         """Get the review status of a line: 'accepted', 'rejected', or 'pending'"""
@@ -100,7 +321,7 @@ class ReviewManager:
     def set_current_review_index(self, index: int):
         """Set the current review index for navigation"""
         self.current_review_index = index
-        self._save_review_state()
+        self._save_review_state({'current_review_index': index})
     
     def get_fix_list(self, all_snippets: Dict[str, str]) -> List[Dict[str, Any]]:
         """Get a list of all fixes with their review status"""
@@ -125,4 +346,10 @@ class ReviewManager:
     def reset_review(self):
         """Reset all review state"""
         self._reset_review_state()
-        self._save_review_state()
+        self._save_review_state({'reset': True})
+
+# Global write-behind writer instance
+review_writer = ReviewStateWriter(
+    delay=float(os.environ.get('MISRA_REVIEW_FLUSH_DELAY', 0.5)),
+    max_delay=float(os.environ.get('MISRA_REVIEW_FLUSH_MAX_DELAY', 5.0))
+)
@@ -1,4 +1,5 @@
-from misra_chat_client import init_vertex_ai, load_cpp_file, start_chat, send_file_intro, send_misra_violations
+import asyncio
+from misra_chat_client import init_vertex_ai, load_cpp_file, start_chat, send_file_intro, send_misra_violations_async
 from excel_utils import extract_violations_for_file
 
 
@@ -27,7 +28,7 @@ if __name__ == "__main__":
 
 
     if violation_block:
-        send_misra_violations(chat, violation_block)
+        asyncio.run(send_misra_violations_async(chat, violation_block))
     else:
         print(f"No violations found for {target_file}.")
 
@@ -1,11 +1,75 @@
 
 import threading
 import asyncio
-from typing import Dict, Any, Optional
+import heapq
+import itertools
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 import uuid
 
+from session_store import SessionStore, SQLiteSessionStore, create_session_store, dump_value, load_value
+
+# Per-process caches and markers that each worker rebuilds from the persisted data
+LOCAL_KEYS = {'numbered_document', 'diff_cache', 'review_manager', 'accepted_view_synced'}
+
+# Last-access times are persisted at most this often (seconds)
+TOUCH_INTERVAL = 60
+
+# Containers with more items than this are sized from a sample of them
+SIZE_SAMPLE = 32
+
+def approximate_size(value: Any) -> int:
+    """
+    Rough memory footprint of a session value in bytes. Objects that know their
+    size expose memory_size(); containers are sized from (a sample of) their
+    items, everything else counts as its shallow size.
+    """
+    if hasattr(value, 'memory_size'):
+        return value.memory_size()
+    size = sys.getsizeof(value)
+    count = len(value) if isinstance(value, (dict, list, tuple, set, frozenset)) else 0
+    if not count:
+        return size
+    if isinstance(value, dict):
+        items = list(itertools.islice(value.items(), SIZE_SAMPLE))
+        sampled = sum(approximate_size(k) + approximate_size(v) for k, v in items)
+    else:
+        if isinstance(value, (list, tuple)):
+            # Evenly spaced items, so lists that grow by appending are sampled throughout
+            items = value[::max(1, count // SIZE_SAMPLE)]
+        else:
+            items = list(itertools.islice(value, SIZE_SAMPLE))
+        sampled = sum(approximate_size(item) for item in items)
+    return size + sampled * count // len(items)
+
+def _extended_size(previous: Any, previous_size: int, value: Any) -> Optional[int]:
+    """
+    Size of a list that extends the previous value of its key (e.g. a growing
+    history), from the previous size plus its new items; None for anything else
+    """
+    if not (isinstance(value, list) and isinstance(previous, list) and previous):
+        return None
+    if len(value) < len(previous) or value[0] is not previous[0] or value[len(previous) - 1] is not previous[-1]:
+        return None
+    tail = value[len(previous):]
+    return (previous_size + sys.getsizeof(value) - sys.getsizeof(previous)
+            + approximate_size(tail) - sys.getsizeof(tail))
+
+def load_values(project_id: str, values: Dict[str, bytes]) -> Dict[str, Any]:
+    """Decode stored values, skipping any this version can't read (e.g. old pickles)"""
+    data = {}
+    for key, value in values.items():
+        try:
+            data[key] = load_value(value)
+        except ValueError as e:
+            print(f"Ignoring stored session value '{key}' of project {project_id}: {e}")
+    return data
+
 @dataclass
 class ProjectSession:
     """Thread-safe project session with its own lock"""
@@ -15,11 +79,67 @@ class ProjectSession:
     data: Dict[str, Any] = field(default_factory=dict)
     chat_session: Any = None
     _lock: threading.RLock = field(default_factory=threading.RLock)
+    # Shared store the data is written through to, and the store version this copy reflects
+    _store: SessionStore = field(default_factory=SessionStore, repr=False)
+    _version: int = 0
+    _touched_at: float = 0.0
+    # Approximate bytes held per data key and by the chat; the manager is told of changes
+    _sizes: Dict[str, int] = field(default_factory=dict, repr=False)
+    _chat_size: int = 0
+    _expiry_token: int = 0
+    _on_resize: Optional[Callable[["ProjectSession", int], None]] = field(default=None, repr=False)
+    
+    def size_bytes(self) -> int:
+        """Approximate memory held by this session"""
+        with self._lock:
+            return sum(self._sizes.values()) + self._chat_size
+    
+    def _resize(self, key: str, size: int) -> int:
+        """Record a key's new size and return the change (call with the lock held)"""
+        delta = size - self._sizes.get(key, 0)
+        if size:
+            self._sizes[key] = size
+        else:
+            self._sizes.pop(key, None)
+        return delta
+    
+    def _notify_resize(self, delta: int):
+        # Called without the session lock, since the manager may evict other sessions
+        if delta and self._on_resize is not None:
+            self._on_resize(self, delta)
     
     def update_access_time(self):
         """Update last accessed timestamp"""
         with self._lock:
             self.last_accessed = datetime.now()
+            now = time.time()
+            if self._store.shared and now - self._touched_at > TOUCH_INTERVAL:
+                self._touched_at = now
+                self._store.touch(self.project_id, now)
+    
+    def refresh(self):
+        """Pull values other workers wrote since this copy was last synced"""
+        if not self._store.shared:
+            return
+        delta = 0
+        with self._lock:
+            version = self._store.version(self.project_id)
+            if version is None or version <= self._version:
+                return
+            loaded = self._store.load(self.project_id, self._version)
+            if loaded:
+                self._version, _, values = loaded
+                for key, value in load_values(self.project_id, values).items():
+                    self.data[key] = value
+                    delta += self._resize(key, approximate_size(value))
+                # Another worker uploaded or numbered a file: rebuild the document from it
+                if 'cpp_file' in values or 'numbered_file' in values:
+                    self.data.pop('numbered_document', None)
+                    delta += self._resize('numbered_document', 0)
+                # Another worker stored fixes: the accepted view here is out of date
+                if 'fixed_snippets' in values:
+                    self.data['accepted_view_synced'] = False
+        self._notify_resize(delta)
     
     def get_data(self, key: str, default=None):
         """Thread-safe data retrieval"""
@@ -31,7 +151,23 @@ class ProjectSession:
         """Thread-safe data storage"""
         with self._lock:
             self.update_access_time()
+            size = None
+            if key in self._sizes:
+                size = _extended_size(self.data.get(key), self._sizes[key], value)
             self.data[key] = value
+            delta = self._resize(key, approximate_size(value) if size is None else size)
+            if self._store.shared and key not in LOCAL_KEYS:
+                try:
+                    value_data = dump_value(value)
+                except Exception as e:
+                    print(f"Session value '{key}' of project {self.project_id} is kept in this worker only: {e}")
+                    value_data = None
+                if value_data is not None:
+                    version = self._store.save(self.project_id, key, value_data)
+                    # Skipped versions were written by other workers; leave them for refresh()
+                    if version == self._version + 1:
+                        self._version = version
+        self._notify_resize(delta)
     
     def get_chat_session(self):
         """Thread-safe chat session retrieval"""
@@ -44,57 +180,311 @@ class ProjectSession:
         with self._lock:
             self.update_access_time()
             self.chat_session = chat_session
+            delta = 0 if chat_session is not None else -self._chat_size
+            if chat_session is None:
+                self._chat_size = 0
+        self._notify_resize(delta)
+    
+    def set_chat_size(self, size: int):
+        """Record the approximate size of the chat's history (the chat object itself is opaque)"""
+        with self._lock:
+            delta = size - self._chat_size
+            self._chat_size = size
+        self._notify_resize(delta)
+    
+    def spill(self, store: SessionStore):
+        """
+        Write the session's data to a persistent store and back this copy with it, so
+        requests still holding the session keep writing where it will be reloaded from.
+        A session reloaded from the spill store goes back to the in-memory store.
+        """
+        with self._lock:
+            if not self._store.shared:
+                values = {}
+                for key, value in self.data.items():
+                    if key in LOCAL_KEYS:
+                        continue
+                    try:
+                        values[key] = dump_value(value)
+                    except Exception as e:
+                        print(f"Session value '{key}' of project {self.project_id} is dropped on eviction: {e}")
+                store.create(self.project_id, self.created_at.timestamp())
+                self._version = store.save_many(self.project_id, values)
+                self._store = store
 
-class ConcurrentSessionManager:
-    """Thread-safe session manager for handling multiple concurrent requests"""
+class _SessionShard:
+    """One stripe of the session map, guarded by its own lock"""
     
     def __init__(self):
-        self._sessions: Dict[str, ProjectSession] = {}
-        self._global_lock = threading.RLock()
+        self.lock = threading.Lock()
+        # Least recently used first
+        self.sessions: "OrderedDict[str, ProjectSession]" = OrderedDict()
+        # Evicted sessions still being written to the spill store
+        self.spilling: Dict[str, ProjectSession] = {}
+
+class ConcurrentSessionManager:
+    """
+    Thread-safe session manager for handling multiple concurrent requests.
+    
+    Sessions are spread over lock-striped shards by project id, so requests for
+    different projects rarely wait on each other; no lock is held across shards.
+    Idle expiry uses a heap of deadlines, so cleanup only visits sessions whose
+    deadline has passed.
+    """
+    
+    def __init__(self, store: Optional[SessionStore] = None, memory_budget: Optional[int] = None,
+                 spill_db: str = "session_spill.db", shards: int = 64):
+        self._shards = [_SessionShard() for _ in range(max(shards, 1))]
+        self._store = store or SessionStore()
         self._cleanup_interval = 3600  # 1 hour
         self._session_timeout = 7200   # 2 hours
         
+        # (idle deadline, token, project id); entries whose token no longer matches
+        # the session's are stale and skipped. Deadlines of accessed sessions are
+        # pushed back lazily when their entry comes up.
+        self._expiry: List[tuple] = []
+        self._expiry_lock = threading.Lock()
+        self._expiry_tokens = itertools.count(1)
+        
+        # Sessions beyond the memory budget are evicted least recently used first. With
+        # a shared store they are already persisted; otherwise they spill to SQLite.
+        self._memory_budget = memory_budget
+        self._spill_db = spill_db
+        self._spill_store: Optional[SessionStore] = None
+        self._stats_lock = threading.Lock()
+        self._total_size = 0
+        self._evictions = 0
+        self._spills = 0
+        self._reloads = 0
+        
         # Start cleanup task
         self._start_cleanup_task()
     
+    def _shard(self, project_id: str) -> _SessionShard:
+        return self._shards[hash(project_id) % len(self._shards)]
+    
     def get_or_create_session(self, project_id: str) -> ProjectSession:
         """Get existing session or create new one"""
         if not project_id:
             project_id = str(uuid.uuid4())
-            
-        with self._global_lock:
-            if project_id not in self._sessions:
-                self._sessions[project_id] = ProjectSession(project_id=project_id)
-            
-            session = self._sessions[project_id]
-            session.update_access_time()
-            return session
+        return self._get(project_id, create=True)
     
     def get_session(self, project_id: str) -> Optional[ProjectSession]:
         """Get existing session without creating"""
-        with self._global_lock:
-            session = self._sessions.get(project_id)
-            if session:
-                session.update_access_time()
-            return session
+        return self._get(project_id, create=False)
+    
+    def _get(self, project_id: str, create: bool) -> Optional[ProjectSession]:
+        shard = self._shard(project_id)
+        with shard.lock:
+            session, added = self._load_session(shard, project_id)
+            if session is None and create:
+                session = ProjectSession(project_id=project_id, _store=self._store, _on_resize=self._account)
+                self._store.create(project_id, session.created_at.timestamp())
+                self._add(shard, session)
+                added = True
+        if session is None:
+            return None
+        
+        # Store reads and evictions happen outside the shard lock
+        if added:
+            self._evict(keep=session)
+        else:
+            session.refresh()
+        session.update_access_time()
+        return session
+    
+    def _load_session(self, shard: _SessionShard, project_id: str):
+        """
+        Local copy of a session (or one loaded from the shared or spill store) and
+        whether it was just added to the shard; call with the shard lock held
+        """
+        session = shard.sessions.get(project_id)
+        if session is not None:
+            shard.sessions.move_to_end(project_id)
+            return session, False
+        
+        # Evicted but not written out yet: take the copy back
+        session = shard.spilling.get(project_id)
+        if session is None:
+            # Created by another worker (or before a restart), or evicted earlier
+            store = self._store if self._store.shared else self._spill_store
+            loaded = store.load(project_id) if store is not None else None
+            if loaded is None:
+                return None, False
+            version, created_at, values = loaded
+            session = ProjectSession(
+                project_id=project_id,
+                created_at=datetime.fromtimestamp(created_at),
+                data=load_values(project_id, values),
+                _store=self._store,
+                _version=version if store is self._store else 0,
+                _on_resize=self._account
+            )
+            session._sizes = {key: approximate_size(value) for key, value in session.data.items()}
+            if store is not self._store:
+                # Back in memory: writes stay local again until the next eviction
+                store.remove(project_id)
+        
+        self._add(shard, session)
+        with self._stats_lock:
+            self._reloads += 1
+        return session, True
+    
+    def _add(self, shard: _SessionShard, session: ProjectSession):
+        """Put a session in its shard and schedule its expiry; call with the shard lock held"""
+        shard.sessions[session.project_id] = session
+        size = session.size_bytes()
+        with self._stats_lock:
+            self._total_size += size
+        with self._expiry_lock:
+            session._expiry_token = next(self._expiry_tokens)
+            deadline = session.last_accessed.timestamp() + self._session_timeout
+            heapq.heappush(self._expiry, (deadline, session._expiry_token, session.project_id))
+    
+    def _account(self, session: ProjectSession, delta: int):
+        """Track a session's size change and evict others if over the memory budget"""
+        # An evicted copy still held by a request no longer counts
+        if self._shard(session.project_id).sessions.get(session.project_id) is not session:
+            return
+        with self._stats_lock:
+            self._total_size += delta
+        self._evict(keep=session)
+    
+    def _evict(self, keep: ProjectSession):
+        """Evict least recently used sessions until the total fits the budget; call without shard locks"""
+        if self._memory_budget is None:
+            return
+        while True:
+            with self._stats_lock:
+                if self._total_size <= self._memory_budget:
+                    return
+            session = self._pop_least_recent(keep)
+            if session is None:
+                return
+            
+            # Written out without the shard lock; requests for the session meanwhile get it back
+            if not session._store.shared:
+                if self._spill_store is None:
+                    with self._stats_lock:
+                        if self._spill_store is None:
+                            self._spill_store = SQLiteSessionStore(self._spill_db)
+                session.spill(self._spill_store)
+                with self._stats_lock:
+                    self._spills += 1
+            shard = self._shard(session.project_id)
+            with shard.lock:
+                if shard.spilling.get(session.project_id) is session:
+                    del shard.spilling[session.project_id]
+            print(f"Evicted session {session.project_id} from memory")
+    
+    def _pop_least_recent(self, keep: ProjectSession) -> Optional[ProjectSession]:
+        """Remove the least recently used session other than keep, comparing each shard's oldest"""
+        while True:
+            oldest: Optional[ProjectSession] = None
+            for shard in self._shards:
+                with shard.lock:
+                    for session in shard.sessions.values():
+                        if session is not keep:
+                            if oldest is None or session.last_accessed < oldest.last_accessed:
+                                oldest = session
+                            break
+            if oldest is None:
+                return None
+            
+            shard = self._shard(oldest.project_id)
+            with shard.lock:
+                # Accessed or removed since it was picked: pick again
+                if shard.sessions.get(oldest.project_id) is not oldest:
+                    continue
+                del shard.sessions[oldest.project_id]
+                shard.spilling[oldest.project_id] = oldest
+            with self._stats_lock:
+                self._total_size -= oldest.size_bytes()
+                self._evictions += 1
+            return oldest
     
     def remove_session(self, project_id: str) -> bool:
         """Remove session"""
-        with self._global_lock:
-            return self._sessions.pop(project_id, None) is not None
+        shard = self._shard(project_id)
+        with shard.lock:
+            session = shard.sessions.pop(project_id, None)
+            shard.spilling.pop(project_id, None)
+        if session is not None:
+            with self._stats_lock:
+                self._total_size -= session.size_bytes()
+        spilled = self._spill_store.remove(project_id) if self._spill_store is not None else False
+        return self._store.remove(project_id) or spilled or session is not None
+    
+    @property
+    def store(self) -> SessionStore:
+        """Store the sessions are shared through (the in-memory default shares nothing)"""
+        return self._store
+    
+    def store_stats(self) -> Dict[str, Any]:
+        """Backend of the session store and the sessions held by this process"""
+        sessions: List[ProjectSession] = []
+        for shard in self._shards:
+            with shard.lock:
+                sessions.extend(shard.sessions.values())
+        with self._stats_lock:
+            stats = {
+                "local_sessions": len(sessions),
+                "shards": len(self._shards),
+                "memory_bytes": self._total_size,
+                "memory_budget": self._memory_budget,
+                "evictions": self._evictions,
+                "spills": self._spills,
+                "reloads": self._reloads,
+            }
+        with self._expiry_lock:
+            stats["expiry_queue"] = len(self._expiry)
+        largest = sorted(((session.size_bytes(), session.project_id) for session in sessions), reverse=True)[:5]
+        stats["largest_sessions"] = [{"projectId": project_id, "bytes": size} for size, project_id in largest]
+        if self._spill_store is not None:
+            stats["spill"] = self._spill_store.stats()
+        return {**self._store.stats(), **stats}
     
     def cleanup_expired_sessions(self):
         """Remove expired sessions"""
-        current_time = datetime.now()
+        now = time.time()
         expired_sessions = []
         
-        with self._global_lock:
-            for project_id, session in self._sessions.items():
-                if (current_time - session.last_accessed).total_seconds() > self._session_timeout:
-                    expired_sessions.append(project_id)
+        while True:
+            with self._expiry_lock:
+                if not self._expiry or self._expiry[0][0] > now:
+                    break
+                _, token, project_id = heapq.heappop(self._expiry)
             
-            for project_id in expired_sessions:
-                self._sessions.pop(project_id, None)
+            shard = self._shard(project_id)
+            with shard.lock:
+                session = shard.sessions.get(project_id)
+                if session is None or session._expiry_token != token:
+                    continue
+                deadline = session.last_accessed.timestamp() + self._session_timeout
+                if deadline > now:
+                    # Accessed since the entry was pushed
+                    with self._expiry_lock:
+                        heapq.heappush(self._expiry, (deadline, token, project_id))
+                    continue
+                del shard.sessions[project_id]
+            with self._stats_lock:
+                self._total_size -= session.size_bytes()
+            expired_sessions.append(project_id)
+        
+        # Evicted sessions nobody came back for
+        if self._spill_store is not None:
+            for project_id in self._spill_store.expired(now - self._session_timeout):
+                if project_id not in self._shard(project_id).sessions:
+                    self._spill_store.remove(project_id)
+                    expired_sessions.append(project_id)
+        
+        # Sessions idle in every worker; the touch interval is slack for other workers' accesses
+        if self._store.shared:
+            cutoff = now - self._session_timeout - TOUCH_INTERVAL
+            for project_id in self._store.expired(cutoff):
+                if project_id not in self._shard(project_id).sessions:
+                    self._store.remove(project_id)
+                    expired_sessions.append(project_id)
         
         print(f"Cleaned up {len(expired_sessions)} expired sessions")
     
@@ -112,4 +502,11 @@ class ConcurrentSessionManager:
         cleanup_thread.start()
 
 # Global session manager instance
-session_manager = ConcurrentSessionManager()
+# MISRA_SESSION_MEMORY_BYTES=0 disables eviction
+_memory_budget = int(os.environ.get('MISRA_SESSION_MEMORY_BYTES', 1024 ** 3))
+session_manager = ConcurrentSessionManager(
+    create_session_store(),
+    memory_budget=_memory_budget or None,
+    spill_db=os.environ.get('MISRA_SESSION_SPILL_DB', 'session_spill.db'),
+    shards=int(os.environ.get('MISRA_SESSION_SHARDS', 64))
+)
@@ -0,0 +1,605 @@
+# session_store.py - Shared storage of project session data for multi-worker deployments
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import redis
+except ImportError:  # Only needed for MISRA_SESSION_STORE=redis with a redis:// URL
+    redis = None
+
+# Events kept per project for other workers to relay
+EVENT_BACKLOG = 1000
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, (set, frozenset)):
+        return {'__set__': list(value)}
+    raise TypeError(f"{type(value).__name__} values are not stored in the session store")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and '__set__' in obj:
+        return set(obj['__set__'])
+    return obj
+
+
+def dump_value(value: Any) -> bytes:
+    """
+    JSON form of a session value. Sets round-trip, tuples come back as lists and
+    anything else that isn't plain data raises TypeError. Unlike pickle, loading
+    a payload never runs code, whoever could write to the store.
+    """
+    return json.dumps(value, default=_encode, separators=(',', ':')).encode('utf-8')
+
+
+def load_value(data: bytes) -> Any:
+    """Value of a dump_value payload; raises ValueError for anything else"""
+    return json.loads(data, object_hook=_decode)
+
+
+class SessionStore:
+    """
+    Interface of a session data backend.
+
+    Every write bumps the session's version and tags the written key with it, so
+    a worker holding version N can fetch just the keys written after N. Values
+    are stored as dump_value payloads (JSON). Shared stores also hold background
+    job snapshots and a short log of each project's events, so any worker can
+    answer for a job or relay an event. The in-memory default stores nothing and
+    keeps the original single-process behaviour.
+    """
+    name = "memory"
+    shared = False
+
+    def create(self, project_id: str, created_at: float):
+        """Register a new, empty session"""
+
+    def exists(self, project_id: str) -> bool:
+        return False
+
+    def version(self, project_id: str) -> Optional[int]:
+        """Current version of a session, or None if the store doesn't have it"""
+        return None
+
+    def save(self, project_id: str, key: str, value: bytes) -> int:
+        """Store one dump_value payload and return the session's new version"""
+        return 0
+
+    def save_many(self, project_id: str, values: Dict[str, bytes]) -> int:
+        """Store several dump_value payloads under one new version and return it"""
+        return 0
+
+    def load(self, project_id: str, since_version: int = 0) -> Optional[Tuple[int, float, Dict[str, bytes]]]:
+        """(version, created_at, {key: payload written after since_version}) or None"""
+        return None
+
+    def touch(self, project_id: str, last_accessed: float):
+        """Record the last access time used for expiry"""
+
+    def remove(self, project_id: str) -> bool:
+        return False
+
+    def expired(self, before: float) -> List[str]:
+        """Sessions last accessed before the given time"""
+        return []
+
+    def save_job(self, job_id: str, project_id: str, value: bytes):
+        """Store the latest snapshot of a background job"""
+
+    def load_job(self, job_id: str) -> Optional[bytes]:
+        return None
+
+    def list_jobs(self, project_id: Optional[str] = None) -> List[bytes]:
+        """Snapshots of the stored jobs (of one project)"""
+        return []
+
+    def remove_job(self, job_id: str, project_id: str):
+        """Forget a job once its worker no longer retains it"""
+
+    def request_cancel(self, job_id: str):
+        """Ask the worker running a job to cancel it"""
+
+    def cancel_requested(self, job_ids: List[str]) -> List[str]:
+        """Those of the given jobs that another worker asked to cancel"""
+        return []
+
+    def append_event(self, project_id: str, value: bytes) -> int:
+        """Add an event to the project's log and return its id"""
+        return 0
+
+    def events_after(self, project_id: str, after: int) -> List[Tuple[int, bytes]]:
+        """(id, event) of the project's logged events after the given id, oldest first"""
+        return []
+
+    def last_event_id(self, project_id: str) -> int:
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class SQLiteSessionStore(SessionStore):
+    """Session data in a SQLite database in WAL mode, shared by workers on one host"""
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, db_path: str = "sessions.db"):
+        self.db_path = db_path
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def init_database(self):
+        """Create the session tables if they don't exist"""
+        conn = self._connect()
+        cursor = conn.cursor()
+
+        # WAL lets every worker read while one of them writes
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                project_id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS session_data (
+                project_id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                version INTEGER NOT NULL,
+                PRIMARY KEY (project_id, key)
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_accessed ON sessions (last_accessed)")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                project_id TEXT NOT NULL,
+                value BLOB NOT NULL,
+                cancel_requested INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_jobs_project ON jobs (project_id)")
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS session_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                project_id TEXT NOT NULL,
+                value BLOB NOT NULL
+            )
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_session_events_project ON session_events (project_id, id)")
+
+        conn.commit()
+        conn.close()
+
+    def create(self, project_id: str, created_at: float):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR IGNORE INTO sessions (project_id, created_at, last_accessed) VALUES (?, ?, ?)",
+            (project_id, created_at, created_at)
+        )
+        conn.commit()
+        conn.close()
+
+    def exists(self, project_id: str) -> bool:
+        return self.version(project_id) is not None
+
+    def version(self, project_id: str) -> Optional[int]:
+        conn = self._connect()
+        row = conn.execute("SELECT version FROM sessions WHERE project_id = ?", (project_id,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def save(self, project_id: str, key: str, value: bytes) -> int:
+        return self.save_many(project_id, {key: value})
+
+    def save_many(self, project_id: str, values: Dict[str, bytes]) -> int:
+        now = time.time()
+        conn = self._connect()
+        try:
+            # One write transaction, so concurrent writers get distinct versions
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR IGNORE INTO sessions (project_id, created_at, last_accessed) VALUES (?, ?, ?)",
+                (project_id, now, now)
+            )
+            conn.execute(
+                "UPDATE sessions SET version = version + 1, last_accessed = ? WHERE project_id = ?",
+                (now, project_id)
+            )
+            version = conn.execute("SELECT version FROM sessions WHERE project_id = ?", (project_id,)).fetchone()[0]
+            conn.executemany(
+                "INSERT OR REPLACE INTO session_data (project_id, key, value, version) VALUES (?, ?, ?, ?)",
+                [(project_id, key, value, version) for key, value in values.items()]
+            )
+            conn.commit()
+            return version
+        finally:
+            conn.close()
+
+    def load(self, project_id: str, since_version: int = 0) -> Optional[Tuple[int, float, Dict[str, bytes]]]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT version, created_at FROM sessions WHERE project_id = ?", (project_id,)).fetchone()
+            if not row:
+                return None
+            values = conn.execute(
+                "SELECT key, value FROM session_data WHERE project_id = ? AND version > ?",
+                (project_id, since_version)
+            ).fetchall()
+            return row[0], row[1], {key: value for key, value in values}
+        finally:
+            conn.close()
+
+    def touch(self, project_id: str, last_accessed: float):
+        conn = self._connect()
+        conn.execute("UPDATE sessions SET last_accessed = ? WHERE project_id = ?", (last_accessed, project_id))
+        conn.commit()
+        conn.close()
+
+    def remove(self, project_id: str) -> bool:
+        conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM session_data WHERE project_id = ?", (project_id,))
+        cursor.execute("DELETE FROM jobs WHERE project_id = ?", (project_id,))
+        cursor.execute("DELETE FROM session_events WHERE project_id = ?", (project_id,))
+        cursor.execute("DELETE FROM sessions WHERE project_id = ?", (project_id,))
+        removed = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        return removed
+
+    def expired(self, before: float) -> List[str]:
+        conn = self._connect()
+        rows = conn.execute("SELECT project_id FROM sessions WHERE last_accessed < ?", (before,)).fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def save_job(self, job_id: str, project_id: str, value: bytes):
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO jobs (job_id, project_id, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (job_id) DO UPDATE SET value = excluded.value",
+            (job_id, project_id, value)
+        )
+        conn.commit()
+        conn.close()
+
+    def load_job(self, job_id: str) -> Optional[bytes]:
+        conn = self._connect()
+        row = conn.execute("SELECT value FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def list_jobs(self, project_id: Optional[str] = None) -> List[bytes]:
+        conn = self._connect()
+        if project_id is None:
+            rows = conn.execute("SELECT value FROM jobs").fetchall()
+        else:
+            rows = conn.execute("SELECT value FROM jobs WHERE project_id = ?", (project_id,)).fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def remove_job(self, job_id: str, project_id: str):
+        conn = self._connect()
+        conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        conn.commit()
+        conn.close()
+
+    def request_cancel(self, job_id: str):
+        conn = self._connect()
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ?", (job_id,))
+        conn.commit()
+        conn.close()
+
+    def cancel_requested(self, job_ids: List[str]) -> List[str]:
+        if not job_ids:
+            return []
+        conn = self._connect()
+        rows = conn.execute(
+            f"SELECT job_id FROM jobs WHERE cancel_requested = 1 AND job_id IN ({', '.join('?' * len(job_ids))})",
+            job_ids
+        ).fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+
+    def append_event(self, project_id: str, value: bytes) -> int:
+        conn = self._connect()
+        try:
+            cursor = conn.execute("INSERT INTO session_events (project_id, value) VALUES (?, ?)", (project_id, value))
+            event_id = cursor.lastrowid
+            # Keep the project's last EVENT_BACKLOG events
+            conn.execute(
+                "DELETE FROM session_events WHERE project_id = ? AND id <= "
+                "(SELECT id FROM session_events WHERE project_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (project_id, project_id, EVENT_BACKLOG)
+            )
+            conn.commit()
+            return event_id
+        finally:
+            conn.close()
+
+    def events_after(self, project_id: str, after: int) -> List[Tuple[int, bytes]]:
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT id, value FROM session_events WHERE project_id = ? AND id > ? ORDER BY id",
+            (project_id, after)
+        ).fetchall()
+        conn.close()
+        return [(row[0], row[1]) for row in rows]
+
+    def last_event_id(self, project_id: str) -> int:
+        conn = self._connect()
+        row = conn.execute("SELECT MAX(id) FROM session_events WHERE project_id = ?", (project_id,)).fetchone()
+        conn.close()
+        return row[0] or 0
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        sessions, = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        size, = conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM session_data").fetchone()
+        conn.close()
+        return {"backend": self.name, "sessions": sessions, "size_bytes": size, "db_path": self.db_path}
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Session data in Redis, shared by workers on any host.
+
+    Uses only basic hash and set commands, so any client with redis-py's method
+    names works, including LocalRedis below. Per session: a meta hash (version,
+    created_at, last_accessed), a data hash of JSON payloads, a hash of the
+    version each key was written at, the set of its job ids and its event log
+    (a hash of events by id plus the last id). Job snapshots are kept in one
+    hash, with a set of the jobs asked to cancel.
+    """
+    name = "redis"
+    shared = True
+
+    def __init__(self, client, prefix: str = "misra:session"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "misra:session") -> "RedisSessionStore":
+        if url.startswith("local://"):
+            return cls(LocalRedis(), prefix)
+        if redis is None:
+            raise RuntimeError("The redis package is required for MISRA_SESSION_STORE=redis")
+        return cls(redis.Redis.from_url(url), prefix)
+
+    def _key(self, project_id: str, part: str) -> str:
+        return f"{self.prefix}:{project_id}:{part}"
+
+    def create(self, project_id: str, created_at: float):
+        meta = self._key(project_id, "meta")
+        if not self.client.exists(meta):
+            self.client.hset(meta, mapping={"version": 0, "created_at": created_at, "last_accessed": created_at})
+            self.client.sadd(f"{self.prefix}:index", project_id)
+
+    def exists(self, project_id: str) -> bool:
+        return bool(self.client.exists(self._key(project_id, "meta")))
+
+    def version(self, project_id: str) -> Optional[int]:
+        version = self.client.hget(self._key(project_id, "meta"), "version")
+        return int(version) if version is not None else None
+
+    def save(self, project_id: str, key: str, value: bytes) -> int:
+        return self.save_many(project_id, {key: value})
+
+    def save_many(self, project_id: str, values: Dict[str, bytes]) -> int:
+        meta = self._key(project_id, "meta")
+        if not self.client.exists(meta):
+            self.create(project_id, time.time())
+        # HINCRBY is atomic, so concurrent writers get distinct versions
+        version = int(self.client.hincrby(meta, "version", 1))
+        if values:
+            self.client.hset(self._key(project_id, "data"), mapping=values)
+            self.client.hset(self._key(project_id, "versions"), mapping={key: version for key in values})
+        self.client.hset(meta, "last_accessed", time.time())
+        return version
+
+    def load(self, project_id: str, since_version: int = 0) -> Optional[Tuple[int, float, Dict[str, bytes]]]:
+        meta = self.client.hgetall(self._key(project_id, "meta"))
+        if not meta:
+            return None
+        meta = {_text(field): value for field, value in meta.items()}
+        versions = self.client.hgetall(self._key(project_id, "versions"))
+        keys = [_text(key) for key, version in versions.items() if int(version) > since_version]
+        values = self.client.hmget(self._key(project_id, "data"), keys) if keys else []
+        data = {key: value for key, value in zip(keys, values) if value is not None}
+        return int(meta["version"]), float(meta["created_at"]), data
+
+    def touch(self, project_id: str, last_accessed: float):
+        if self.exists(project_id):
+            self.client.hset(self._key(project_id, "meta"), "last_accessed", last_accessed)
+
+    def remove(self, project_id: str) -> bool:
+        self.client.srem(f"{self.prefix}:index", project_id)
+        for job_id in self.client.smembers(self._key(project_id, "jobs")):
+            self.remove_job(_text(job_id), project_id)
+        self.client.delete(self._key(project_id, "events"), self._key(project_id, "event_meta"))
+        return bool(self.client.delete(
+            self._key(project_id, "meta"), self._key(project_id, "data"), self._key(project_id, "versions")
+        ))
+
+    def expired(self, before: float) -> List[str]:
+        expired = []
+        for project_id in self.client.smembers(f"{self.prefix}:index"):
+            project_id = _text(project_id)
+            last_accessed = self.client.hget(self._key(project_id, "meta"), "last_accessed")
+            if last_accessed is None or float(last_accessed) < before:
+                expired.append(project_id)
+        return expired
+
+    def save_job(self, job_id: str, project_id: str, value: bytes):
+        self.client.hset(f"{self.prefix}:jobs", job_id, value)
+        self.client.sadd(self._key(project_id, "jobs"), job_id)
+
+    def load_job(self, job_id: str) -> Optional[bytes]:
+        return self.client.hget(f"{self.prefix}:jobs", job_id)
+
+    def list_jobs(self, project_id: Optional[str] = None) -> List[bytes]:
+        if project_id is None:
+            return list(self.client.hgetall(f"{self.prefix}:jobs").values())
+        job_ids = [_text(job_id) for job_id in self.client.smembers(self._key(project_id, "jobs"))]
+        values = self.client.hmget(f"{self.prefix}:jobs", job_ids) if job_ids else []
+        return [value for value in values if value is not None]
+
+    def remove_job(self, job_id: str, project_id: str):
+        self.client.hdel(f"{self.prefix}:jobs", job_id)
+        self.client.srem(self._key(project_id, "jobs"), job_id)
+        self.client.srem(f"{self.prefix}:job_cancel", job_id)
+
+    def request_cancel(self, job_id: str):
+        self.client.sadd(f"{self.prefix}:job_cancel", job_id)
+
+    def cancel_requested(self, job_ids: List[str]) -> List[str]:
+        if not job_ids:
+            return []
+        requested = {_text(job_id) for job_id in self.client.smembers(f"{self.prefix}:job_cancel")}
+        return [job_id for job_id in job_ids if job_id in requested]
+
+    def append_event(self, project_id: str, value: bytes) -> int:
+        event_id = int(self.client.hincrby(self._key(project_id, "event_meta"), "last", 1))
+        self.client.hset(self._key(project_id, "events"), event_id, value)
+        # Keep the project's last EVENT_BACKLOG events
+        if event_id > EVENT_BACKLOG:
+            self.client.hdel(self._key(project_id, "events"), event_id - EVENT_BACKLOG)
+        return event_id
+
+    def events_after(self, project_id: str, after: int) -> List[Tuple[int, bytes]]:
+        last = self.last_event_id(project_id)
+        event_ids = list(range(max(after + 1, last - EVENT_BACKLOG + 1), last + 1))
+        if not event_ids:
+            return []
+        values = self.client.hmget(self._key(project_id, "events"), event_ids)
+        return [(event_id, value) for event_id, value in zip(event_ids, values) if value is not None]
+
+    def last_event_id(self, project_id: str) -> int:
+        last = self.client.hget(self._key(project_id, "event_meta"), "last")
+        return int(last) if last is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "sessions": len(self.client.smembers(f"{self.prefix}:index"))}
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the Redis commands RedisSessionStore uses, for local
+    development and tests. Like redis-py without decode_responses, it returns
+    hash fields and values as bytes.
+    """
+
+    def __init__(self):
+        self._hashes: Dict[str, Dict[bytes, bytes]] = {}
+        self._sets: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bytes(value) -> bytes:
+        if isinstance(value, bytes):
+            return value
+        return str(value).encode()
+
+    def exists(self, *keys) -> int:
+        with self._lock:
+            return sum(1 for key in keys if key in self._hashes or key in self._sets)
+
+    def hset(self, name: str, key=None, value=None, mapping: Optional[Dict[Any, Any]] = None) -> int:
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        with self._lock:
+            fields = self._hashes.setdefault(name, {})
+            added = 0
+            for field, field_value in items.items():
+                field = self._bytes(field)
+                added += field not in fields
+                fields[field] = self._bytes(field_value)
+            return added
+
+    def hget(self, name: str, key) -> Optional[bytes]:
+        with self._lock:
+            return self._hashes.get(name, {}).get(self._bytes(key))
+
+    def hmget(self, name: str, keys) -> List[Optional[bytes]]:
+        with self._lock:
+            fields = self._hashes.get(name, {})
+            return [fields.get(self._bytes(key)) for key in keys]
+
+    def hgetall(self, name: str) -> Dict[bytes, bytes]:
+        with self._lock:
+            return dict(self._hashes.get(name, {}))
+
+    def hdel(self, name: str, *keys) -> int:
+        with self._lock:
+            fields = self._hashes.get(name, {})
+            removed = sum(fields.pop(self._bytes(key), None) is not None for key in keys)
+            if name in self._hashes and not fields:
+                del self._hashes[name]
+            return removed
+
+    def hincrby(self, name: str, key, amount: int = 1) -> int:
+        with self._lock:
+            fields = self._hashes.setdefault(name, {})
+            value = int(fields.get(self._bytes(key), b"0")) + amount
+            fields[self._bytes(key)] = self._bytes(value)
+            return value
+
+    def delete(self, *names) -> int:
+        with self._lock:
+            removed = 0
+            for name in names:
+                removed += (self._hashes.pop(name, None) is not None) or (self._sets.pop(name, None) is not None)
+            return removed
+
+    def sadd(self, name: str, *values) -> int:
+        with self._lock:
+            members = self._sets.setdefault(name, set())
+            added = len({self._bytes(value) for value in values} - members)
+            members.update(self._bytes(value) for value in values)
+            return added
+
+    def srem(self, name: str, *values) -> int:
+        with self._lock:
+            members = self._sets.get(name, set())
+            removed = len(members & {self._bytes(value) for value in values})
+            members.difference_update(self._bytes(value) for value in values)
+            return removed
+
+    def smembers(self, name: str) -> set:
+        with self._lock:
+            return set(self._sets.get(name, set()))
+
+
+def create_session_store() -> SessionStore:
+    """
+    Session store selected by MISRA_SESSION_STORE: 'memory' (default), 'sqlite' or 'redis'.
+
+    Shared stores carry session data, background job snapshots and project
+    events between workers, so requests and WebSockets need no sticky routing.
+    Chat objects and the cached document and review state are rebuilt per
+    worker from the shared data.
+    """
+    backend = os.environ.get('MISRA_SESSION_STORE', 'memory').lower()
+    if backend == 'sqlite':
+        return SQLiteSessionStore(os.environ.get('MISRA_SESSION_DB', 'sessions.db'))
+    if backend == 'redis':
+        return RedisSessionStore.from_url(os.environ.get('MISRA_REDIS_URL', 'redis://localhost:6379/0'))
+    if backend != 'memory':
+        raise ValueError(f"Unknown session store: {backend}")
+    return SessionStore()
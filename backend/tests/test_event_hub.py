@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+
+from event_hub import ProjectEventHub
+from session_store import LocalRedis, RedisSessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def shared_store(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+    return RedisSessionStore(LocalRedis())
+
+
+async def receive(queue, count, timeout=5.0):
+    messages = []
+    deadline = time.monotonic() + timeout
+    while len(messages) < count:
+        assert time.monotonic() < deadline, f"received {messages}"
+        try:
+            messages.append(await asyncio.wait_for(queue.get(), 0.05))
+        except asyncio.TimeoutError:
+            pass
+    return messages
+
+
+def test_events_reach_subscribers_of_another_worker(shared_store):
+    async def scenario():
+        publisher = ProjectEventHub(store=shared_store, poll_interval=0.02)
+        subscriber = ProjectEventHub(store=shared_store, poll_interval=0.02)
+        queue = subscriber.subscribe('p')
+        local_queue = publisher.subscribe('p')
+        # Let the relay start following the project
+        await asyncio.sleep(0.2)
+
+        for batch in range(3):
+            publisher.publish('p', 'progress', {'batches_done': batch})
+        subscriber.publish('p', 'review', {'line_key': '4'})
+
+        relayed = await receive(queue, 4)
+        assert sorted((m['event'], m['data'].get('batches_done')) for m in relayed) == [
+            ('progress', 0), ('progress', 1), ('progress', 2), ('review', None)
+        ]
+        assert [m['seq'] for m in relayed] == [1, 2, 3, 4]
+        # Each worker delivers its own events once
+        local = await receive(local_queue, 4)
+        assert [m['event'] for m in local].count('progress') == 3
+        await asyncio.sleep(0.1)
+        assert queue.empty() and local_queue.empty()
+        assert subscriber.stats()['relayed'] == 3
+
+    asyncio.run(scenario())
+
+
+def test_subscriber_that_falls_behind_gets_a_resync():
+    async def scenario():
+        hub = ProjectEventHub(max_queue=4)
+        slow = hub.subscribe('p')
+        for batch in range(10):
+            hub.publish('p', 'progress', {'batches_done': batch})
+            if batch == 2:
+                # Keeps up until here
+                assert [(await slow.get())['seq'] for _ in range(3)] == [1, 2, 3]
+
+        messages = [slow.get_nowait() for _ in range(slow.qsize())]
+        # The backlog at overflow was replaced by one resync; later events follow it
+        assert messages[0]['event'] == 'resync' and messages[0]['data'] == {'dropped': 5}
+        assert [m['data']['batches_done'] for m in messages[1:]] == [8, 9]
+        assert [m['seq'] for m in messages] == [8, 9, 10]
+        assert hub.stats()['dropped'] == 5
+
+    asyncio.run(scenario())
+
+
+def test_events_go_only_to_subscribers_of_their_project():
+    async def scenario():
+        hub = ProjectEventHub()
+        first, second = hub.subscribe('p'), hub.subscribe('p')
+        other = hub.subscribe('q')
+        hub.publish('p', 'review', {'line_key': '4'})
+        hub.publish('r', 'review', {'line_key': '9'})
+
+        assert first.get_nowait()['data'] == second.get_nowait()['data'] == {'line_key': '4'}
+        assert other.empty()
+
+        hub.unsubscribe('p', first)
+        hub.unsubscribe('p', second)
+        hub.publish('p', 'review', {'line_key': '5'})
+        assert first.empty() and hub.stats()['projects'] == 1
+
+    asyncio.run(scenario())
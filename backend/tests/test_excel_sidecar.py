@@ -0,0 +1,43 @@
+import pytest
+from openpyxl import Workbook
+
+from excel_utils import (
+    compute_file_hash, iter_violations_for_file, load_sidecar, load_sidecar_for_file, parse_report, write_sidecar
+)
+
+pytest.importorskip("pyarrow")
+
+
+def write_mixed_report(path):
+    """Report whose columns mix numbers and text, as real exports do"""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['Path', 'File', 'Line and Warning', 'Level', 'Misra', 'Status'])
+    sheet.append(['/src/a.cpp', 'a.cpp', '[Line 12] Implicit conversion', 'Required', 'Rule_5_0_4', 'Open'])
+    sheet.append(['/src/a.cpp', 'a.cpp', '[Line 40] Cast removes const', 'Advisory', 504, 'Open'])
+    sheet.append(['/src/b.cpp', 'b.cpp', 12, 3, 7.1, 'Open'])
+    workbook.save(path)
+
+
+def test_sidecar_round_trips_mixed_type_report(tmp_path):
+    excel_path = str(tmp_path / "report.xlsx")
+    write_mixed_report(excel_path)
+    content_hash = compute_file_hash(excel_path)
+
+    index = parse_report(excel_path)
+    violations = [violation for file_violations in index.values() for violation in file_violations]
+    assert write_sidecar(excel_path, content_hash, violations) is not None
+
+    assert load_sidecar(excel_path, content_hash) == index
+    assert load_sidecar_for_file(excel_path, content_hash, 'a.cpp') == index['a.cpp']
+    assert [v['misra'] for v in index['a.cpp']] == ['Rule_5_0_4', '504']
+    assert index['b.cpp'][0]['line'] is None
+
+
+def test_streaming_parse_matches_full_parse(tmp_path):
+    excel_path = str(tmp_path / "report.xlsx")
+    write_mixed_report(excel_path)
+
+    index = parse_report(excel_path)
+    for target_file in ('a.cpp', 'b.cpp'):
+        assert list(iter_violations_for_file(excel_path, target_file)) == index[target_file]
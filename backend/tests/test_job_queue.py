@@ -0,0 +1,163 @@
+import asyncio
+import time
+
+import pytest
+
+import job_queue
+from job_queue import JobQueue
+from session_store import LocalRedis, RedisSessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def shared_store(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, 'CANCEL_POLL_INTERVAL', 0.05)
+    if request.param == 'sqlite':
+        return SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+    return RedisSessionStore(LocalRedis())
+
+
+async def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        await asyncio.sleep(0.02)
+
+
+def test_jobs_of_one_worker_are_visible_and_cancellable_from_another(shared_store):
+    async def scenario():
+        owner, other = JobQueue(store=shared_store), JobQueue(store=shared_store)
+
+        async def run(job):
+            for batch in range(100):
+                job.report({'batches_done': batch}, {str(batch): 'fixed'})
+                await asyncio.sleep(0.02)
+            return {'done': True}
+
+        job = owner.submit('fix-violations', 'p', run)
+        await wait_for(lambda: other.get(job.id) is not None and other.get(job.id).progress.get('batches_done', 0) >= 2)
+        seen = other.get(job.id)
+        assert seen.status == 'running' and seen.project_id == 'p'
+        assert seen.partial_snippets
+        assert [listed.id for listed in other.list('p')] == [job.id]
+
+        assert other.cancel(job.id)
+        await wait_for(lambda: job.finished)
+        assert job.status == 'cancelled'
+        await wait_for(lambda: other.get(job.id).status == 'cancelled')
+        assert not other.cancel(job.id)
+
+    asyncio.run(scenario())
+
+
+def test_finished_job_result_is_stored(shared_store):
+    async def scenario():
+        owner, other = JobQueue(store=shared_store), JobQueue(store=shared_store)
+
+        async def run(job):
+            return {'snippets': 3}
+
+        job = owner.submit('chat', 'p', run)
+        await wait_for(lambda: job.finished)
+        await wait_for(lambda: other.get(job.id) is not None and other.get(job.id).finished)
+        assert other.get(job.id).to_dict(include_snippets=False) == job.to_dict(include_snippets=False)
+
+    asyncio.run(scenario())
+
+
+def test_job_lifecycle_is_reported_to_the_listener():
+    async def scenario():
+        queue = JobQueue()
+        statuses = []
+        queue.listener = lambda job, new_snippets: statuses.append((job.status, dict(new_snippets)))
+
+        async def run(job):
+            job.report({'batches_done': 1}, {'4': 'a'})
+            job.report({'batches_done': 2}, {'4': 'a', '9': 'b'})
+            return {'snippets': 2}
+
+        job = queue.submit('fix-violations', 'p', run)
+        await wait_for(lambda: job.finished)
+        assert job.status == 'completed' and job.result == {'snippets': 2}
+        assert job.created_at <= job.started_at <= job.finished_at
+        # Each report carries only the snippets that are new since the previous one
+        assert statuses == [('queued', {}), ('running', {}), ('running', {'4': 'a'}),
+                            ('running', {'9': 'b'}), ('completed', {})]
+
+        async def fail(job):
+            raise ValueError("blocked")
+
+        failed = queue.submit('chat', 'p', fail)
+        await wait_for(lambda: failed.finished)
+        assert (failed.status, failed.error) == ('error', 'blocked')
+        assert queue.stats()['failed'] == 1 and queue.stats()['by_status'] == {'completed': 1, 'error': 1}
+
+    asyncio.run(scenario())
+
+
+def test_jobs_of_a_project_run_in_order_within_the_running_limit():
+    async def scenario():
+        queue = JobQueue(max_running=2)
+        running, peak, order = set(), [0], []
+
+        def runner(name):
+            async def run(job):
+                running.add(name)
+                peak[0] = max(peak[0], len(running))
+                order.append(name)
+                await asyncio.sleep(0.05)
+                running.discard(name)
+                return {}
+            return run
+
+        jobs = [queue.submit('chat', 'p', runner('p1')), queue.submit('chat', 'p', runner('p2'))]
+        jobs += [queue.submit('chat', f'q{index}', runner(f'q{index}')) for index in range(3)]
+        await wait_for(lambda: all(job.finished for job in jobs))
+        assert peak[0] == 2
+        assert order.index('p1') < order.index('p2')
+
+    asyncio.run(scenario())
+
+
+def test_cancel_queued_and_running_jobs():
+    async def scenario():
+        queue = JobQueue(max_running=1)
+        started = asyncio.Event()
+
+        async def slow(job):
+            started.set()
+            await asyncio.sleep(10)
+            return {}
+
+        running = queue.submit('fix-violations', 'p', slow)
+        queued = queue.submit('chat', 'q', slow)
+        await started.wait()
+        assert queued.status == 'queued'
+
+        assert queue.cancel(queued.id)
+        assert queue.cancel(running.id)
+        await wait_for(lambda: running.finished and queued.finished)
+        assert (running.status, queued.status) == ('cancelled', 'cancelled')
+        assert queued.started_at is None and queued.finished_at is not None
+        assert not queue.cancel(running.id)
+        assert not queue.cancel('unknown')
+
+    asyncio.run(scenario())
+
+
+def test_finished_jobs_beyond_the_limit_are_pruned():
+    async def scenario():
+        queue = JobQueue(max_finished=2)
+
+        async def run(job):
+            return {}
+
+        jobs = []
+        for _ in range(4):
+            jobs.append(queue.submit('chat', 'p', run))
+            await wait_for(lambda: jobs[-1].finished)
+        queue.submit('chat', 'p', run)
+        # The oldest finished jobs went first
+        assert queue.get(jobs[0].id) is None and queue.get(jobs[1].id) is None
+        assert queue.get(jobs[3].id) is jobs[3]
+
+    asyncio.run(scenario())
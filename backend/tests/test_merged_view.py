@@ -0,0 +1,59 @@
+import random
+
+from numbered_document import NumberedDocument
+from replace import merge_fixed_snippets
+
+SOURCE = "int a;\nint b;\n\nvoid f()\n{\n    a = b;\n}\n"
+
+
+def expected_numbered(document, fixes):
+    return ''.join(f"{key}:{content}\n" for key, content in merge_fixed_snippets(document.original_lines, fixes))
+
+
+def test_update_and_remove_match_a_full_merge():
+    document = NumberedDocument.from_text(SOURCE)
+    view = document.view('accepted')
+    fixes = {}
+    for line_key, content in [('2', ' int b = 0;'), ('2a', ' int c;'), ('6', '    a = (int)b;'),
+                              ('2', ' long b;'), ('0a', ' // header'), ('12', ' // trailing')]:
+        view.update(line_key, content)
+        fixes[line_key] = content
+        assert view.numbered_text() == expected_numbered(document, fixes)
+
+    for line_key in ['2a', '0a', '2', 'missing', '12']:
+        view.update(line_key, None)
+        fixes.pop(line_key, None)
+        assert view.numbered_text() == expected_numbered(document, fixes)
+        assert view.denumbered_text() == document.denumbered_text(fixes)
+
+
+def test_random_syncs_match_a_full_merge():
+    rng = random.Random(7)
+    document = NumberedDocument.from_text(SOURCE)
+    view = document.view('all')
+    line_keys = [f"{line}{suffix}" for line in range(0, 10) for suffix in ('', 'a', 'b')]
+    current = {}
+    for _ in range(200):
+        fixes = {key: f" fixed {rng.randrange(3)}" for key in rng.sample(line_keys, rng.randrange(6))}
+        if rng.random() < 0.5:
+            view.sync(fixes)
+        else:
+            # Reach the same state through single-line updates
+            for key in current:
+                if key not in fixes:
+                    view.update(key, None)
+            for key, content in fixes.items():
+                view.update(key, content)
+        current = fixes
+        assert view.numbered_text() == document.merged_numbered_text(fixes)
+        assert view.denumbered_text() == document.denumbered_text(fixes)
+
+
+def test_views_are_independent_and_empty_sync_restores_the_original():
+    document = NumberedDocument.from_text(SOURCE)
+    document.view('all').sync({'1': ' int a = 1;'})
+    assert document.view('accepted').numbered_text() == document.numbered_text()
+
+    document.view('all').sync({})
+    assert document.view('all').numbered_text() == document.numbered_text()
+    assert document.view('all').denumbered_text() == SOURCE
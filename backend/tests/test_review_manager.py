@@ -0,0 +1,99 @@
+import json
+import time
+
+import review_manager
+from review_manager import ReviewManager, ReviewStateWriter
+
+
+def read_state(tmp_path, project_id='p'):
+    with open(tmp_path / f"{project_id}_review_state.json") as f:
+        return json.load(f)
+
+
+def test_two_managers_on_one_file_keep_each_others_changes(tmp_path):
+    # Two workers' copies of the same project, both loaded before any click
+    first = ReviewManager('p', str(tmp_path))
+    second = ReviewManager('p', str(tmp_path))
+
+    first.accept_line('1')
+    second.reject_line('2')
+    second.set_current_review_index(3)
+    first.accept_line('4')
+
+    state = read_state(tmp_path)
+    assert state['accepted_lines'] == ['1', '4']
+    assert state['rejected_lines'] == ['2']
+    assert state['current_review_index'] == 3
+
+    # Each copy picks up the other's clicks
+    assert second.refresh()
+    assert second.accepted_lines == {'1', '4'} and second.rejected_lines == {'2'}
+    assert first.refresh()
+    assert first.get_line_status('2') == 'rejected'
+    assert not first.refresh()
+
+
+def test_write_behind_from_two_workers_merges_into_the_file(tmp_path, monkeypatch):
+    # One writer per worker process
+    writers = [ReviewStateWriter(delay=60), ReviewStateWriter(delay=60)]
+    managers = []
+    for writer in writers:
+        monkeypatch.setattr(review_manager, 'review_writer', writer)
+        managers.append(ReviewManager('p', str(tmp_path), write_behind=True))
+
+    monkeypatch.setattr(review_manager, 'review_writer', writers[0])
+    managers[0].accept_line('1')
+    managers[0].accept_line('2')
+    writers[0].flush()
+
+    monkeypatch.setattr(review_manager, 'review_writer', writers[1])
+    managers[1].reject_line('3')
+    managers[1].reset_line('2')
+    # A reload in the second worker keeps its own unwritten changes
+    assert managers[1].refresh()
+    assert managers[1].accepted_lines == {'1'} and managers[1].rejected_lines == {'3'}
+    writers[1].flush()
+
+    state = read_state(tmp_path)
+    assert state['accepted_lines'] == ['1']
+    assert state['rejected_lines'] == ['3']
+
+
+def test_reset_drops_earlier_pending_changes(tmp_path):
+    writer = ReviewStateWriter(delay=60)
+    path = str(tmp_path / 'p_review_state.json')
+    writer.write(path, {'lines': {'1': 'accepted'}, 'current_review_index': 5})
+
+    writer.schedule(path, {'lines': {'2': 'accepted'}})
+    writer.schedule(path, {'reset': True})
+    writer.schedule(path, {'lines': {'3': 'rejected'}})
+    writer.flush()
+
+    assert read_state(tmp_path) == {'accepted_lines': [], 'rejected_lines': ['3'], 'current_review_index': 0}
+
+
+def test_writer_debounces_a_burst_of_changes(tmp_path):
+    writer = ReviewStateWriter(delay=0.05, max_delay=5)
+    path = str(tmp_path / 'p_review_state.json')
+    for line in range(10):
+        writer.schedule(path, {'lines': {str(line): 'accepted'}})
+    assert writer.pending(path)['lines'] == {str(line): 'accepted' for line in range(10)}
+
+    deadline = time.monotonic() + 5
+    while writer.stats()['pending'] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert writer.stats() == {'scheduled': 10, 'writes': 1, 'errors': 0, 'pending': 0}
+    assert len(read_state(tmp_path)['accepted_lines']) == 10
+
+
+def test_flush_writes_pending_changes_before_the_delay(tmp_path):
+    writer = ReviewStateWriter(delay=60, max_delay=60)
+    path = str(tmp_path / 'p_review_state.json')
+    writer.schedule(path, {'lines': {'7': 'rejected'}})
+    assert writer.pending(path) is not None
+
+    writer.flush()
+
+    assert writer.pending(path) is None
+    assert read_state(tmp_path)['rejected_lines'] == ['7']
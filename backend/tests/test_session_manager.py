@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from session_manager import ConcurrentSessionManager
+
+
+def make_manager(tmp_path, memory_budget=None):
+    return ConcurrentSessionManager(memory_budget=memory_budget, spill_db=str(tmp_path / 'spill.db'), shards=4)
+
+
+def test_evicted_session_is_reloaded_from_the_spill_store(tmp_path):
+    manager = make_manager(tmp_path, memory_budget=30000)
+    first = manager.get_or_create_session('first')
+    first.set_data('violations', [{'line': line, 'misra': 'Rule_5_0_4'} for line in range(40)])
+    first.set_data('sent_lines', {'4', '9'})
+    manager.get_or_create_session('second').set_data('cpp_text', 'x' * 25000)
+
+    stats = manager.store_stats()
+    assert stats['evictions'] == 1 and stats['spills'] == 1
+    assert stats['local_sessions'] == 1
+
+    # A request still holding the evicted copy writes through to the spill store
+    first.set_data('fixes_revision', 3)
+
+    reloaded = manager.get_session('first')
+    assert reloaded is not first
+    assert reloaded.get_data('violations')[39] == {'line': 39, 'misra': 'Rule_5_0_4'}
+    assert reloaded.get_data('sent_lines') == {'4', '9'}
+    assert reloaded.get_data('fixes_revision') == 3
+    assert manager.store_stats()['reloads'] == 1
+
+
+def test_removed_session_is_gone_from_memory_and_the_spill_store(tmp_path):
+    manager = make_manager(tmp_path, memory_budget=30000)
+    manager.get_or_create_session('first').set_data('cpp_text', 'x' * 20000)
+    manager.get_or_create_session('second').set_data('cpp_text', 'y' * 20000)
+
+    assert manager.remove_session('first')
+    assert manager.get_session('first') is None
+    assert manager.get_session('second').get_data('cpp_text') == 'y' * 20000
+
+
+def test_idle_sessions_expire_and_accessed_ones_are_kept(tmp_path):
+    manager = make_manager(tmp_path)
+    manager._session_timeout = 60
+    for project_id in ('idle', 'busy'):
+        manager.get_or_create_session(project_id)
+    # Both deadlines have passed, but 'busy' was accessed since its entry was pushed
+    for session in (manager.get_session('idle'), manager.get_session('busy')):
+        session.last_accessed -= timedelta(seconds=120)
+    manager._expiry = [(deadline - 120, token, project_id) for deadline, token, project_id in manager._expiry]
+    manager.get_session('busy').update_access_time()
+
+    manager.cleanup_expired_sessions()
+
+    assert manager.get_session('idle') is None
+    assert manager.get_session('busy') is not None
+    # The kept session's entry was pushed back to its new deadline
+    assert [project_id for _, _, project_id in manager._expiry] == ['busy']
+    assert manager.store_stats()['expiry_queue'] == 1
+
+
+def test_sessions_are_spread_over_shards(tmp_path):
+    manager = make_manager(tmp_path)
+    project_ids = [f"project-{index}" for index in range(32)]
+    for project_id in project_ids:
+        manager.get_or_create_session(project_id)
+
+    assert len({id(manager._shard(project_id)) for project_id in project_ids}) > 1
+    assert manager.store_stats()['local_sessions'] == 32
+    assert all(manager.get_session(project_id).project_id == project_id for project_id in project_ids)
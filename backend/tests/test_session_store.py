@@ -0,0 +1,71 @@
+import pickle
+
+import pytest
+
+from session_manager import ConcurrentSessionManager, load_values
+from session_store import LocalRedis, RedisSessionStore, SQLiteSessionStore, dump_value, load_value
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def store(request, tmp_path):
+    if request.param == 'sqlite':
+        return SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+    return RedisSessionStore(LocalRedis())
+
+
+def test_values_round_trip_as_json():
+    value = {'sent_lines': {'4', '9'}, 'snippets': {'4': ' int a;'}, 'stats': [1, 2.5, None, True]}
+    data = dump_value(value)
+    assert data.startswith(b'{')
+    assert load_value(data) == value
+
+
+def test_non_json_values_are_rejected_both_ways():
+    with pytest.raises(TypeError):
+        dump_value({'chat': object()})
+    # Pickles are never unpickled
+    with pytest.raises(ValueError):
+        load_value(pickle.dumps({'a': 1}))
+    assert load_values('p', {'old': pickle.dumps([1]), 'new': dump_value([2])}) == {'new': [2]}
+
+
+def test_store_versions_and_incremental_loads(store):
+    store.create('p', 100.0)
+    assert store.exists('p') and store.version('p') == 0
+    first = store.save('p', 'cpp_file', dump_value('uploads/p_t.cpp'))
+    second = store.save_many('p', {'violations': dump_value([{'line': 4}]), 'sent_lines': dump_value({'4'})})
+    assert second == first + 1
+
+    version, created_at, values = store.load('p')
+    assert (version, created_at) == (second, 100.0)
+    assert {key: load_value(value) for key, value in values.items()} == {
+        'cpp_file': 'uploads/p_t.cpp', 'violations': [{'line': 4}], 'sent_lines': {'4'}
+    }
+    assert set(store.load('p', first)[2]) == {'violations', 'sent_lines'}
+    assert store.load('p', second)[2] == {}
+
+
+def test_store_expiry_and_removal(store):
+    store.create('old', 100.0)
+    store.create('new', 100.0)
+    store.touch('new', 500.0)
+    assert store.expired(300.0) == ['old']
+
+    assert store.remove('old')
+    assert not store.exists('old') and store.load('old') is None
+    assert store.version('old') is None
+
+
+def test_two_managers_share_session_data(store):
+    first, second = ConcurrentSessionManager(store), ConcurrentSessionManager(store)
+    first.get_or_create_session('p').set_data('fixed_snippets', {'4': ' int a;'})
+
+    session = second.get_session('p')
+    assert session.get_data('fixed_snippets') == {'4': ' int a;'}
+    session.set_data('accepted_view_synced', 'local-document')
+    session.set_data('fixes_revision', 2)
+
+    other = first.get_session('p')
+    assert other.get_data('fixes_revision') == 2
+    # Worker-local keys stay in the worker that set them
+    assert other.get_data('accepted_view_synced') is None
@@ -8,6 +8,7 @@ import { Badge } from '@/components/ui/badge';
 import { useAppContext } from '@/context/AppContext';
 import { useToast } from '@/hooks/use-toast';
 import { apiClient } from '@/lib/api';
+import { concurrentApiClient, ProjectEvent } from '@/lib/concurrent-api';
 
 interface FixReviewModalProps {
   isOpen: boolean;
@@ -52,13 +53,53 @@ export default function FixReviewModal({ isOpen, onClose }: FixReviewModalProps)
     }
   }, [isOpen, state.projectId]);
 
+  // Review actions (from any client) arrive as deltas; the diff only changes when new fixes are stored
+  useEffect(() => {
+    if (!isOpen || !state.projectId) return;
+
+    // A socket opened by another subscriber sends no snapshot for this one, so any later snapshot is a reconnect
+    let connectedBefore = concurrentApiClient.isProjectConnected(state.projectId);
+    return concurrentApiClient.subscribeToProject(state.projectId, (event: ProjectEvent) => {
+      switch (event.event) {
+        case 'review': {
+          const { line_key, status, summary: pushedSummary, reset } = event.data;
+          if (reset) {
+            setFixes(current => current.map(fix => ({ ...fix, status: 'pending' as const })));
+          } else if (line_key && status) {
+            setFixes(current => current.map(fix => fix.line_key === line_key ? { ...fix, status } : fix));
+          }
+          if (pushedSummary) {
+            setSummary(pushedSummary);
+          }
+          break;
+        }
+        case 'snippets':
+          setCodeSnippets((current: Record<string, string>) => {
+            const updated = { ...current, ...event.data.snippets };
+            event.data.removed.forEach((key: string) => delete updated[key]);
+            return updated;
+          });
+          loadReviewData(false);
+          break;
+        case 'snapshot':
+          // Only a reconnect may have missed events; the first connect's snapshot follows loadReviewData
+          if (connectedBefore) loadReviewData();
+          connectedBefore = true;
+          break;
+        case 'resync':
+          loadReviewData();
+          break;
+      }
+    });
+  }, [isOpen, state.projectId]);
+
   useEffect(() => {
     if (fixes.length > 0 && currentFixIndex < fixes.length) {
       scrollToFix(fixes[currentFixIndex]);
     }
   }, [currentFixIndex, fixes]);
 
-  const loadReviewData = async () => {
+  const loadReviewData = async (reloadSnippets: boolean = true) => {
     if (!state.projectId) return;
     
     setIsLoading(true);
@@ -67,7 +108,7 @@ export default function FixReviewModal({ isOpen, onClose }: FixReviewModalProps)
       const [reviewResponse, diffResponse, snippetsResponse, violationMappingResponse] = await Promise.all([
         apiClient.getReviewState(state.projectId),
         apiClient.getDiff(state.projectId),
-        apiClient.getCodeSnippets(state.projectId),
+        reloadSnippets ? apiClient.getCodeSnippets(state.projectId) : Promise.resolve(null),
         apiClient.getViolationMapping(state.projectId)
       ]);
 
@@ -83,7 +124,7 @@ export default function FixReviewModal({ isOpen, onClose }: FixReviewModalProps)
         setHighlightData(diffResponse.data.highlight);
       }
 
-      if (snippetsResponse.success && snippetsResponse.data) {
+      if (snippetsResponse?.success && snippetsResponse.data) {
         setCodeSnippets(snippetsResponse.data);
       }
 
@@ -146,14 +187,6 @@ export default function FixReviewModal({ isOpen, onClose }: FixReviewModalProps)
           description: `Fix ${action}ed successfully`,
         });
         
-        // Reload diff to show updated changes
-        const diffResponse = await apiClient.getDiff(state.projectId);
-        if (diffResponse.success && diffResponse.data) {
-          setOriginalCode(diffResponse.data.original);
-          setFixedCode(diffResponse.data.fixed);
-          setHighlightData(diffResponse.data.highlight);
-        }
-        
         // Auto-advance to next pending fix with actual changes
         setTimeout(() => {
           navigateToNextChange();
@@ -241,14 +274,6 @@ export default function FixReviewModal({ isOpen, onClose }: FixReviewModalProps)
           title: "Success",
           description: `Violation fix ${action}ed successfully (${lineKeys.length} line${lineKeys.length > 1 ? 's' : ''})`,
         });
-        
-        // Reload diff to show updated changes
-        const diffResponse = await apiClient.getDiff(state.projectId);
-        if (diffResponse.success && diffResponse.data) {
-          setOriginalCode(diffResponse.data.original);
-          setFixedCode(diffResponse.data.fixed);
-          setHighlightData(diffResponse.data.highlight);
-        }
 
         // Auto-advance to next pending fix
         setTimeout(() => {
@@ -296,14 +321,6 @@ export default function FixReviewModal({ isOpen, onClose }: FixReviewModalProps)
           title: "Success",
           description: "Fix reset to pending status",
         });
-        
-        // Reload diff to show updated changes
-        const diffResponse = await apiClient.getDiff(state.projectId);
-        if (diffResponse.success && diffResponse.data) {
-          setOriginalCode(diffResponse.data.original);
-          setFixedCode(diffResponse.data.fixed);
-          setHighlightData(diffResponse.data.highlight);
-        }
       } else {
         throw new Error(response.error || 'Failed to reset fix');
       }
@@ -366,14 +383,6 @@ export default function FixReviewModal({ isOpen, onClose }: FixReviewModalProps)
           title: "Success",
           description: `Group reset to pending (${lineKeys.length} line${lineKeys.length > 1 ? 's' : ''})`,
         });
-        
-        // Reload diff to show updated changes
-        const diffResponse = await apiClient.getDiff(state.projectId);
-        if (diffResponse.success && diffResponse.data) {
-          setOriginalCode(diffResponse.data.original);
-          setFixedCode(diffResponse.data.fixed);
-          setHighlightData(diffResponse.data.highlight);
-        }
       } else {
         throw new Error('Some resets failed');
       }
@@ -434,7 +443,11 @@ const scrollToFix = (fix: Fix) => {
           title: "Success",
           description: "Review reset successfully",
         });
-        loadReviewData(); // Reload all data
+        setFixes(fixes.map(fix => ({ ...fix, status: 'pending' as const })));
+        if (summary) {
+          setSummary({ ...summary, accepted_count: 0, rejected_count: 0, pending_count: summary.total_fixes, current_review_index: 0 });
+        }
+        setCurrentFixIndex(0);
       }
     } catch (error) {
       toast({
@@ -866,14 +879,6 @@ const scrollToFix = (fix: Fix) => {
           title: "Success",
           description: `All ${allLineKeys.length} fixes accepted`,
         });
-        
-        // Reload diff
-        const diffResponse = await apiClient.getDiff(state.projectId);
-        if (diffResponse.success && diffResponse.data) {
-          setOriginalCode(diffResponse.data.original);
-          setFixedCode(diffResponse.data.fixed);
-          setHighlightData(diffResponse.data.highlight);
-        }
       }
     } catch (error) {
       toast({
@@ -924,14 +929,6 @@ const scrollToFix = (fix: Fix) => {
           title: "Success",
           description: `All ${allLineKeys.length} fixes rejected`,
         });
-        
-        // Reload diff
-        const diffResponse = await apiClient.getDiff(state.projectId);
-        if (diffResponse.success && diffResponse.data) {
-          setOriginalCode(diffResponse.data.original);
-          setFixedCode(diffResponse.data.fixed);
-          setHighlightData(diffResponse.data.highlight);
-        }
       }
     } catch (error) {
       toast({
@@ -1,7 +1,7 @@
 
 import React, { createContext, useContext, useReducer, useEffect, useCallback } from 'react';
 import { useToast } from '@/hooks/use-toast';
-import { concurrentApiClient } from '@/lib/concurrent-api';
+import { concurrentApiClient, BackgroundJob, ProjectEvent } from '@/lib/concurrent-api';
 
 export interface ModelSettings {
   temperature: number;
@@ -43,6 +43,16 @@ export interface RequestStatus {
   error?: string;
 }
 
+export type ReviewStatus = 'accepted' | 'rejected' | 'pending';
+
+export interface ReviewSummary {
+  total_fixes: number;
+  accepted_count: number;
+  rejected_count: number;
+  pending_count: number;
+  current_review_index: number;
+}
+
 export interface AppState {
   // File management
   uploadedFile: { name: string; path: string } | null;
@@ -69,6 +79,14 @@ export interface AppState {
   activeRequests: RequestStatus[];
   queueStatus: { queued: number; active: number; maxConcurrent: number };
   
+  // Pushed by the server over the project's WebSocket channel
+  serverJobs: Record<string, BackgroundJob>;
+  fixProgress: { status: string; batches_done: number; snippets_count: number; complete: boolean; [key: string]: any } | null;
+  codeSnippets: Record<string, string>;
+  fixesRevision: number;
+  reviewSummary: ReviewSummary | null;
+  reviewStatuses: Record<string, ReviewStatus>;
+  
   // Legacy support
   currentVersion: number;
   chatHistory: ChatMessage[];
@@ -100,7 +118,11 @@ type AppAction =
   | { type: 'ADD_REQUEST'; payload: RequestStatus }
   | { type: 'UPDATE_REQUEST'; payload: { id: string; updates: Partial<RequestStatus> } }
   | { type: 'REMOVE_REQUEST'; payload: string }
-  | { type: 'UPDATE_QUEUE_STATUS'; payload: { queued: number; active: number; maxConcurrent: number } };
+  | { type: 'UPDATE_QUEUE_STATUS'; payload: { queued: number; active: number; maxConcurrent: number } }
+  | { type: 'UPDATE_SERVER_JOB'; payload: BackgroundJob }
+  | { type: 'SET_FIX_PROGRESS'; payload: AppState['fixProgress'] }
+  | { type: 'APPLY_SNIPPETS_DELTA'; payload: { snippets: Record<string, string>; removed: string[]; revision: number } }
+  | { type: 'APPLY_REVIEW_DELTA'; payload: { line_key?: string; status?: ReviewStatus; summary?: ReviewSummary; current_index?: number; reset?: boolean } };
 
 const initialState: AppState = {
   uploadedFile: null,
@@ -116,6 +138,12 @@ const initialState: AppState = {
   projectId: null,
   activeRequests: [],
   queueStatus: { queued: 0, active: 0, maxConcurrent: 5 },
+  serverJobs: {},
+  fixProgress: null,
+  codeSnippets: {},
+  fixesRevision: 0,
+  reviewSummary: null,
+  reviewStatuses: {},
   currentVersion: 0,
   chatHistory: [],
   fixedSnippets: [],
@@ -189,6 +217,30 @@ function appReducer(state: AppState, action: AppAction): AppState {
       };
     case 'UPDATE_QUEUE_STATUS':
       return { ...state, queueStatus: action.payload };
+    case 'UPDATE_SERVER_JOB':
+      return {
+        ...state,
+        serverJobs: { ...state.serverJobs, [action.payload.jobId]: action.payload }
+      };
+    case 'SET_FIX_PROGRESS':
+      return { ...state, fixProgress: action.payload };
+    case 'APPLY_SNIPPETS_DELTA': {
+      const codeSnippets = { ...state.codeSnippets, ...action.payload.snippets };
+      action.payload.removed.forEach(key => delete codeSnippets[key]);
+      return { ...state, codeSnippets, fixesRevision: action.payload.revision };
+    }
+    case 'APPLY_REVIEW_DELTA': {
+      const { line_key, status, summary, current_index, reset } = action.payload;
+      let reviewSummary = summary ?? state.reviewSummary;
+      if (current_index !== undefined && reviewSummary) {
+        reviewSummary = { ...reviewSummary, current_review_index: current_index };
+      }
+      let reviewStatuses = reset ? {} : state.reviewStatuses;
+      if (line_key && status) {
+        reviewStatuses = { ...reviewStatuses, [line_key]: status };
+      }
+      return { ...state, reviewSummary, reviewStatuses };
+    }
     
     // Legacy support
     case 'SET_SELECTED_VIOLATIONS':
@@ -317,11 +369,70 @@ export function ConcurrentAppProvider({ children }: { children: React.ReactNode
     dispatch({ type: 'UPDATE_QUEUE_STATUS', payload: status });
   }, []);
 
-  // Update queue status periodically
+  // Full copy of the fixes and review state; the socket's deltas keep it current afterwards
+  const loadReviewSnapshot = useCallback(async (projectId: string, fixesRevision?: number) => {
+    try {
+      const [snippetsResponse, reviewResponse] = await Promise.all([
+        concurrentApiClient.getCodeSnippets(projectId),
+        concurrentApiClient.getReviewState(projectId),
+      ]);
+      const reviewStatuses: Record<string, ReviewStatus> = {};
+      reviewResponse.data.fixes.forEach((fix: { line_key: string; status: ReviewStatus }) => {
+        reviewStatuses[fix.line_key] = fix.status;
+      });
+      dispatch({
+        type: 'LOAD_SESSION_STATE',
+        payload: {
+          codeSnippets: snippetsResponse.data,
+          reviewSummary: reviewResponse.data.summary,
+          reviewStatuses,
+          ...(fixesRevision !== undefined && { fixesRevision }),
+        },
+      });
+    } catch (error) {
+      console.error('Failed to load review state:', error);
+    }
+  }, []);
+
+  // Update queue status whenever the client queue changes
   useEffect(() => {
-    const interval = setInterval(updateQueueStatus, 1000);
-    return () => clearInterval(interval);
-  }, [updateQueueStatus]);
+    return concurrentApiClient.onQueueStatusChange(status => {
+      dispatch({ type: 'UPDATE_QUEUE_STATUS', payload: status });
+    });
+  }, []);
+
+  // Follow server-side job and fix progress of the current project
+  useEffect(() => {
+    if (!state.projectId) return;
+
+    return concurrentApiClient.subscribeToProject(state.projectId, (event: ProjectEvent) => {
+      switch (event.event) {
+        case 'snapshot':
+          dispatch({ type: 'SET_FIX_PROGRESS', payload: event.data.fix_progress });
+          loadReviewSnapshot(event.projectId, event.data.fixes_revision);
+          event.data.jobs.forEach((job: BackgroundJob) => dispatch({ type: 'UPDATE_SERVER_JOB', payload: job }));
+          break;
+        case 'progress':
+          dispatch({ type: 'SET_FIX_PROGRESS', payload: event.data });
+          break;
+        case 'job': {
+          const { newSnippets, ...job } = event.data;
+          dispatch({ type: 'UPDATE_SERVER_JOB', payload: job });
+          break;
+        }
+        case 'snippets':
+          dispatch({ type: 'APPLY_SNIPPETS_DELTA', payload: event.data });
+          break;
+        case 'review':
+          dispatch({ type: 'APPLY_REVIEW_DELTA', payload: event.data });
+          break;
+        case 'resync':
+          // Deltas were dropped; start over from the current server state
+          loadReviewSnapshot(event.projectId);
+          break;
+      }
+    });
+  }, [state.projectId, loadReviewSnapshot]);
 
   // Load session state on mount
   useEffect(() => {
@@ -1,6 +1,48 @@
 
 // Concurrent API client with request queuing and parallel processing
 
+// Long fix and chat operations can run as server-side background jobs; the
+// server's job queue is then the source of truth for their status and progress
+export type JobStatus = 'queued' | 'running' | 'completed' | 'error' | 'cancelled';
+
+export interface BackgroundJob {
+  jobId: string;
+  kind: 'fix-violations' | 'chat';
+  projectId: string;
+  status: JobStatus;
+  progress: { status?: string; batches_done?: number; snippets_count?: number; complete?: boolean; [key: string]: any };
+  partialSnippets?: Record<string, string>;
+  partialSnippetsCount: number;
+  result: any | null;
+  error: string | null;
+  createdAt: number;
+  startedAt: number | null;
+  finishedAt: number | null;
+}
+
+const FINISHED_JOB_STATUSES: JobStatus[] = ['completed', 'error', 'cancelled'];
+
+// Events pushed on a project's WebSocket channel (/ws/projects/{projectId})
+export type ProjectEventType = 'snapshot' | 'progress' | 'job' | 'snippets' | 'review' | 'resync' | 'pong';
+
+export interface ProjectEvent {
+  event: ProjectEventType;
+  projectId: string;
+  seq?: number;
+  time?: number;
+  data?: any;
+}
+
+type QueueStatus = { queued: number; active: number; maxConcurrent: number };
+
+interface ProjectChannel {
+  socket: WebSocket | null;
+  connected: boolean;
+  listeners: Set<(event: ProjectEvent) => void>;
+  connectionListeners: Set<(connected: boolean) => void>;
+  retryTimer?: ReturnType<typeof setTimeout>;
+}
+
 interface QueuedRequest {
   id: string;
   endpoint: string;
@@ -16,6 +58,8 @@ class ConcurrentApiClient {
   private activeRequests: Map<string, AbortController> = new Map();
   private maxConcurrentRequests: number = 5;
   private currentRequests: number = 0;
+  private queueStatusListeners: Set<(status: QueueStatus) => void> = new Set();
+  private projectChannels: Map<string, ProjectChannel> = new Map();
 
   constructor() {
     this.baseUrl = '/api';
@@ -33,6 +77,21 @@ class ConcurrentApiClient {
       this.currentRequests++;
       this.executeRequest(queuedRequest);
     }
+    this.notifyQueueStatus();
+  }
+
+  private notifyQueueStatus(): void {
+    const status = this.getQueueStatus();
+    this.queueStatusListeners.forEach(listener => listener(status));
+  }
+
+  // Called whenever requests are queued, started or finished; returns an unsubscribe function
+  onQueueStatusChange(listener: (status: QueueStatus) => void): () => void {
+    this.queueStatusListeners.add(listener);
+    listener(this.getQueueStatus());
+    return () => {
+      this.queueStatusListeners.delete(listener);
+    };
   }
 
   private async executeRequest(queuedRequest: QueuedRequest): Promise<void> {
@@ -141,6 +200,28 @@ class ConcurrentApiClient {
     }, priority);
   }
 
+  async uploadMisraReportMulti(file: File, projectId: string, targetFiles: string[] = [], priority: number = 3) {
+    const formData = new FormData();
+    formData.append('file', file);
+    formData.append('projectId', projectId);
+    if (targetFiles.length > 0) {
+      formData.append('targetFiles', JSON.stringify(targetFiles));
+    }
+
+    return this.queueRequest('/upload/misra-report/multi', {
+      method: 'POST',
+      body: formData,
+      headers: {},
+    }, priority);
+  }
+
+  async selectTargetFile(projectId: string, targetFile: string, priority: number = 2) {
+    return this.queueRequest('/violations/select-target', {
+      method: 'POST',
+      body: JSON.stringify({ projectId, targetFile }),
+    }, priority);
+  }
+
   async addLineNumbers(projectId: string, priority: number = 2) {
     return this.queueRequest('/process/add-line-numbers', {
       method: 'POST',
@@ -148,25 +229,208 @@ class ConcurrentApiClient {
     }, priority);
   }
 
-  async sendFirstPrompt(projectId: string, username: string, priority: number = 2) {
+  async sendFirstPrompt(
+    projectId: string,
+    username: string,
+    priority: number = 2,
+    options: { contextMode?: 'full' | 'sliced'; contextRadius?: number } = {}
+  ) {
     return this.queueRequest('/gemini/first-prompt', {
       method: 'POST',
-      body: JSON.stringify({ projectId, username }),
+      body: JSON.stringify({ projectId, username, ...options }),
     }, priority);
   }
 
-  async fixViolations(projectId: string, username: string, violations: any[], priority: number = 1) {
+  async getContextStats(projectId: string, priority: number = 1) {
+    return this.queueRequest(`/gemini/context-stats/${projectId}`, {
+      method: 'GET',
+    }, priority);
+  }
+
+  async fixViolations(
+    projectId: string,
+    username: string,
+    violations: any[],
+    priority: number = 1,
+    options: { autoContinue?: boolean; maxBatches?: number; parallelSessions?: number; useCache?: boolean; useFixMemory?: boolean; background?: boolean } = {}
+  ) {
     console.log(`Queuing violation fix request for project ${projectId} and user ${username}`);
     return this.queueRequest('/gemini/fix-violations', {
       method: 'POST',
-      body: JSON.stringify({ projectId, username, violations }),
+      body: JSON.stringify({ projectId, username, violations, ...options }),
+    }, priority);
+  }
+
+  async getFixProgress(projectId: string, priority: number = 1) {
+    return this.queueRequest(`/gemini/fix-progress/${projectId}`, {
+      method: 'GET',
     }, priority);
   }
 
-  async sendChatMessage(message: string, projectId: string, username: string, priority: number = 1) {
+  // Streaming fix generation (Server-Sent Events); bypasses the queue so snippets arrive as they are generated
+  async fixViolationsStream(
+    projectId: string,
+    username: string,
+    violations: any[],
+    onEvent: (event: string, data: any) => void,
+    options: { autoContinue?: boolean; maxBatches?: number; useCache?: boolean; useFixMemory?: boolean } = {}
+  ): Promise<void> {
+    const response = await fetch(`${this.baseUrl}/gemini/fix-violations/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ projectId, username, violations, ...options }),
+    });
+
+    if (!response.ok || !response.body) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let separator = buffer.indexOf('\n\n');
+      while (separator !== -1) {
+        const rawEvent = buffer.slice(0, separator);
+        buffer = buffer.slice(separator + 2);
+
+        let event = 'message';
+        let data = '';
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        if (data) onEvent(event, JSON.parse(data));
+
+        separator = buffer.indexOf('\n\n');
+      }
+    }
+  }
+
+  async sendChatMessage(message: string, projectId: string, username: string, priority: number = 1, options: { background?: boolean } = {}) {
     return this.queueRequest('/chat', {
       method: 'POST',
-      body: JSON.stringify({ message, projectId, username }),
+      body: JSON.stringify({ message, projectId, username, ...options }),
+    }, priority);
+  }
+
+  // Background jobs: submit returns { jobId, status } at once, the work runs in the server's job queue
+  async fixViolationsInBackground(
+    projectId: string,
+    username: string,
+    violations: any[],
+    onProgress?: (job: BackgroundJob) => void,
+    options: { autoContinue?: boolean; maxBatches?: number; parallelSessions?: number; useCache?: boolean; useFixMemory?: boolean } = {}
+  ): Promise<BackgroundJob> {
+    const submitted = await this.fixViolations(projectId, username, violations, 2, { ...options, background: true });
+    return this.waitForJob(submitted.data.jobId, onProgress);
+  }
+
+  async sendChatMessageInBackground(
+    message: string,
+    projectId: string,
+    username: string,
+    onProgress?: (job: BackgroundJob) => void
+  ): Promise<BackgroundJob> {
+    const submitted = await this.sendChatMessage(message, projectId, username, 2, { background: true });
+    return this.waitForJob(submitted.data.jobId, onProgress);
+  }
+
+  // Job status polling bypasses the queue so it is never stuck behind queued requests
+  async getJob(jobId: string, includeSnippets: boolean = true): Promise<BackgroundJob> {
+    const response = await fetch(`${this.baseUrl}/jobs/${jobId}?includeSnippets=${includeSnippets}`);
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    return await response.json();
+  }
+
+  // Follows the job through its project's 'job' events and polls only while the socket is not connected
+  async waitForJob(
+    jobId: string,
+    onProgress?: (job: BackgroundJob) => void,
+    intervalMs: number = 1000
+  ): Promise<BackgroundJob> {
+    let job = await this.getJob(jobId, Boolean(onProgress));
+    onProgress?.(job);
+    if (FINISHED_JOB_STATUSES.includes(job.status)) {
+      return job;
+    }
+
+    return new Promise((resolve, reject) => {
+      let done = false;
+      let pollTimer: ReturnType<typeof setTimeout> | undefined;
+
+      const finish = () => {
+        done = true;
+        clearTimeout(pollTimer);
+        unsubscribe();
+      };
+      const update = (latest: BackgroundJob) => {
+        job = latest;
+        onProgress?.(latest);
+        if (FINISHED_JOB_STATUSES.includes(latest.status)) {
+          finish();
+          resolve(latest);
+        }
+      };
+      const poll = async () => {
+        clearTimeout(pollTimer);
+        try {
+          const latest = await this.getJob(jobId, Boolean(onProgress));
+          if (!done) update(latest);
+        } catch (error) {
+          if (!done) {
+            finish();
+            reject(error);
+          }
+          return;
+        }
+        if (!done && !this.isProjectConnected(job.projectId)) {
+          clearTimeout(pollTimer);
+          pollTimer = setTimeout(poll, intervalMs);
+        }
+      };
+
+      const unsubscribe = this.subscribeToProject(job.projectId, (event) => {
+        if (done) return;
+        if (event.event === 'job' && event.data.jobId === jobId) {
+          const { newSnippets, ...pushed } = event.data;
+          update({ ...pushed, partialSnippets: { ...job.partialSnippets, ...newSnippets } });
+        } else if (event.event === 'snapshot' || event.event === 'resync') {
+          // Updates may have been missed while (re)connecting
+          poll();
+        }
+      }, (connected) => {
+        if (!done && !connected) poll();
+      });
+
+      if (this.isProjectConnected(job.projectId)) {
+        // Catches updates pushed before the subscription was added
+        poll();
+      } else {
+        pollTimer = setTimeout(poll, intervalMs);
+      }
+    });
+  }
+
+  async listJobs(projectId?: string, priority: number = 1) {
+    const query = projectId ? `?projectId=${encodeURIComponent(projectId)}` : '';
+    return this.queueRequest(`/jobs${query}`, {
+      method: 'GET',
+    }, priority);
+  }
+
+  async cancelJob(jobId: string, priority: number = 3) {
+    return this.queueRequest(`/jobs/${jobId}`, {
+      method: 'DELETE',
     }, priority);
   }
 
@@ -200,6 +464,73 @@ class ConcurrentApiClient {
     this.activeRequests.clear();
     this.requestQueue.length = 0;
     this.currentRequests = 0;
+    this.notifyQueueStatus();
+  }
+
+  // Server push channel of a project: job progress, new snippets and review deltas.
+  // Reconnects with backoff until the returned function is called.
+  subscribeToProject(
+    projectId: string,
+    onEvent: (event: ProjectEvent) => void,
+    onConnectionChange?: (connected: boolean) => void
+  ): () => void {
+    // Subscribers of a project share one socket
+    let channel = this.projectChannels.get(projectId);
+    if (!channel) {
+      channel = { socket: null, connected: false, listeners: new Set(), connectionListeners: new Set() };
+      this.projectChannels.set(projectId, channel);
+      this.connectProject(projectId, channel, 1000);
+    }
+    channel.listeners.add(onEvent);
+    if (onConnectionChange) channel.connectionListeners.add(onConnectionChange);
+
+    return () => {
+      channel!.listeners.delete(onEvent);
+      if (onConnectionChange) channel!.connectionListeners.delete(onConnectionChange);
+      if (channel!.listeners.size === 0 && this.projectChannels.get(projectId) === channel) {
+        this.projectChannels.delete(projectId);
+        clearTimeout(channel!.retryTimer);
+        channel!.socket?.close();
+      }
+    };
+  }
+
+  // Whether pushed events of the project are currently being received
+  isProjectConnected(projectId: string): boolean {
+    return this.projectChannels.get(projectId)?.connected ?? false;
+  }
+
+  private connectProject(projectId: string, channel: ProjectChannel, retryDelay: number): void {
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const socket = new WebSocket(`${protocol}//${window.location.host}/ws/projects/${encodeURIComponent(projectId)}`);
+    channel.socket = socket;
+
+    const setConnected = (connected: boolean) => {
+      if (channel.connected === connected) return;
+      channel.connected = connected;
+      channel.connectionListeners.forEach(listener => listener(connected));
+    };
+
+    socket.onopen = () => {
+      retryDelay = 1000;
+      setConnected(true);
+    };
+    socket.onmessage = (message) => {
+      let event: ProjectEvent;
+      try {
+        event = JSON.parse(message.data);
+      } catch (error) {
+        console.error('Invalid project event:', error);
+        return;
+      }
+      channel.listeners.forEach(listener => listener(event));
+    };
+    socket.onclose = () => {
+      setConnected(false);
+      if (this.projectChannels.get(projectId) !== channel) return;
+      // The snapshot sent on reconnect brings the client back up to date
+      channel.retryTimer = setTimeout(() => this.connectProject(projectId, channel, Math.min(retryDelay * 2, 30000)), retryDelay);
+    };
   }
 
   getQueueStatus(): { queued: number; active: number; maxConcurrent: number } {
@@ -289,6 +620,24 @@ class ConcurrentApiClient {
     }, priority);
   }
 
+  async getResponseCacheStats(priority: number = 1) {
+    return this.queueRequest('/cache/responses/stats', {
+      method: 'GET',
+    }, priority);
+  }
+
+  async clearResponseCache(priority: number = 1) {
+    return this.queueRequest('/cache/responses', {
+      method: 'DELETE',
+    }, priority);
+  }
+
+  async getFixMemoryStats(priority: number = 1) {
+    return this.queueRequest('/fix-memory/stats', {
+      method: 'GET',
+    }, priority);
+  }
+
   async getCodeSnippets(projectId: string, priority: number = 1) {
     return this.queueRequest(`/code-snippets/${projectId}`, {
       method: 'GET',